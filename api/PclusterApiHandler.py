@@ -8,24 +8,46 @@
 # or in the "LICENSE.txt" file accompanying this file. This file is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES
 # OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions and
 # limitations under the License.
+import base64
+import binascii
+import datetime
 import functools
+import importlib
 import json
+import logging
 import os
+import random
 import re
+import shlex
 import time
 
-import boto3
-import botocore
+import botocore.auth
+import botocore.awsrequest
 import requests
-import yaml
-from flask import abort, redirect, request, Blueprint
-from jose import jwt
-
+from flask import abort, redirect, request, stream_with_context, Blueprint, Response
+from jose.exceptions import ExpiredSignatureError
+
+from api.agent import AgentUnavailable, HeadNodeAgents, install_script
+from api.cache import TTLCache, parse_ttls
+from api.cache.cluster_config import ClusterConfigCache
+from api.cache.job_snapshots import JobSnapshots
+from api.clients.boto import boto_clients
+from api.clients.credentials import AssumedRoleCredentialProvider
+from api.clients.fanout import CallOutcome, fan_out, server_timing
+from api.clients.secrets import app_secrets
+from api.clients.sessions import http
+from api.clients.ssm import CommandBatch, SsmCommandWaiter, SsmOutputChannel
 from api.exception.exceptions import RefreshTokenError
+from api.metrics import register_metrics
+from api.pricing import PriceIndex
+from api.pricing.index import PRICING_REGION
+from api.pricing.rollup import ROLLUP_DIMENSIONS, aggregate_costs, usage_columns, usage_command
 from api.pcm_globals import set_auth_cookies_in_context, logger, auth_cookies
 from api.security.csrf.constants import CSRF_COOKIE_NAME
 from api.security.csrf.csrf import csrf_needed
-from api.utils import disable_auth
+from api.security.jwks import JWKSKeyStore
+from api.security.token_cache import VerifiedTokenCache
+from api.utils import disable_auth, to_iso_timestr
 from api.validation import validated
 from api.validation.schemas import PCProxyArgs, PCProxyBody
 
@@ -47,14 +69,48 @@ AUTH_URL = os.getenv("AUTH_URL", f"{AUTH_PATH}/login")
 JWKS_URL = os.getenv("JWKS_URL")
 AUDIENCE = os.getenv("AUDIENCE")
 USER_ROLES_CLAIM = os.getenv("USER_ROLES_CLAIM", "cognito:groups")
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", 3600))
+JWKS_MAX_STALE = int(os.getenv("JWKS_MAX_STALE", 24 * 3600))
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL", 30))
+VERIFIED_TOKEN_CACHE_SIZE = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", 1024))
+API_HTTP_POOL_MAXSIZE = int(os.getenv("API_HTTP_POOL_MAXSIZE", 25))
+AWS_CONFIG_CACHE_TTL = int(os.getenv("AWS_CONFIG_CACHE_TTL", 300))
+AWS_CONFIG_CACHE_TTLS = parse_ttls(os.getenv("AWS_CONFIG_CACHE_TTLS",
+                                             "instance_types=86400,efa_instance_types=86400,"
+                                             "fsx_filesystems=60,fsx_volumes=60,efs_filesystems=60"))
+AWS_CONFIG_CACHE_DIR = os.getenv("AWS_CONFIG_CACHE_DIR")
+SSM_COMMAND_TIMEOUTS = {"default": 60, "dcv": 15,
+                        **parse_ttls(os.getenv("SSM_COMMAND_TIMEOUTS", ""))}
+SSM_INITIAL_PROBE_DELAY = float(os.getenv("SSM_INITIAL_PROBE_DELAY", 0.1))
+SSM_MAX_PROBE_DELAY = float(os.getenv("SSM_MAX_PROBE_DELAY", 1.0))
+SSM_OUTPUT_S3_BUCKET = os.getenv("SSM_OUTPUT_S3_BUCKET")
+SSM_OUTPUT_S3_PREFIX = os.getenv("SSM_OUTPUT_S3_PREFIX", "pcluster-manager/ssm")
+SSM_OUTPUT_S3_REGION = os.getenv("SSM_OUTPUT_S3_REGION")
+SSM_OUTPUT_COMPRESS = os.getenv("SSM_OUTPUT_COMPRESS", "false").lower() == "true"
+HEAD_NODE_AGENT = os.getenv("HEAD_NODE_AGENT", "false").lower() == "true"
+HEAD_NODE_AGENT_PORT = int(os.getenv("HEAD_NODE_AGENT_PORT", 8765))
+SACCT_PAGE_SIZE = int(os.getenv("SACCT_PAGE_SIZE", 120))
+SACCT_DEFAULT_FIELDS = "name,user,partition,state,job_id,exit_code"
+SLURM_QUERY_CACHE_TTL = int(os.getenv("SLURM_QUERY_CACHE_TTL", 5))
+QUEUE_EVENTS_MAX_DURATION = int(os.getenv("QUEUE_EVENTS_MAX_DURATION", 300))
+QUEUE_EVENTS_KEEPALIVE = int(os.getenv("QUEUE_EVENTS_KEEPALIVE", 15))
+# set by the response streaming Lambda entrypoint, the buffered one only sends complete responses
+LAMBDA_RESPONSE_STREAMING = os.getenv("LAMBDA_RESPONSE_STREAMING", "false").lower() == "true"
+CLUSTER_DESCRIBE_CACHE_TTL = int(os.getenv("CLUSTER_DESCRIBE_CACHE_TTL", 30))
+# fingerprint the CSRF secret key is derived from, computed once per deployment, the Cognito app client one otherwise
+CSRF_FINGERPRINT = os.getenv("CSRF_FINGERPRINT")
+CSRF_FINGERPRINT_CACHE_DIR = os.getenv("CSRF_FINGERPRINT_CACHE_DIR")
+PRICE_CACHE_TTL = int(os.getenv("PRICE_CACHE_TTL", 7 * 24 * 3600))
+PRICE_CACHE_DIR = os.getenv("PRICE_CACHE_DIR", AWS_CONFIG_CACHE_DIR)
+PRICE_OFFER_FILES = [f for f in os.getenv("PRICE_OFFER_FILES", "").split(",") if f]
 
 try:
     if (not USER_POOL_ID or USER_POOL_ID == "") and SECRET_ID:
-        secrets = boto3.client("secretsmanager")
-        secret = json.loads(secrets.get_secret_value(SecretId=SECRET_ID)["SecretString"])
+        secret = app_secrets.get(SECRET_ID)
         USER_POOL_ID = secret.get("userPoolId")
         CLIENT_ID = secret.get("clientId")
         CLIENT_SECRET = secret.get("clientSecret")
+        CSRF_FINGERPRINT = secret.get("csrfFingerprint", CSRF_FINGERPRINT)
 except Exception:
     pass
 
@@ -62,22 +118,98 @@ if not JWKS_URL:
     JWKS_URL = os.getenv("JWKS_URL",
                          f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/" ".well-known/jwks.json")
 
-def jwt_decode(token, audience=None, access_token=None):
-    return jwt.decode(token, requests.get(JWKS_URL).json(), audience=audience, access_token=access_token)
+jwks_store = JWKSKeyStore(JWKS_URL, ttl=JWKS_CACHE_TTL, max_stale=JWKS_MAX_STALE,
+                          min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL)
+register_metrics("jwks", jwks_store.stats)
 
+http.configure_host(API_BASE_URL, API_HTTP_POOL_MAXSIZE)
+register_metrics("http", http.stats)
+register_metrics("boto_clients", boto_clients.stats)
 
-def setup_api_credentials(role_arn, credential_external_id=None):
-    sts = boto3.client("sts")
 
-    assume_role_kwargs = {
-        "RoleArn": role_arn,
-        "RoleSessionName": "api_session",
-    }
-    if credential_external_id:
-        assume_role_kwargs["ExternalId"] = credential_external_id
+def _json_default(obj):
+    # same format as the live responses serialized by PClusterJSONEncoder
+    if isinstance(obj, datetime.date):
+        return to_iso_timestr(obj)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+# keyed by (kind, account, region)
+aws_config_cache = TTLCache("aws_config", AWS_CONFIG_CACHE_TTL, ttls=AWS_CONFIG_CACHE_TTLS,
+                            persist_dir=AWS_CONFIG_CACHE_DIR, json_default=_json_default)
+register_metrics("aws_config_cache", aws_config_cache.stats)
+
+price_index = PriceIndex(TTLCache("prices", PRICE_CACHE_TTL, persist_dir=PRICE_CACHE_DIR),
+                         client_factory=lambda: boto_clients.client("pricing", PRICING_REGION),
+                         offer_files=PRICE_OFFER_FILES)
+register_metrics("prices", price_index.stats)
+
+cluster_configs = ClusterConfigCache(describe_ttl=CLUSTER_DESCRIBE_CACHE_TTL)
+register_metrics("cluster_configs", cluster_configs.stats)
+
+ssm_waiter = SsmCommandWaiter(initial_delay=SSM_INITIAL_PROBE_DELAY, max_delay=SSM_MAX_PROBE_DELAY)
+register_metrics("ssm", ssm_waiter.stats)
+
+ssm_output = SsmOutputChannel(SSM_OUTPUT_S3_BUCKET, SSM_OUTPUT_S3_PREFIX, SSM_OUTPUT_S3_REGION,
+                              compress=SSM_OUTPUT_COMPRESS,
+                              s3_client_factory=lambda region: boto_clients.client("s3", region))
+register_metrics("ssm_output", ssm_output.stats)
+
+# keyed by (query, region, head node instance id, user)
+slurm_queries = TTLCache("slurm_queries", SLURM_QUERY_CACHE_TTL, max_size=1024)
+register_metrics("slurm_queries", slurm_queries.stats)
 
-    assumed_role_object = sts.assume_role(**assume_role_kwargs)
-    return assumed_role_object["Credentials"]
+# keyed by (region, head node instance id, user)
+job_snapshots = JobSnapshots()
+register_metrics("job_snapshots", job_snapshots.stats)
+
+verified_tokens = VerifiedTokenCache(max_size=VERIFIED_TOKEN_CACHE_SIZE)
+register_metrics("verified_tokens", verified_tokens.stats)
+
+def jwt_decode(token, audience=None, access_token=None):
+    # imported on first use, jose and its crypto backends are not needed to serve the frontend
+    from jose import jwt
+    return jwt.decode(token, jwks_store.key_for(token), audience=audience, access_token=access_token)
+
+
+def decode_access_token(token):
+    """ Decodes an access token, skipping the signature verification of already verified tokens """
+    decoded = verified_tokens.get(token)
+    if decoded is None:
+        decoded = jwt_decode(token)
+        verified_tokens.put(token, decoded)
+    return decoded
+
+
+api_credentials = AssumedRoleCredentialProvider(API_USER_ROLE) if API_USER_ROLE else None
+if api_credentials:
+    register_metrics("api_credentials", api_credentials.stats)
+
+
+def warm_up_auth():
+    """
+    Imports the JWT libraries while fetching the signing keys, e.g. in the Lambda
+    init phase, so that the first authenticated request does not pay for them.
+    """
+    calls = {"jose": lambda: importlib.import_module("jose.jwt")}
+    if USER_POOL_ID or os.getenv("JWKS_URL"):
+        calls["jwks"] = jwks_store.refresh
+    for name, outcome in fan_out(calls).items():
+        if outcome.error is not None:
+            logging.warning("Unable to warm up %s: %s", name, outcome.error)
+
+
+def reset_after_restore():
+    """
+    Resets the state that must not be shared by the execution environments
+    restored from the same snapshot: random seed, connections and credentials.
+    """
+    random.seed()
+    http.close()
+    boto_clients.reset_credentials()
+    if api_credentials:
+        api_credentials.invalidate()
+    boto_clients.warm_up()
 
 
 def sigv4_request(method, host, path, params={}, headers={}, body=None):
@@ -88,41 +220,28 @@ def sigv4_request(method, host, path, params={}, headers={}, body=None):
     request_parameters = "&".join([f"{k}={v}" for k, v in (params or {}).items()])
     url = f"{host}{path}?{request_parameters}"
 
-    if API_USER_ROLE:
-        sts_credentials = setup_api_credentials(API_USER_ROLE)
-        session = boto3.session.Session(
-            aws_access_key_id=sts_credentials["AccessKeyId"],
-            aws_secret_access_key=sts_credentials["SecretAccessKey"],
-            aws_session_token=sts_credentials["SessionToken"]
-        )
+    if api_credentials:
+        credentials = api_credentials.get_credentials()
     else:
-        session = boto3.session.Session()
+        credentials = boto_clients.session.get_credentials()
 
     body_data = json.dumps(body) if body else None
     new_request = botocore.awsrequest.AWSRequest(method=method, url=url, data=body_data)
-    botocore.auth.SigV4Auth(session.get_credentials(), "execute-api", region).add_auth(new_request)
+    botocore.auth.SigV4Auth(credentials, "execute-api", region).add_auth(new_request)
     boto_request = new_request.prepare()
 
-    req_call = {
-        "POST": requests.post,
-        "GET": requests.get,
-        "PUT": requests.put,
-        "PATCH": requests.patch,
-        "DELETE": requests.delete,
-    }.get(method)
-
     if body:
         boto_request.headers["content-type"] = "application/json"
 
     for k, val in headers.items():
         boto_request.headers[k] = val
 
-    return req_call(boto_request.url, data=body_data, headers=boto_request.headers, timeout=30)
+    return http.request(method, boto_request.url, data=body_data, headers=boto_request.headers)
 
 def refresh_tokens(refresh_token):
     auth = requests.auth.HTTPBasicAuth(CLIENT_ID, CLIENT_SECRET)
 
-    resp = requests.post(
+    resp = http.post(
         TOKEN_URL,
         data={"grant_type": 'refresh_token', "refresh_token": refresh_token, "client_id": CLIENT_ID},
         auth=auth,
@@ -147,14 +266,14 @@ def authenticate(groups):
         return abort(401)
 
     try:
-        decoded = jwt_decode(access_token)
-    except jwt.ExpiredSignatureError:
+        decoded = decode_access_token(access_token)
+    except ExpiredSignatureError:
         refresh_token = request.cookies.get('refreshToken', None)
         if refresh_token is None:
             return abort(401)
 
         tokens = refresh_tokens(refresh_token)
-        decoded = jwt_decode(tokens['accessToken'])
+        decoded = decode_access_token(tokens['accessToken'])
         set_auth_cookies_in_context(tokens)
     except Exception as e:
         return abort(401)
@@ -204,11 +323,7 @@ def get_app_config():
   }
 
 def ec2_action():
-    if request.args.get("region"):
-        config = botocore.config.Config(region_name=request.args.get("region"))
-        ec2 = boto3.client("ec2", config=config)
-    else:
-        ec2 = boto3.client("ec2")
+    ec2 = boto_clients.client("ec2", request.args.get("region"))
 
     try:
         instance_ids = request.args.get("instance_ids").split(",")
@@ -226,7 +341,7 @@ def ec2_action():
     return ret
 
 
-def get_cluster_config_text(cluster_name, region=None):
+def _describe_cluster(cluster_name, region=None):
     url = f"/v3/clusters/{cluster_name}"
     if region:
         info_resp = sigv4_request("GET", API_BASE_URL, url, params={"region": region})
@@ -235,87 +350,159 @@ def get_cluster_config_text(cluster_name, region=None):
     if info_resp.status_code != 200:
         abort(info_resp.status_code)
 
-    cluster_info = info_resp.json()
-    configuration = requests.get(cluster_info["clusterConfiguration"]["url"])
-    return configuration.text
+    return info_resp.json()
+
+
+def _download_configuration(url, etag=None):
+    return http.get(url, headers={"If-None-Match": etag} if etag else None)
+
+
+def get_cluster_configuration(cluster_name, region=None):
+    return cluster_configs.get(region or boto_clients.default_region(), cluster_name,
+                               describe=lambda: _describe_cluster(cluster_name, region),
+                               download=_download_configuration)
+
+
+def get_cluster_config_text(cluster_name, region=None):
+    return get_cluster_configuration(cluster_name, region).text
 
 
 def get_cluster_config():
     return get_cluster_config_text(request.args.get("cluster_name"), request.args.get("region"))
 
 
-def ssm_command(region, instance_id, user, run_command):
-    # working_directory |= f"/home/{user}"
-    start = time.time()
+def _ssm_command_type(run_command):
+    """ e.g. squeue, sacct, scontrol, the timeouts of SSM_COMMAND_TIMEOUTS are configured per command type """
+    return run_command.split(" ", 1)[0] or "default"
 
-    if region:
-        config = botocore.config.Config(region_name=region)
-        ssm = boto3.client("ssm", config=config)
-    else:
-        ssm = boto3.client("ssm")
 
-    command = f"runuser -l {user} -c '{run_command}'"
+def _run_ssm_command(region, instance_id, command, comment, command_type, timeout_message):
+    ssm = boto_clients.client("ssm", region)
+    timeout = SSM_COMMAND_TIMEOUTS.get(command_type, SSM_COMMAND_TIMEOUTS["default"])
+    start = time.monotonic()
 
     ssm_resp = ssm.send_command(
         InstanceIds=[instance_id],
         DocumentName="AWS-RunShellScript",
-        Comment=f"Run ssm command.",
-        Parameters={"commands": [command]},
+        Comment=comment,
+        Parameters={"commands": ssm_output.commands(command)},
+        **ssm_output.send_command_args(),
     )
 
     command_id = ssm_resp["Command"]["CommandId"]
 
     # Wait for command to complete
-    time.sleep(0.75)
-    while time.time() - start < 60:
-        status = ssm.get_command_invocation(CommandId=command_id, InstanceId=instance_id)
-        if status["Status"] != "InProgress":
-            break
-        time.sleep(0.75)
-
-    if time.time() - start > 60:
-        raise Exception("Timed out waiting for command to complete.")
+    status = ssm_waiter.wait(ssm, command_id, instance_id, timeout, command_type=command_type, start=start)
+    if status is None:
+        raise Exception(timeout_message)
 
     if status["Status"] != "Success":
         raise Exception(status["StandardErrorContent"])
 
-    output = status["StandardOutputContent"]
-    return output
-
-def _price_estimate(cluster_name, region, queue_name):
-    config_text = get_cluster_config_text(cluster_name, region)
-    config_data = yaml.safe_load(config_text)
-    queues = {q["Name"]: q for q in config_data["Scheduling"]["SlurmQueues"]}
-    queue = queues[queue_name]
-
-    if len(queue["ComputeResources"]) == 1:
-        instance_type = queue["ComputeResources"][0]["InstanceType"]
-        pricing_filters = [
-            {"Field": "tenancy", "Value": "shared", "Type": "TERM_MATCH"},
-            {"Field": "instanceType", "Value": instance_type, "Type": "TERM_MATCH"},
-            {"Field": "operatingSystem", "Value": "Linux", "Type": "TERM_MATCH"},
-            {"Field": "regionCode", "Value": region, "Type": "TERM_MATCH"},
-            {"Field": "preInstalledSw", "Value": "NA", "Type": "TERM_MATCH"},
-            {"Field": "capacityStatus", "Value": "Used", "Type": "TERM_MATCH"},
-        ]
-
-        # Pricing endpoint only available from "us-east-1" region
-        pricing = boto3.client("pricing", region_name="us-east-1")
-        prices = pricing.get_products(ServiceCode="AmazonEC2", Filters=pricing_filters)["PriceList"]
-        prices = list(map(json.loads, prices))
-        on_demand_prices = list(prices[0]["terms"]["OnDemand"].values())
-        price_guess = float(list(on_demand_prices[0]["priceDimensions"].values())[0]["pricePerUnit"]["USD"])
-        price_guess = None if price_guess != price_guess else price_guess  # check for NaN
-        return price_guess
-    else:
-        return {"message": "Cost estimate not available for queues with multiple resource types."}, 400
+    return ssm_output.read(status, command_id, instance_id, region)
+
+
+def _user_command(user, run_command):
+    # working_directory |= f"/home/{user}"
+    return f"runuser -l {user} -c {shlex.quote(run_command)}"
+
+
+def _deploy_head_node_agent(region, instance_id, port):
+    _run_ssm_command(region, instance_id, install_script(port), "Start pcluster-manager agent.", "agent",
+                     "Timed out waiting for the agent to start.")
+
+
+# optional channel to an agent on the head node, avoiding the RunCommand overhead of each query
+head_node_agents = None
+if HEAD_NODE_AGENT:
+    head_node_agents = HeadNodeAgents(_deploy_head_node_agent, port=HEAD_NODE_AGENT_PORT,
+                                      timeout=SSM_COMMAND_TIMEOUTS["default"])
+    register_metrics("head_node_agents", head_node_agents.stats)
+
+
+def ssm_command(region, instance_id, user, run_command):
+    if head_node_agents is not None:
+        try:
+            return head_node_agents.run(region, instance_id, user, run_command)
+        except AgentUnavailable:
+            pass
+    return _run_ssm_command(region, instance_id, _user_command(user, run_command), "Run ssm command.",
+                            _ssm_command_type(run_command), "Timed out waiting for command to complete.")
+
+
+def _compute_resource_instance_types(compute_resource):
+    if "InstanceType" in compute_resource:
+        return [compute_resource["InstanceType"]]
+    return [instance["InstanceType"] for instance in compute_resource.get("Instances", [])]
+
+
+def _compute_resource_price(region, compute_resource):
+    """ Hourly price of a node of the compute resource, the most expensive instance type for flexible ones """
+    prices = [price_index.price(region, instance_type)
+              for instance_type in _compute_resource_instance_types(compute_resource)]
+    prices = [price for price in prices if price is not None]
+    return max(prices) if prices else None
+
+
+def _price_estimates(cluster_name, region, queue_name):
+    """ Returns the hourly price of a node of each compute resource of the queue """
+    compute_resources = get_cluster_configuration(cluster_name, region).compute_resources(queue_name)
+    return {cr["Name"]: _compute_resource_price(region, cr) for cr in compute_resources}
+
+
+def _job_compute_resource(job, queue_name, compute_resources):
+    """ Infers the compute resource of a job from its node names, e.g. queue1-dy-c5xlarge-[1-3] """
+    nodes = job.get("nodes") or ""
+    for compute_resource in sorted(compute_resources, key=len, reverse=True):
+        if any(nodes.startswith(f"{queue_name}-{node_type}-{compute_resource}-") for node_type in ("st", "dy")):
+            return compute_resource
+    return None
+
+
+def cost_rollup():
+    """ Cost of the jobs started in a time range, aggregated per user, queue and day """
+    user = request.args.get("user", "ec2-user")
+    instance_id = request.args.get("instance_id")
+    cluster_name = request.args.get("cluster_name")
+    region = request.args.get("region")
+    group_by = request.args.get("group_by")
+    group_by = tuple(group_by.split(",")) if group_by else ROLLUP_DIMENSIONS
+
+    output = ssm_command(region, instance_id, user,
+                         usage_command(request.args.get("starttime"), request.args.get("endtime")))
+
+    estimates = {}
+
+    def price(queue_name, nodes):
+        if queue_name not in estimates:
+            try:
+                estimates[queue_name] = _price_estimates(cluster_name, region, queue_name)
+            except KeyError:
+                # queue removed from the cluster configuration since
+                estimates[queue_name] = {}
+        queue_estimates = estimates[queue_name]
+        compute_resource = _job_compute_resource({"nodes": f"{nodes}-"}, queue_name, queue_estimates)
+        if compute_resource is None and len(queue_estimates) == 1:
+            compute_resource = next(iter(queue_estimates))
+        return queue_estimates.get(compute_resource)
+
+    return aggregate_costs(usage_columns(output), price, group_by)
 
 
 def price_estimate():
-    price_guess = _price_estimate(
-        request.args.get("cluster_name"), request.args.get("region"), request.args.get("queue_name")
-    )
-    return price_guess if isinstance(price_guess, tuple) else {"estimate": price_guess}
+    cluster_name, region = request.args.get("cluster_name"), request.args.get("region")
+    queue_name, compute_resource = request.args.get("queue_name"), request.args.get("compute_resource")
+
+    estimates = _price_estimates(cluster_name, region, queue_name)
+    if compute_resource is not None:
+        if compute_resource not in estimates:
+            return {"message": f"Compute resource {compute_resource} not found in queue {queue_name}."}, 400
+        return {"estimate": estimates[compute_resource]}
+
+    ret = {"estimates": estimates}
+    if len(estimates) == 1:
+        ret["estimate"] = next(iter(estimates.values()))
+    return ret
 
 
 def sacct():
@@ -325,39 +512,86 @@ def sacct():
     region = request.args.get("region")
     body = request.json
 
-    price_guess = None
-    sacct_args = " ".join(f"--{k} {v}" for k, v in body.items())
-    sacct_args += " --allusers" if "user" not in body else ""
-
-    if "jobs" not in body:
-        accounting = ssm_command(
-            region,
-            instance_id,
-            user,
-            f"sacct {sacct_args} --json "
-            + "| jq -c .jobs[0:120]\\|\\map\\({name,user,partition,state,job_id,exit_code\\}\\)",
-        )
-        if type(accounting) is tuple:
-            return accounting
-    else:
+    try:
+        command = _sacct_command(body, request.args.get("fields"), int(request.args.get("limit", SACCT_PAGE_SIZE)),
+                                 request.args.get("cursor"))
+    except ValueError:
+        return {"message": "Invalid cursor."}, 400
+    accounting = ssm_command(region, instance_id, user, command)
+    return _sacct_result(accounting, body, cluster_name, region)
+
+
+def _encode_sacct_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode()
 
-        accounting = ssm_command(region, instance_id, user, f"sacct {sacct_args} --json | jq -c .jobs")
-        if isinstance(accounting, tuple):
-            return accounting
-        # Try to retrieve relevant cost information
-        queue_name = json.loads(accounting)[0]["partition"]
-        _price_guess = _price_estimate(cluster_name, region, queue_name)
-        if not isinstance(_price_guess, tuple):
-            price_guess = _price_guess
 
+def _decode_sacct_cursor(cursor):
+    """ Raises ValueError unless the cursor is one returned by _sacct_result """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        job_id, submission = int(position["job_id"]), position["submission"]
+    except (TypeError, KeyError, binascii.Error, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(submission, int):
+        raise ValueError("Invalid cursor: submission")
+    return job_id, submission
+
+
+def _sacct_command(options, projection=None, limit=SACCT_PAGE_SIZE, cursor=None):
+    """
+    sacct command returning one page of jobs ordered by job id, as compact JSON.
+
+    Pages are computed on the head node so that the output stays well below the
+    24KB StandardOutputContent limit of SSM. The cursor holds the last job of the
+    previous page: the time window scanned by sacct starts at its submission and
+    only the jobs with a greater job id are returned. The submission is kept as
+    an epoch and converted to the local time of the head node by `date`, the jq
+    time builtins doing it (strflocaltime) are missing from jq 1.5.
+    """
+    options = dict(options)
+    after = 0
+    if cursor:
+        after, submission = _decode_sacct_cursor(cursor)
+        options["starttime"] = f"$(date -d @{submission} +%Y-%m-%dT%H:%M:%S)"
+    if projection is None and "jobs" not in options:
+        projection = SACCT_DEFAULT_FIELDS
+
+    sacct_args = " ".join(f"--{k} {v}" for k, v in options.items())
+    sacct_args += " --allusers" if "user" not in options else ""
+
+    page = f".[0:{limit}]" + (f" | map({{{projection}}})" if projection else "")
+    program = (f".jobs | map(select(.job_id > {after})) | sort_by(.job_id)"
+               f" | {{jobs: ({page}), next: (if length > {limit} then (.[{limit - 1}] | {{job_id,"
+               " submission: .time.submission}) else null end)}")
+    return f"sacct {sacct_args} --json | jq -c {shlex.quote(program)}"
+
+
+def _sacct_result(accounting, options, cluster_name, region):
     if accounting == "":
         return {"jobs": []}
-    accounting_ret = {"jobs": json.loads(accounting)}
-    if "jobs" in sacct_args and price_guess:
-        accounting_ret["jobs"][0]["price_estimate"] = price_guess
+    page = json.loads(accounting)
+    accounting_ret = {"jobs": page["jobs"]}
+    if page.get("next"):
+        accounting_ret["next_cursor"] = _encode_sacct_cursor(page["next"])
+
+    if "jobs" in options and accounting_ret["jobs"] and "partition" in accounting_ret["jobs"][0]:
+        # Try to retrieve relevant cost information
+        job = accounting_ret["jobs"][0]
+        estimates = _price_estimates(cluster_name, region, job["partition"])
+        compute_resource = _job_compute_resource(job, job["partition"], estimates)
+        if compute_resource is None and len(estimates) == 1:
+            compute_resource = next(iter(estimates))
+        price_guess = estimates.get(compute_resource)
+        if price_guess:
+            job["price_estimate"] = price_guess
     return accounting_ret
 
 
+def _scontrol_job_result(output):
+    kvs = [jd.split("=", 1) for jd in output.strip().split(" ")]
+    return {k: v for k, v in kvs}
+
+
 def scontrol_job():
     user = request.args.get("user", "ec2-user")
     instance_id = request.args.get("instance_id")
@@ -366,78 +600,169 @@ def scontrol_job():
     if not job_id:
         return {"message": "You must specify a job id."}, 400
 
-    job_data = (
-        ssm_command(request.args.get("region"), instance_id, user, f"scontrol show job {job_id} -o").strip().split(" ")
-    )
-    if isinstance(job_data, tuple):
-        return job_data
+    return _scontrol_job_result(ssm_command(request.args.get("region"), instance_id, user,
+                                            f"scontrol show job {job_id} -o"))
+
+
+SQUEUE_COMMAND = "squeue --json | jq .jobs\\|\\map\\({name,nodes,partition,job_state,job_id,time\\}\\)"
+
+
+def _squeue_result(jobs):
+    return [] if jobs == "" else json.loads(jobs)
+
 
-    kvs = [jd.split("=", 1) for jd in job_data]
-    job_info = {k: v for k, v in kvs}
-    return job_info
+def _queued_jobs(region, instance_id, user):
+    """ Returns (stored_at, jobs), every open tab polls the queue so concurrent polls share a single SSM command """
+    def squeue():
+        return _squeue_result(ssm_command(region, instance_id, user, SQUEUE_COMMAND))
+
+    return slurm_queries.get_or_load_entry(("squeue", region, instance_id, user), squeue)
+
+
+def _queue_delta(region, instance_id, user, since, wait=0):
+    """
+    Returns (stored_at, delta) of the queue since the given version, waiting up to
+    `wait` seconds for a change when the queue is unchanged.
+    """
+    key = (region, instance_id, user)
+    deadline = time.time() + wait
+    while True:
+        stored_at, jobs = _queued_jobs(region, instance_id, user)
+        delta = job_snapshots.delta(key, since, jobs)
+        now = time.time()
+        if delta["version"] != since or now >= deadline:
+            return stored_at, delta
+        # the queue is refreshed when its cache entry expires
+        time.sleep(max(0.5, min(deadline - now, stored_at + SLURM_QUERY_CACHE_TTL - now)))
 
 
 def queue_status():
     user = request.args.get("user", "ec2-user")
     instance_id = request.args.get("instance_id")
+    region = request.args.get("region")
+    since = request.args.get("since")
 
-    jobs = ssm_command(
-        request.args.get("region"),
-        instance_id,
-        user,
-        "squeue --json | jq .jobs\\|\\map\\({name,nodes,partition,job_state,job_id,time\\}\\)",
-    )
+    if since is None:
+        stored_at, jobs = _queued_jobs(region, instance_id, user)
+        body = {"jobs": jobs, "version": job_snapshots.record((region, instance_id, user), jobs)}
+    else:
+        stored_at, body = _queue_delta(region, instance_id, user, since, int(request.args.get("wait", 0)))
+    return body, 200, {"Age": str(max(0, int(time.time() - stored_at)))}
 
-    return {"jobs": []} if jobs == "" else {"jobs": json.loads(jobs)}
 
+def queue_events_supported():
+    """ Server-Sent Events need the responses sent as produced: by uWSGI or the response streaming Lambda entrypoint """
+    return LAMBDA_RESPONSE_STREAMING or not os.getenv("AWS_LAMBDA_FUNCTION_NAME")
 
-def cancel_job():
+
+def _queue_events_duration():
+    """ QUEUE_EVENTS_MAX_DURATION, ended early enough on Lambda for the client to resume before the timeout """
+    context = request.environ.get("serverless.context")
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return QUEUE_EVENTS_MAX_DURATION
+    return max(0, min(QUEUE_EVENTS_MAX_DURATION, context.get_remaining_time_in_millis() / 1000 - 5))
+
+
+def queue_events():
+    """ Server-Sent Events stream of the queue deltas, resumed from the Last-Event-ID header """
     user = request.args.get("user", "ec2-user")
     instance_id = request.args.get("instance_id")
-    job_id = request.args.get("job_id")
-    ssm_command(request.args.get("region"), instance_id, user, f"scancel {job_id}")
-    return {"status": "success"}
+    region = request.args.get("region")
+    since = request.headers.get("Last-Event-ID", request.args.get("since", ""))
+    duration = _queue_events_duration()
 
+    def events():
+        version = since
+        deadline = time.time() + duration
+        while time.time() < deadline:
+            _, delta = _queue_delta(region, instance_id, user, version,
+                                    wait=min(QUEUE_EVENTS_KEEPALIVE, max(0, deadline - time.time())))
+            if delta["version"] == version:
+                yield ": keepalive\n\n"
+                continue
+            version = delta["version"]
+            yield f"id: {version}\nevent: delta\ndata: {json.dumps(delta, separators=(',', ':'))}\n\n"
 
-def get_dcv_session():
-    start = time.time()
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def cancel_job():
     user = request.args.get("user", "ec2-user")
     instance_id = request.args.get("instance_id")
-    dcv_command = "/opt/parallelcluster/scripts/pcluster_dcv_connect.sh"
-    session_directory = f"/home/{user}"
+    job_id = request.args.get("job_id")
+    region = request.args.get("region")
+    ssm_command(region, instance_id, user, f"scancel {job_id}")
+    slurm_queries.invalidate(lambda key: key[1:3] == (region, instance_id))
+    return {"status": "success"}
 
-    if request.args.get("region"):
-        config = botocore.config.Config(region_name=request.args.get("region"))
-        ssm = boto3.client("ssm", config=config)
-    else:
-        ssm = boto3.client("ssm")
 
-    command = f"runuser -l {user} -c '{dcv_command} {session_directory}'"
+def _slurm_batch_command(command, cluster_name, region):
+    """ Returns the Slurm command of a sub-command of a batch and the parser of its output """
+    kind = command["type"]
+    if kind == "queue_status":
+        return SQUEUE_COMMAND, _squeue_result
+    if kind == "scontrol_job":
+        return f"scontrol show job {command['job_id']} -o", _scontrol_job_result
+    if kind == "cancel_job":
+        return f"scancel {command['job_id']}", lambda _: {"status": "success"}
+    options = command.get("options", {})
+    return (_sacct_command(options, command.get("fields"), int(command.get("limit", SACCT_PAGE_SIZE)),
+                           command.get("cursor")),
+            lambda output: _sacct_result(output, options, cluster_name, region))
 
-    ssm_resp = ssm.send_command(
-        InstanceIds=[instance_id],
-        DocumentName="AWS-RunShellScript",
-        Comment="Create DCV Session",
-        Parameters={"commands": [command]},
-    )
 
-    command_id = ssm_resp["Command"]["CommandId"]
+def slurm_batch():
+    """ Runs several Slurm commands on the head node with a single SSM command """
+    body = request.json
+    user = body.get("user", "ec2-user")
+    instance_id = body["instance_id"]
+    region = body["region"]
+    commands = body["commands"]
 
-    # Wait for command to complete
-    time.sleep(0.75)
-    while time.time() - start < 15:
-        status = ssm.get_command_invocation(CommandId=command_id, InstanceId=instance_id)
-        if status["Status"] != "InProgress":
-            break
-        time.sleep(0.75)
+    try:
+        prepared = [_slurm_batch_command(command, body.get("cluster_name"), region) for command in commands]
+    except ValueError:
+        return {"message": "Invalid cursor."}, 400
+    batch = CommandBatch(_user_command(user, run_command) for run_command, _ in prepared)
+    output = _run_ssm_command(region, instance_id, "\n".join(batch.script()), "Run batched ssm commands.", "batch",
+                              "Timed out waiting for command to complete.")
+
+    results = []
+    for command, (_, parse), outcome in zip(commands, prepared, batch.demultiplex(output)):
+        result = {"type": command["type"]}
+        if "id" in command:
+            result["id"] = command["id"]
+        if outcome["exit_code"] is None:
+            result["error"] = "Missing command output, the output of the batch may have been truncated."
+        elif outcome["exit_code"] != 0:
+            result["error"] = outcome["stderr"] or f"Command exited with status {outcome['exit_code']}."
+        else:
+            try:
+                result["data"] = parse(outcome["stdout"])
+            except Exception as e:
+                result["error"] = str(e)
+        results.append(result)
+
+    if any(command["type"] == "cancel_job" for command in commands):
+        slurm_queries.invalidate(lambda key: key[1:3] == (region, instance_id))
+    else:
+        for result in results:
+            if result["type"] == "queue_status" and "data" in result:
+                slurm_queries.set(("squeue", region, instance_id, user), result["data"])
 
-    if time.time() - start > 15:
-        raise Exception("Timed out waiting for dcv session to start.")
+    return {"results": results}
 
-    if status["Status"] != "Success":
-        raise Exception(status["StandardErrorContent"])
 
-    output = status["StandardOutputContent"]
+def get_dcv_session():
+    user = request.args.get("user", "ec2-user")
+    instance_id = request.args.get("instance_id")
+    dcv_command = "/opt/parallelcluster/scripts/pcluster_dcv_connect.sh"
+    session_directory = f"/home/{user}"
+
+    command = f"runuser -l {user} -c '{dcv_command} {session_directory}'"
+    output = _run_ssm_command(request.args.get("region"), instance_id, command, "Create DCV Session", "dcv",
+                              "Timed out waiting for dcv session to start.")
 
     dcv_parameters = re.search(
         r"PclusterDcvServerPort=([\d]+) PclusterDcvSessionId=([\w]+) PclusterDcvSessionToken=([\w-]+)", output
@@ -456,79 +781,111 @@ def get_dcv_session():
 
 def get_custom_image_config():
     image_info = sigv4_request("GET", API_BASE_URL, f"/v3/images/custom/{request.args.get('image_id')}").json()
-    configuration = requests.get(image_info["imageConfiguration"]["url"])
+    configuration = http.get(image_info["imageConfiguration"]["url"])
     return configuration.text
 
 
-def get_aws_config():
-    if request.args.get("region"):
-        config = botocore.config.Config(region_name=request.args.get("region"))
-        ec2 = boto3.client("ec2", config=config)
-        fsx = boto3.client("fsx", config=config)
-        efs = boto3.client("efs", config=config)
-    else:
-        ec2 = boto3.client("ec2")
-        fsx = boto3.client("fsx")
-        efs = boto3.client("efs")
-
-    keypairs = ec2.describe_key_pairs()["KeyPairs"]
-    vpcs = ec2.describe_vpcs()["Vpcs"]
-    subnets = ec2.describe_subnets()["Subnets"]
-
-    security_groups = ec2.describe_security_groups()["SecurityGroups"]
-    security_groups = [{k: sg[k] for k in {"GroupId", "GroupName"}} for sg in security_groups]
-
+def _describe_efa_instance_types(ec2):
     efa_filters = [{"Name": "network-info.efa-supported", "Values": ["true"]}]
     instance_paginator = ec2.get_paginator("describe_instance_types")
     efa_instances_paginator = instance_paginator.paginate(Filters=efa_filters)
     efa_instance_types = []
     for efa_instances in efa_instances_paginator:
         efa_instance_types += [e["InstanceType"] for e in efa_instances["InstanceTypes"]]
+    return efa_instance_types
 
-    fsx_filesystems = []
-    try:
-        fsx_filesystems = fsx.describe_file_systems()["FileSystems"]
-    except:
-        pass
 
-    fsx_volumes = []
-    try:
-        fsx_volumes = list(filter(lambda vol: (vol["Lifecycle"] == "CREATED" or vol["Lifecycle"] == "AVAILABLE"),
-                                  fsx.describe_volumes()["Volumes"]))
-    except:
-        pass
+def _describe_security_groups(ec2):
+    security_groups = ec2.describe_security_groups()["SecurityGroups"]
+    return [{k: sg[k] for k in {"GroupId", "GroupName"}} for sg in security_groups]
+
+
+def _describe_fsx_volumes(fsx):
+    return list(filter(lambda vol: (vol["Lifecycle"] == "CREATED" or vol["Lifecycle"] == "AVAILABLE"),
+                       fsx.describe_volumes()["Volumes"]))
 
-    efs_filesystems = []
+
+def _aws_config_scope(region):
+    """ (account, region) of the cached discovery results, the account is None when it cannot be retrieved """
     try:
-        efs_filesystems = efs.describe_file_systems()["FileSystems"]
-    except:
-        pass
+        account_id = boto_clients.account_id()
+    except Exception as e:
+        logging.warning("Unable to retrieve the account id, caching discovery results per region: %s", e)
+        account_id = None
+    return account_id, region or boto_clients.default_region()
+
+
+def get_aws_config():
+    region = request.args.get("region")
+    ec2 = boto_clients.client("ec2", region)
+    fsx = boto_clients.client("fsx", region)
+    efs = boto_clients.client("efs", region)
+
+    calls = {
+        "keypairs": lambda: ec2.describe_key_pairs()["KeyPairs"],
+        "vpcs": lambda: ec2.describe_vpcs()["Vpcs"],
+        "subnets": lambda: ec2.describe_subnets()["Subnets"],
+        "security_groups": lambda: _describe_security_groups(ec2),
+        "efa_instance_types": lambda: _describe_efa_instance_types(ec2),
+        "fsx_filesystems": lambda: fsx.describe_file_systems()["FileSystems"],
+        "fsx_volumes": lambda: _describe_fsx_volumes(fsx),
+        "efs_filesystems": lambda: efs.describe_file_systems()["FileSystems"],
+    }
+    cache_scope = _aws_config_scope(region)
+
+    outcomes = {}
+    for name in calls:
+        cached = aws_config_cache.get((name, *cache_scope))
+        if cached is not None:
+            outcomes[name] = CallOutcome(result=cached)
+
+    # the discovery calls are independent, run them concurrently
+    fetched = fan_out({name: call for name, call in calls.items() if name not in outcomes})
+    for name, outcome in fetched.items():
+        if outcome.error is None:
+            aws_config_cache.set((name, *cache_scope), outcome.result)
+    outcomes.update(fetched)
+    logger.info("get_aws_config calls timing",
+                extra={"timings_ms": {name: round(o.elapsed_ms, 1) for name, o in fetched.items()},
+                       "cached": [name for name in calls if name not in fetched]})
 
     region = ""
     try:
-        region = boto3.Session().region_name
+        region = boto_clients.default_region()
     except:
         pass
 
-    return {
-        "security_groups": security_groups,
-        "keypairs": keypairs,
-        "vpcs": vpcs,
-        "subnets": subnets,
+    aws_config = {
+        "security_groups": outcomes["security_groups"].value(),
+        "keypairs": outcomes["keypairs"].value(),
+        "vpcs": outcomes["vpcs"].value(),
+        "subnets": outcomes["subnets"].value(),
         "region": region,
-        "fsx_filesystems": fsx_filesystems,
-        "fsx_volumes": fsx_volumes,
-        "efs_filesystems": efs_filesystems,
-        "efa_instance_types": efa_instance_types,
+        "fsx_filesystems": outcomes["fsx_filesystems"].value(default=[]),
+        "fsx_volumes": outcomes["fsx_volumes"].value(default=[]),
+        "efs_filesystems": outcomes["efs_filesystems"].value(default=[]),
+        "efa_instance_types": outcomes["efa_instance_types"].value(),
     }
+    return aws_config, 200, {"Server-Timing": server_timing(fetched)} if fetched else {}
 
 
 def get_instance_types():
-    if request.args.get("region"):
-        config = botocore.config.Config(region_name=request.args.get("region"))
-        ec2 = boto3.client("ec2", config=config)
-    else:
-        ec2 = boto3.client("ec2")
+    region = request.args.get("region")
+    cache_key = ("instance_types", *_aws_config_scope(region))
+    instance_types = aws_config_cache.get_or_load(cache_key, lambda: _describe_instance_types(region))
+    return {"instance_types": instance_types}
+
+
+def invalidate_aws_config_cache():
+    region = request.args.get("region")
+    kind = request.args.get("kind")
+    invalidated = aws_config_cache.invalidate(
+        lambda key: (kind is None or key[0] == kind) and (region is None or key[2] == region))
+    return {"invalidated": invalidated}
+
+
+def _describe_instance_types(region):
+    ec2 = boto_clients.client("ec2", region)
     filters = [
         {"Name": "current-generation", "Values": ["true"]},
         {"Name": "instance-type",
@@ -545,7 +902,7 @@ def get_instance_types():
             ret_e["VCpuInfo"] = {"DefaultVCpus": e["VCpuInfo"]["DefaultVCpus"]}
             ret_e["GpuInfo"] = e.get("GpuInfo", {"Gpus": [{}]})["Gpus"][0]
             instance_types.append(ret_e)
-    return {"instance_types": sorted(instance_types, key=lambda x: x["InstanceType"])}
+    return sorted(instance_types, key=lambda x: x["InstanceType"])
 
 
 def _get_identity_from_token(decoded, claims):
@@ -571,11 +928,11 @@ def get_identity():
 
     claims = ["email"]
     try:
-        decoded_access = jwt_decode(access_token)
-    except jwt.ExpiredSignatureError:
+        decoded_access = decode_access_token(access_token)
+    except ExpiredSignatureError:
         access_token = auth_cookies.get('accessToken')
         id_token = auth_cookies.get('idToken')
-        decoded_access = jwt_decode(access_token)
+        decoded_access = decode_access_token(access_token)
 
     identity = _get_identity_from_token(decoded=decoded_access, claims=claims)
 
@@ -603,19 +960,19 @@ def _augment_user(cognito, user):
 
 
 def list_users():
-    cognito = boto3.client("cognito-idp")
+    cognito = boto_clients.client("cognito-idp")
     users = cognito.list_users(UserPoolId=USER_POOL_ID)["Users"]
     return {"users": [_augment_user(cognito, user) for user in users]}
 
 
 def delete_user():
-    cognito = boto3.client("cognito-idp")
+    cognito = boto_clients.client("cognito-idp")
     username = request.args.get("username")
     cognito.admin_delete_user(UserPoolId=USER_POOL_ID, Username=username)
     return {"Username": username}
 
 def create_user():
-    cognito = boto3.client("cognito-idp")
+    cognito = boto_clients.client("cognito-idp")
     username = request.json.get("Username")
     phone_number = request.json.get("Phonenumber")
     user_attributes = [{"Name": "email", "Value": username}]
@@ -635,7 +992,7 @@ def login():
     grant_type = "authorization_code"
 
     url = TOKEN_URL
-    code_resp = requests.post(
+    code_resp = http.post(
         url,
         data={"grant_type": grant_type, "code": code, "client_id": CLIENT_ID, "redirect_uri": get_redirect_uri()},
         auth=auth,
@@ -658,6 +1015,10 @@ def login():
 
 
 def logout():
+    access_token = request.cookies.get('accessToken', None)
+    if access_token is not None:
+        verified_tokens.invalidate(access_token)
+
     refresh_token = request.cookies.get('refreshToken', None)
     if refresh_token is not None:
         revoke_cognito_refresh_token(refresh_token)
@@ -671,7 +1032,7 @@ def logout():
 
 def revoke_cognito_refresh_token(refresh_token):
     auth = requests.auth.HTTPBasicAuth(CLIENT_ID, CLIENT_SECRET)
-    revoke_resp = requests.post(
+    revoke_resp = http.post(
         REVOKE_REFRESH_TOKEN_URL,
         data={"token": refresh_token},
         auth=auth,
@@ -697,6 +1058,13 @@ def _get_params(_request):
     return params
 
 
+def _invalidate_cluster_config(path, region=None):
+    """ Drops the cached configuration of the cluster targeted by a mutating ParallelCluster API call """
+    match = re.match(r"^/v3/clusters/([^/?]+)", path or "")
+    if match:
+        cluster_configs.invalidate(match.group(1), region)
+
+
 pc = Blueprint('pc', __name__)
 
 @pc.get('/', strict_slashes=False)
@@ -718,4 +1086,5 @@ def pc_proxy():
         pass
 
     response = sigv4_request(request.method, API_BASE_URL, request.args.get("path"), _get_params(request), body=body)
+    _invalidate_cluster_config(request.args.get("path"), request.args.get("region"))
     return response.json(), response.status_code
\ No newline at end of file
@@ -0,0 +1 @@
+from api.agent.client import AgentUnavailable, HeadNodeAgents, LocalTunnel, SsmPortForwardingTunnel, install_script
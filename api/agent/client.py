@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import os
+import socket
+import subprocess
+import threading
+import time
+
+import requests
+
+from api.clients.sessions import http
+from api.metrics import Counters, Histogram
+
+AGENT_DIR = "/opt/pcluster-manager"
+AGENT_SOURCE = os.path.join(os.path.dirname(__file__), "server.py")
+
+
+class AgentUnavailable(Exception):
+    """ Raised when no channel to the head node agent can be used, callers fall back to SSM RunCommand """
+
+
+def install_script(port, source=None):
+    """
+    Shell script, run as root through SSM, starting the agent unless the same
+    version already runs. Its token is only written to a root-only file, the
+    output of the command being kept in the SSM command history.
+    """
+    if source is None:
+        with open(AGENT_SOURCE) as f:
+            source = f.read()
+    version = hashlib.sha256(source.encode()).hexdigest()[:12]
+    path = f"{AGENT_DIR}/agent-{version}.py"
+    token_file = f"{AGENT_DIR}/agent.token"
+    return "\n".join([
+        f"mkdir -p {AGENT_DIR} && chmod 700 {AGENT_DIR}",
+        f"if ! pgrep -f '^python3 {path}' >/dev/null; then",
+        f"  pkill -f '^python3 {AGENT_DIR}/agent-' || true",
+        f"  cat > {path} <<'PCM_AGENT_EOF'",
+        source.rstrip("\n"),
+        "PCM_AGENT_EOF",
+        f"  (umask 077; python3 -c 'import secrets; print(secrets.token_hex(32))' > {token_file})",
+        f"  nohup python3 {path} --port {port} --token-file {token_file}"
+        f" </dev/null >>/var/log/pcluster-manager-agent.log 2>&1 &",
+        "fi",
+    ])
+
+
+def _free_local_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalTunnel(object):
+    """ Direct connection to an agent listening on this host, e.g. a local stand-in agent """
+
+    def __init__(self, region, instance_id, remote_port):
+        self.local_port = remote_port
+
+    def alive(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class SsmPortForwardingTunnel(object):
+    """
+    SSM port forwarding session from a local port to the agent port of the head node.
+
+    Requires the AWS CLI and the Session Manager plugin, so it is only usable
+    where the API runs as a long-lived process (not on Lambda).
+    """
+
+    def __init__(self, region, instance_id, remote_port):
+        self.local_port = _free_local_port()
+        self._process = subprocess.Popen(
+            ["aws", "ssm", "start-session", "--target", instance_id, "--region", region,
+             "--document-name", "AWS-StartPortForwardingSession",
+             "--parameters", f"portNumber={remote_port},localPortNumber={self.local_port}"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def alive(self):
+        return self._process.poll() is None
+
+    def close(self):
+        if self.alive():
+            self._process.terminate()
+
+
+class HeadNodeAgents(object):
+    """
+    Channels to the agents of the cluster head nodes, keyed by (region, instance id).
+
+    A channel is opened on the first query of a head node: the agent is deployed
+    (or found already running) by `deploy`, then a tunnel to its port is opened
+    and the token of the agent is read through it. Failed channels are only
+    retried after `retry_interval` seconds, callers use SSM RunCommand in the
+    meantime.
+
+    :param deploy: callable(region, instance_id, port) starting the agent
+    :param tunnel_factory: callable(region, instance_id, port) returning a tunnel
+    """
+
+    def __init__(self, deploy, tunnel_factory=SsmPortForwardingTunnel, port=8765, timeout=60, connect_timeout=15,
+                 retry_interval=60, clock=time.monotonic):
+        self.deploy = deploy
+        self.tunnel_factory = tunnel_factory
+        self.port = port
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._channels = {}
+        self._failures = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.counters = Counters('connects', 'connect_failures', 'queries', 'query_failures')
+        self.latency = Histogram()
+
+    def stats(self):
+        return {**self.counters.snapshot(), 'channels': len(self._channels), 'latency': self.latency.snapshot()}
+
+    def run(self, region, instance_id, user, command):
+        """ Returns the stdout of the command run as user on the head node, raises AgentUnavailable """
+        key = (region, instance_id)
+        tunnel, token = self._channel(key)
+        start = time.perf_counter()
+        try:
+            resp = http.post(f"http://127.0.0.1:{tunnel.local_port}/run", json={"user": user, "command": command},
+                             headers={"Authorization": f"Bearer {token}"}, timeout=(3.05, self.timeout))
+            if resp.status_code != 400:
+                resp.raise_for_status()
+            result = resp.json()
+        except (requests.RequestException, ValueError) as e:
+            self.counters.incr('query_failures')
+            self._drop(key)
+            raise AgentUnavailable(f"Head node agent query failed: {e}")
+        if resp.status_code == 400:
+            # e.g. root or a system user, rejected by the agent whatever the channel
+            raise Exception(result["message"])
+        self.counters.incr('queries')
+        self.latency.observe((time.perf_counter() - start) * 1000)
+
+        if result["exit_code"] != 0:
+            raise Exception(result["stderr"])
+        return result["stdout"]
+
+    def close(self):
+        with self._lock:
+            channels, self._channels = self._channels, {}
+        for tunnel, _ in channels.values():
+            tunnel.close()
+
+    def _channel(self, key):
+        channel = self._channels.get(key)
+        if channel is not None and channel[0].alive():
+            return channel
+
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            channel = self._channels.get(key)
+            if channel is not None and channel[0].alive():
+                return channel
+            failed_at = self._failures.get(key)
+            if failed_at is not None and self._clock() - failed_at < self.retry_interval:
+                raise AgentUnavailable("Head node agent recently unavailable")
+            try:
+                channel = self._connect(*key)
+            except Exception as e:
+                logging.warning("Unable to open a channel to the agent of %s: %s", key[1], e)
+                self.counters.incr('connect_failures')
+                self._failures[key] = self._clock()
+                raise AgentUnavailable(str(e))
+            self.counters.incr('connects')
+            self._failures.pop(key, None)
+            with self._lock:
+                self._channels[key] = channel
+            return channel
+
+    def _connect(self, region, instance_id):
+        self.deploy(region, instance_id, self.port)
+        tunnel = self.tunnel_factory(region, instance_id, self.port)
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                http.get(f"http://127.0.0.1:{tunnel.local_port}/health", timeout=1).raise_for_status()
+                break
+            except requests.RequestException:
+                if time.monotonic() >= deadline or not tunnel.alive():
+                    tunnel.close()
+                    raise
+                time.sleep(0.2)
+        try:
+            # only served to the root-owned sockets of the port forwarding session
+            resp = http.get(f"http://127.0.0.1:{tunnel.local_port}/token", timeout=3.05)
+            resp.raise_for_status()
+            return tunnel, resp.json()["token"]
+        except Exception:
+            tunnel.close()
+            raise
+
+    def _drop(self, key):
+        with self._lock:
+            channel = self._channels.pop(key, None)
+        if channel is not None:
+            channel[0].close()
@@ -0,0 +1,157 @@
+"""
+Agent serving the Slurm queries of pcluster-manager on a cluster head node.
+
+It is copied to the head node and started once through SSM, then queried over
+an SSM port forwarding session, saving the RunCommand scheduling overhead of
+every query. It only listens on the loopback interface, requires a bearer token
+and only depends on the standard library of the Python 3 of the head node.
+
+The token is only kept in a root-only file, it is never printed in the output
+of the SSM commands (kept in the command history). pcluster-manager reads it
+from `/token` over the port forwarding session: the SSM agent forwarding the
+connections runs as root, while the other users of the head node can connect
+to the loopback interface too, so `/token` is only served to connections from
+sockets owned by root.
+"""
+import argparse
+import hmac
+import json
+import pwd
+import re
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+DEFAULT_PORT = 8765
+DEFAULT_TIMEOUT = 60
+USERNAME = re.compile(r"^[a-z_][a-z0-9_.-]{0,63}$")
+TOKEN_READER_UIDS = (0,)
+
+
+def _login_defs(names, path="/etc/login.defs"):
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 2 and fields[0] in names and fields[1].isdigit():
+                    values[fields[0]] = int(fields[1])
+    except OSError:
+        pass
+    return values
+
+
+def regular_user(user):
+    """ Whether commands may be run as the user: root, system accounts and nobody are rejected """
+    if not USERNAME.match(user):
+        return False
+    try:
+        uid = pwd.getpwnam(user).pw_uid
+    except KeyError:
+        return False
+    login_defs = _login_defs({"UID_MIN", "UID_MAX"})
+    return login_defs.get("UID_MIN", 1000) <= uid <= login_defs.get("UID_MAX", 60000)
+
+
+def peer_uid(client_port, server_port, proc_net_tcp="/proc/net/tcp"):
+    """ Owner of the loopback socket connected from client_port to server_port, None if it is not found """
+    with open(proc_net_tcp) as f:
+        next(f)
+        for line in f:
+            fields = line.split()
+            if (int(fields[1].rsplit(":", 1)[1], 16) == client_port
+                    and int(fields[2].rsplit(":", 1)[1], 16) == server_port):
+                return int(fields[7])
+    return None
+
+
+def run_as_user(user, command, timeout):
+    """ Runs the command as `runuser -l {user} -c {command}` like the SSM RunCommand path """
+    proc = subprocess.run(["runuser", "-l", user, "-c", command], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          timeout=timeout)
+    return proc.returncode, proc.stdout.decode(), proc.stderr.decode()
+
+
+class AgentServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, token, runner=run_as_user, timeout=DEFAULT_TIMEOUT, allowed_user=regular_user,
+                 token_reader_uids=TOKEN_READER_UIDS):
+        super().__init__(address, AgentRequestHandler)
+        self.token = token
+        self.runner = runner
+        self.timeout = timeout
+        self.allowed_user = allowed_user
+        self.token_reader_uids = token_reader_uids
+
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/token":
+            uid = peer_uid(self.client_address[1], self.server.server_address[1])
+            if uid not in self.server.token_reader_uids:
+                return self._reply(403, {"message": "Forbidden"})
+            return self._reply(200, {"token": self.server.token})
+        if self.path != "/health":
+            return self._reply(404, {"message": "Not found"})
+        self._reply(200, {"status": "ok"})
+
+    def do_POST(self):
+        if self.path != "/run":
+            return self._reply(404, {"message": "Not found"})
+        authorization = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(authorization.encode(), f"Bearer {self.server.token}".encode()):
+            return self._reply(401, {"message": "Unauthorized"})
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            user, command = body["user"], body["command"]
+        except (ValueError, KeyError, TypeError):
+            return self._reply(400, {"message": "Expected a JSON body with user and command"})
+        if not self.server.allowed_user(user):
+            return self._reply(400, {"message": "Invalid user"})
+
+        try:
+            exit_code, stdout, stderr = self.server.runner(user, command, self.server.timeout)
+        except subprocess.TimeoutExpired:
+            return self._reply(504, {"message": "Timed out waiting for command to complete."})
+        self._reply(200, {"exit_code": exit_code, "stdout": stdout, "stderr": stderr})
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve_in_thread(token, port=0, host="127.0.0.1", runner=run_as_user, timeout=DEFAULT_TIMEOUT,
+                    allowed_user=regular_user, token_reader_uids=TOKEN_READER_UIDS):
+    """ Starts an agent in a background thread, e.g. as a local stand-in of the head node agent """
+    server = AgentServer((host, port), token, runner=runner, timeout=timeout, allowed_user=allowed_user,
+                         token_reader_uids=token_reader_uids)
+    threading.Thread(target=server.serve_forever, name="pcm-agent", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token-file", required=True)
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT)
+    args = parser.parse_args()
+
+    with open(args.token_file) as f:
+        token = f.read().strip()
+    AgentServer(("127.0.0.1", args.port), token, timeout=args.timeout).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from api.cache.ttl_cache import TTLCache, parse_ttls
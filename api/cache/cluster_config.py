@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+from api.cache.ttl_cache import TTLCache
+from api.metrics import Counters
+
+DEFAULT_DESCRIBE_TTL = 30
+DEFAULT_MAX_SIZE = 256
+
+
+class ClusterConfiguration(object):
+    """ Raw text of a cluster configuration, its YAML parsed lazily and a queue name index """
+
+    def __init__(self, text, version=None, etag=None):
+        self.text = text
+        self.version = version
+        self.etag = etag
+        self._data = None
+        self._queues = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    import yaml
+                    self._data = yaml.safe_load(self.text)
+        return self._data
+
+    @property
+    def queues(self):
+        if self._queues is None:
+            self._queues = {q["Name"]: q for q in self.data["Scheduling"]["SlurmQueues"]}
+        return self._queues
+
+    def compute_resources(self, queue_name):
+        return self.queues[queue_name]["ComputeResources"]
+
+    def with_version(self, version):
+        """ Same configuration, parsed data included, known under a new version """
+        config = ClusterConfiguration(self.text, version, self.etag)
+        config._data, config._queues = self._data, self._queues
+        return config
+
+
+class ClusterConfigCache(object):
+    """
+    Cache of cluster configurations keyed by (region, cluster name, version).
+
+    The cluster description, which holds the configuration version (its last
+    update time) and the presigned url of the configuration, is kept for
+    `describe_ttl` seconds. The configuration is downloaded again only when
+    the version changes, and even then the download is conditional on the
+    ETag of the cached configuration.
+    """
+
+    def __init__(self, describe_ttl=DEFAULT_DESCRIBE_TTL, max_size=DEFAULT_MAX_SIZE, clock=time.time):
+        self._descriptions = TTLCache("cluster_descriptions", describe_ttl, max_size=max_size, clock=clock)
+        self._configs = OrderedDict()
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self.counters = Counters('hits', 'downloads', 'not_modified', 'invalidations')
+
+    def stats(self):
+        return {**self.counters.snapshot(), 'size': len(self._configs), 'descriptions': self._descriptions.stats()}
+
+    def get(self, region, cluster_name, describe, download):
+        """
+        :param describe: callable returning the cluster description of the ParallelCluster API
+        :param download: callable(url, etag) returning the response of the configuration download
+        """
+        key = (region, cluster_name)
+        description = self._descriptions.get_or_load(("cluster", *key), lambda: self._describe(describe))
+        version = description["version"]
+
+        with self._lock:
+            config = self._configs.get(key)
+        if config is not None and version is not None and config.version == version:
+            self.counters.incr('hits')
+            return config
+
+        self.counters.incr('downloads')
+        resp = download(description["url"], config.etag if config is not None else None)
+        if resp.status_code == 304 and config is not None:
+            self.counters.incr('not_modified')
+            config = config.with_version(version)
+        elif resp.status_code == 200:
+            config = ClusterConfiguration(resp.text, version, resp.headers.get("ETag"))
+        else:
+            return ClusterConfiguration(resp.text)
+
+        with self._lock:
+            self._configs[key] = config
+            self._configs.move_to_end(key)
+            while len(self._configs) > self.max_size:
+                self._configs.popitem(last=False)
+        return config
+
+    def invalidate(self, cluster_name, region=None):
+        def matches(key):
+            return key[-1] == cluster_name and (region is None or key[-2] == region)
+
+        self._descriptions.invalidate(matches)
+        with self._lock:
+            for key in [key for key in self._configs if matches(key)]:
+                del self._configs[key]
+                self.counters.incr('invalidations')
+
+    @staticmethod
+    def _describe(describe):
+        cluster_info = describe()
+        return {
+            "version": cluster_info.get("lastUpdatedTime"),
+            "url": cluster_info["clusterConfiguration"]["url"],
+        }
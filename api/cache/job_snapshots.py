@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from api.metrics import Counters
+
+DEFAULT_MAX_VERSIONS = 8
+DEFAULT_MAX_KEYS = 256
+
+
+def jobs_version(jobs):
+    """ Content hash of a job list, identical across workers for identical lists """
+    data = json.dumps(jobs, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class JobSnapshots(object):
+    """
+    Recent snapshots of the job queue of each head node, used to send deltas.
+
+    Snapshots are identified by the content hash of their jobs, so that a
+    version returned by a worker (or Lambda container) can be resolved by any
+    other one that saw the same queue. When the version a client has is not
+    known, the full job list is sent instead of a delta.
+    """
+
+    def __init__(self, max_versions=DEFAULT_MAX_VERSIONS, max_keys=DEFAULT_MAX_KEYS):
+        self.max_versions = max_versions
+        self.max_keys = max_keys
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = Counters('deltas', 'resets', 'unchanged')
+
+    def stats(self):
+        return {**self.counters.snapshot(), 'keys': len(self._snapshots)}
+
+    def record(self, key, jobs):
+        """ Stores the jobs as the latest snapshot of the key and returns its version """
+        version = jobs_version(jobs)
+        with self._lock:
+            versions = self._snapshots.setdefault(key, OrderedDict())
+            self._snapshots.move_to_end(key)
+            if version not in versions:
+                versions[version] = {job["job_id"]: job for job in jobs}
+            versions.move_to_end(version)
+            while len(versions) > self.max_versions:
+                versions.popitem(last=False)
+            while len(self._snapshots) > self.max_keys:
+                self._snapshots.popitem(last=False)
+        return version
+
+    def delta(self, key, since, jobs):
+        """
+        Records the jobs and returns the changes since the given version:
+        {"version", "since", "added", "removed", "changed"}, or {"version", "reset", "jobs"}
+        when the version is unknown.
+        """
+        version = self.record(key, jobs)
+        with self._lock:
+            previous = self._snapshots.get(key, {}).get(since) if since else None
+
+        if previous is None:
+            self.counters.incr('resets')
+            return {"version": version, "reset": True, "jobs": jobs}
+
+        current = {job["job_id"]: job for job in jobs}
+        delta = {
+            "version": version,
+            "since": since,
+            "added": [job for job_id, job in current.items() if job_id not in previous],
+            "removed": [job_id for job_id in previous if job_id not in current],
+            "changed": [job for job_id, job in current.items() if job_id in previous and previous[job_id] != job],
+        }
+        self.counters.incr('unchanged' if version == since else 'deltas')
+        return delta
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from api.metrics import Counters
+
+
+def parse_ttls(spec):
+    """ Parses per kind TTLs expressed as 'kind=seconds,kind=seconds' """
+    ttls = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            kind, ttl = item.split("=", 1)
+            ttls[kind.strip()] = int(ttl)
+    return ttls
+
+
+class TTLCache(object):
+    """
+    Thread-safe in-memory cache whose entries expire after a TTL.
+
+    Keys are tuples whose first element is the kind of the cached resource, each
+    kind can have its own TTL. When `persist_dir` is set, entries are also written
+    as JSON files in that directory (e.g. under /tmp), so that a restarted worker
+    or a new Lambda container on the same host does not start cold.
+    Concurrent `get_or_load` calls for the same key share a single load.
+
+    :param json_default: converter of the values that are not JSON serializable when persisting
+    """
+
+    def __init__(self, name, default_ttl, ttls=None, max_size=None, persist_dir=None, json_default=None,
+                 clock=time.time):
+        self.name = name
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.max_size = max_size
+        self.persist_dir = persist_dir
+        self.json_default = json_default
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.counters = Counters('hits', 'disk_hits', 'misses', 'loads', 'coalesced', 'invalidations')
+
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    def stats(self):
+        return {**self.counters.snapshot(), 'size': len(self._entries)}
+
+    def ttl_for(self, key):
+        return self.ttls.get(key[0], self.default_ttl)
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[1]
+
+    def get_entry(self, key):
+        """ Returns (stored_at, value) for a fresh entry, None otherwise """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, stored_at, value = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.counters.incr('hits')
+                    return stored_at, value
+                del self._entries[key]
+
+        entry = self._read_from_disk(key, now)
+        if entry is not None:
+            expires_at, stored_at, value = entry
+            with self._lock:
+                self._store(key, entry)
+            self.counters.incr('disk_hits')
+            return stored_at, value
+
+        self.counters.incr('misses')
+        return None
+
+    def set(self, key, value, ttl=None, persist=True):
+        now = self._clock()
+        entry = (now + (self.ttl_for(key) if ttl is None else ttl), now, value)
+        with self._lock:
+            self._store(key, entry)
+        if persist:
+            self._write_to_disk(key, entry)
+        return now
+
+    def get_or_load(self, key, loader, ttl=None):
+        """ Returns the cached value or loads it, concurrent loads of the same key are coalesced """
+        return self.get_or_load_entry(key, loader, ttl)[1]
+
+    def get_or_load_entry(self, key, loader, ttl=None):
+        """ Same as get_or_load but returns (stored_at, value) """
+        entry = self.get_entry(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+
+        if not owner:
+            self.counters.incr('coalesced')
+            return future.result()
+
+        try:
+            self.counters.incr('loads')
+            value = loader()
+            entry = (self.set(key, value, ttl), value)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def invalidate(self, predicate=None):
+        """ Removes the entries whose key matches the predicate, all of them when no predicate is given """
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        self.counters.incr('invalidations', len(keys))
+
+        if self.persist_dir:
+            for filename in os.listdir(self.persist_dir):
+                path = os.path.join(self.persist_dir, filename)
+                try:
+                    with open(path) as f:
+                        data = json.load(f)
+                    if data['cache'] == self.name and (predicate is None or predicate(tuple(data['key']))):
+                        os.remove(path)
+                except Exception:
+                    pass
+        return len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while self.max_size and len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        digest = hashlib.sha256(json.dumps([self.name, *key]).encode()).hexdigest()
+        return os.path.join(self.persist_dir, f"{digest}.json")
+
+    def _read_from_disk(self, key, now):
+        if not self.persist_dir:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now >= data['expires_at']:
+            return None
+        return data['expires_at'], data['stored_at'], data['value']
+
+    def _write_to_disk(self, key, entry):
+        if not self.persist_dir:
+            return
+        expires_at, stored_at, value = entry
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # entries hold account resources (VPCs, subnets, key pairs...), only readable by the API user
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                data = {'cache': self.name, 'key': list(key), 'expires_at': expires_at, 'stored_at': stored_at,
+                        'value': value}
+                json.dump(data, f, default=self.json_default)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning("Unable to persist %s cache entry: %s", self.name, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
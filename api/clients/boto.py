@@ -0,0 +1,136 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.exceptions import InvalidRegionError
+
+from api.metrics import Counters
+
+BOTO_MAX_POOL_CONNECTIONS = int(os.getenv("BOTO_MAX_POOL_CONNECTIONS", 25))
+BOTO_MAX_ATTEMPTS = int(os.getenv("BOTO_MAX_ATTEMPTS", 3))
+BOTO_MAX_CLIENTS = int(os.getenv("BOTO_MAX_CLIENTS", 64))
+BOTO_WARMUP_SERVICES = [s for s in os.getenv("BOTO_WARMUP_SERVICES", "ec2,ssm").split(",") if s]
+
+DEFAULT_CLIENT_CONFIG = Config(
+    max_pool_connections=BOTO_MAX_POOL_CONNECTIONS,
+    retries={"max_attempts": BOTO_MAX_ATTEMPTS, "mode": "standard"},
+    tcp_keepalive=True,
+)
+REGION_PATTERN = re.compile(r"^[a-z]{2}(-[a-z]+)+-\d{1,2}$")
+
+
+class BotoClientRegistry(object):
+    """
+    Thread-safe registry of boto3 clients keyed by (service, region, access key).
+
+    boto3 clients are thread-safe once built but their construction is not, and it
+    is expensive (botocore service models are loaded and parsed), so clients are
+    built once per key under a lock and then shared by every request. Regions come
+    from the requests, so they are validated and the least recently used clients
+    are dropped beyond `max_clients`.
+    """
+
+    def __init__(self, config=DEFAULT_CLIENT_CONFIG, max_clients=BOTO_MAX_CLIENTS):
+        self.config = config
+        self.max_clients = max_clients
+        self._session = None
+        self._account_id = None
+        self._clients = OrderedDict()
+        self._lock = threading.RLock()
+        self.counters = Counters('constructions', 'hits', 'evictions')
+
+    def stats(self):
+        return {**self.counters.snapshot(), 'clients': sorted(f"{s}:{r or 'default'}" for s, r, _ in self._clients)}
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = boto3.session.Session()
+        return self._session
+
+    def default_region(self):
+        return self.session.region_name
+
+    def account_id(self):
+        """ Returns the account of the default credentials, retrieved once per process """
+        if self._account_id is None:
+            account_id = self.client("sts").get_caller_identity()["Account"]
+            with self._lock:
+                self._account_id = account_id
+        return self._account_id
+
+    def client(self, service, region=None, credentials=None):
+        """
+        Returns the shared client for the given service and region.
+
+        :param credentials: optional botocore credentials (e.g. RefreshableCredentials)
+        to use instead of the default credential chain, clients are keyed by their
+        current access key so that equal credentials share a client and refreshed
+        ones get a new client
+        """
+        if region and not REGION_PATTERN.match(region):
+            raise InvalidRegionError(region_name=region)
+        frozen = credentials.get_frozen_credentials() if credentials is not None else None
+        key = (service, region or None, frozen.access_key if frozen is not None else None)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.counters.incr('hits')
+                return client
+            client = self._build_client(service, region, frozen)
+            self._clients[key] = client
+            self.counters.incr('constructions')
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.counters.incr('evictions')
+            return client
+
+    def warm_up(self, services=None, region=None):
+        """ Builds ahead of time the clients of the given services, failures are only logged """
+        if not (region or self.default_region()):
+            return
+        for service in BOTO_WARMUP_SERVICES if services is None else services:
+            try:
+                self.client(service, region)
+            except Exception as e:
+                logging.warning("Unable to warm up boto3 client for %s: %s", service, e)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._session = None
+            self._account_id = None
+
+    def reset_credentials(self):
+        """
+        Drops the clients and the default credentials, e.g. after the restore of a
+        Lambda snapshot taken with credentials that may have expired since. The
+        service models already loaded are kept, so clients are rebuilt quickly.
+        """
+        with self._lock:
+            loader = self._session._session.get_component("data_loader") if self._session is not None else None
+            self.clear()
+            if loader is not None:
+                botocore_session = botocore.session.Session()
+                botocore_session.register_component("data_loader", loader)
+                self._session = boto3.session.Session(botocore_session=botocore_session)
+
+    def _build_client(self, service, region, frozen_credentials):
+        session = self.session
+        if frozen_credentials is not None:
+            botocore_session = botocore.session.Session()
+            botocore_session.register_component("data_loader", session._session.get_component("data_loader"))
+            botocore_session.set_credentials(*frozen_credentials)
+            session = boto3.session.Session(botocore_session=botocore_session)
+        return session.client(service, region_name=region or None, config=self.config)
+
+
+boto_clients = BotoClientRegistry()
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from botocore.credentials import RefreshableCredentials
+
+from api.clients.boto import boto_clients
+from api.metrics import Counters, Histogram
+
+ROLE_SESSION_NAME = "api_session"
+
+
+class AssumedRoleCredentialProvider(object):
+    """
+    Process-wide provider of the credentials of an assumed IAM role.
+
+    The role is assumed once and the credentials are refreshed by botocore
+    RefreshableCredentials ahead of their expiration: during the advisory window
+    a single caller refreshes while the others keep signing with the current
+    credentials, so concurrent requests never stampede STS.
+    """
+
+    def __init__(self, role_arn, external_id=None, sts_client_factory=None):
+        self.role_arn = role_arn
+        self.external_id = external_id
+        self._sts_client_factory = sts_client_factory or (lambda: boto_clients.client("sts"))
+        self._credentials = None
+        self._lock = threading.Lock()
+        self.counters = Counters('refreshes', 'refresh_failures')
+        self.refresh_latency = Histogram()
+
+    def stats(self):
+        return {**self.counters.snapshot(), 'refresh_latency': self.refresh_latency.snapshot()}
+
+    def get_credentials(self):
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    self._credentials = RefreshableCredentials.create_from_metadata(
+                        metadata=self._assume_role(), refresh_using=self._assume_role, method="assume-role")
+        return self._credentials
+
+    def invalidate(self):
+        with self._lock:
+            self._credentials = None
+
+    def _assume_role(self):
+        assume_role_kwargs = {
+            "RoleArn": self.role_arn,
+            "RoleSessionName": ROLE_SESSION_NAME,
+        }
+        if self.external_id:
+            assume_role_kwargs["ExternalId"] = self.external_id
+
+        start = time.perf_counter()
+        try:
+            credentials = self._sts_client_factory().assume_role(**assume_role_kwargs)["Credentials"]
+        except Exception:
+            self.counters.incr('refresh_failures')
+            raise
+        finally:
+            self.refresh_latency.observe((time.perf_counter() - start) * 1000)
+
+        self.counters.incr('refreshes')
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"].isoformat(),
+        }
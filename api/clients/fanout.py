@@ -0,0 +1,59 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+FANOUT_MAX_WORKERS = int(os.getenv("FANOUT_MAX_WORKERS", 8))
+
+_RAISE = object()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+    return _executor
+
+
+class CallOutcome(object):
+    def __init__(self, result=None, error=None, elapsed_ms=0.0):
+        self.result = result
+        self.error = error
+        self.elapsed_ms = elapsed_ms
+
+    def value(self, default=_RAISE):
+        """ Returns the call result, re-raising its error unless a default is given """
+        if self.error is not None:
+            if default is _RAISE:
+                raise self.error
+            return default
+        return self.result
+
+
+def _timed_call(func):
+    start = time.perf_counter()
+    try:
+        return CallOutcome(result=func(), elapsed_ms=(time.perf_counter() - start) * 1000)
+    except Exception as e:
+        return CallOutcome(error=e, elapsed_ms=(time.perf_counter() - start) * 1000)
+
+
+def fan_out(calls, executor=None):
+    """
+    Runs independent calls concurrently on a bounded, process-wide executor.
+
+    :param calls: dict of name -> callable without arguments
+    :return dict of name -> CallOutcome, one failing call does not affect the others
+    """
+    executor = executor or _get_executor()
+    futures = {name: executor.submit(_timed_call, func) for name, func in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def server_timing(outcomes):
+    """ Formats the elapsed time of each call as a Server-Timing header value """
+    return ", ".join(f"{name};dur={outcome.elapsed_ms:.1f}" for name, outcome in outcomes.items())
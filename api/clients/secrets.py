@@ -0,0 +1,54 @@
+import json
+import threading
+from concurrent.futures import Future
+
+from api.clients.boto import boto_clients
+from api.metrics import startup_timings
+
+
+def _fetch_secret(secret_id):
+    with startup_timings.measure("secrets"):
+        client = boto_clients.client("secretsmanager")
+        return json.loads(client.get_secret_value(SecretId=secret_id)["SecretString"])
+
+
+def _resolve(future, fetch, secret_id):
+    try:
+        future.set_result(fetch(secret_id))
+    except Exception as e:
+        future.set_exception(e)
+
+
+class SecretPrefetcher(object):
+    """
+    Fetches the application secret in a background thread, so that the Secrets
+    Manager round trip overlaps the import of the application modules.
+
+    `get` waits for the secret prefetched with the same id, or fetches it
+    synchronously when it was not prefetched (e.g. outside of Lambda).
+    """
+
+    def __init__(self, fetch=_fetch_secret):
+        self._fetch = fetch
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, secret_id):
+        with self._lock:
+            if secret_id in self._futures:
+                return
+            future = self._futures[secret_id] = Future()
+        threading.Thread(target=_resolve, args=(future, self._fetch, secret_id), name="secret-prefetch",
+                         daemon=True).start()
+
+    def get(self, secret_id, timeout=None):
+        """ Returns the decoded secret, prefetched secrets are only used once so later calls see rotations """
+        with self._lock:
+            future = self._futures.pop(secret_id, None)
+        if future is None:
+            return self._fetch(secret_id)
+        with startup_timings.measure("secrets_wait"):
+            return future.result(timeout)
+
+
+app_secrets = SecretPrefetcher()
@@ -0,0 +1,134 @@
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 10))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.3))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 30))
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """ HTTPAdapter applying a default (connect, read) timeout to requests that do not set one """
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=self.timeout if timeout is None else timeout, **kwargs)
+
+
+class PooledHttpClient(object):
+    """
+    Keep-alive HTTP client shared by every outbound request of the process.
+
+    The underlying requests.Session is built lazily, so that uWSGI workers create
+    their own pools after fork, and then kept for the lifetime of the process,
+    so that pools are reused across requests and Lambda warm invocations.
+    Idempotent methods are retried with exponential backoff on connection
+    errors and on 502/503/504 responses. Cookies returned by upstream services
+    are never stored in the shared session.
+    """
+
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 max_retries=HTTP_MAX_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR,
+                 connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = (connect_timeout, read_timeout)
+        self._host_pool_sizes = {}
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def configure_host(self, url, pool_maxsize):
+        """ Sets a dedicated pool size for the host of the given url """
+        if not url:
+            return
+        parts = urlsplit(url)
+        prefix = f"{parts.scheme}://{parts.netloc}/"
+        with self._lock:
+            self._host_pool_sizes[prefix] = pool_maxsize
+            if self._session is not None:
+                self._session.mount(prefix, self._adapter(pool_maxsize))
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def stats(self):
+        pools = {}
+        session = self._session
+        if session is not None:
+            for adapter in set(session.adapters.values()):
+                for key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools[key]
+                    pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                        'connections_opened': pool.num_connections,
+                        'requests': pool.num_requests,
+                    }
+        return {'pools': pools}
+
+    def _retry(self):
+        return Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+
+    def _adapter(self, pool_maxsize):
+        return TimeoutHTTPAdapter(timeout=self.timeout, pool_connections=self.pool_connections,
+                                  pool_maxsize=pool_maxsize, max_retries=self._retry())
+
+    def _build_session(self):
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        default_adapter = self._adapter(self.pool_maxsize)
+        session.mount("https://", default_adapter)
+        session.mount("http://", default_adapter)
+        for prefix, pool_maxsize in self._host_pool_sizes.items():
+            session.mount(prefix, self._adapter(pool_maxsize))
+        return session
+
+
+http = PooledHttpClient()
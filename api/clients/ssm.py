@@ -0,0 +1,238 @@
+import base64
+import codecs
+import gzip
+import re
+import threading
+import time
+import uuid
+import zlib
+
+from botocore.exceptions import ClientError
+
+from api.metrics import Counters, Histogram
+
+PENDING_STATUSES = {"Pending", "InProgress", "Delayed", "Cancelling"}
+
+DEFAULT_INITIAL_DELAY = 0.1
+DEFAULT_MAX_DELAY = 1.0
+DEFAULT_BACKOFF = 2.0
+
+# StandardOutputContent of get_command_invocation holds at most the first 24000 characters of the output
+INLINE_OUTPUT_LIMIT = 24000
+S3_OUTPUT_CHUNK_SIZE = 64 * 1024
+
+
+class SsmOutputTruncated(Exception):
+    """ Raised when a compressed output was truncated inline by SSM and no output bucket is configured """
+
+
+class SsmCommandWaiter(object):
+    """
+    Waits for the completion of an SSM command invocation.
+
+    Probes start shortly after the command is sent and back off exponentially up
+    to `max_delay`, so fast commands are returned in a fraction of a second while
+    long ones do not burn the SSM API quota. InvocationDoesNotExist errors, raised
+    while SSM has not registered the invocation yet, are retried.
+    Time to completion is recorded per command type.
+    """
+
+    def __init__(self, initial_delay=DEFAULT_INITIAL_DELAY, max_delay=DEFAULT_MAX_DELAY, backoff=DEFAULT_BACKOFF,
+                 sleep=time.sleep, clock=time.monotonic):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self._sleep = sleep
+        self._clock = clock
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.counters = Counters('probes', 'not_yet_registered', 'timeouts')
+
+    def stats(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {
+            **self.counters.snapshot(),
+            'time_to_completion': {name: h.snapshot() for name, h in histograms.items()},
+        }
+
+    def histogram(self, command_type):
+        with self._lock:
+            if command_type not in self._histograms:
+                self._histograms[command_type] = Histogram()
+            return self._histograms[command_type]
+
+    def wait(self, ssm, command_id, instance_id, timeout, command_type="default", start=None):
+        """
+        :param start: clock value at which the command was sent, defaults to now
+        :return the last get_command_invocation response, None on timeout
+        """
+        start = self._clock() if start is None else start
+        deadline = start + timeout
+        delay = self.initial_delay
+
+        while True:
+            self._sleep(max(0.0, min(delay, deadline - self._clock())))
+            self.counters.incr('probes')
+            try:
+                status = ssm.get_command_invocation(CommandId=command_id, InstanceId=instance_id)
+                if status["Status"] not in PENDING_STATUSES:
+                    self.histogram(command_type).observe((self._clock() - start) * 1000)
+                    return status
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "InvocationDoesNotExist":
+                    raise
+                self.counters.incr('not_yet_registered')
+
+            if self._clock() >= deadline:
+                self.counters.incr('timeouts')
+                return None
+            delay = min(delay * self.backoff, self.max_delay)
+
+
+class CommandBatch(object):
+    """
+    Several shell commands run by a single AWS-RunShellScript invocation.
+
+    The output of each command is delimited by markers holding a random token,
+    so that its stdout, stderr and exit code can be told apart server-side.
+    """
+
+    def __init__(self, commands, token=None):
+        self.commands = list(commands)
+        self.marker = f"__PCM_BATCH_{token or uuid.uuid4().hex}__"
+
+    def script(self):
+        lines = ['PCM_ERR=$(mktemp)']
+        for i, command in enumerate(self.commands):
+            lines += [
+                f'echo "{self.marker}:{i}:stdout"',
+                f'{command} 2>"$PCM_ERR"',
+                f'echo "{self.marker}:{i}:exit:$?"',
+                'cat "$PCM_ERR"',
+            ]
+        lines += [f'echo "{self.marker}:end"', 'rm -f "$PCM_ERR"']
+        return lines
+
+    def demultiplex(self, output):
+        """
+        :return a list with, for each command, a dict with its stdout, stderr and exit code,
+        the exit code is None when the output of the command is missing (e.g. truncated by SSM)
+        """
+        results = [{"stdout": "", "stderr": "", "exit_code": None} for _ in self.commands]
+        pattern = re.compile(rf"{re.escape(self.marker)}:(?:(\d+):(stdout|exit:(-?\d+))|end)$")
+        current, stream, lines = None, None, []
+
+        def flush():
+            if current is not None:
+                results[current][stream] = "\n".join(lines)
+
+        for line in output.splitlines():
+            match = pattern.search(line)
+            if match is None:
+                lines.append(line)
+                continue
+            if match.start():
+                # output not terminated by a newline
+                lines.append(line[:match.start()])
+            flush()
+            lines = []
+            if match.group(1) is None:
+                current = None
+            elif match.group(3) is None:
+                current, stream = int(match.group(1)), "stdout"
+            else:
+                current, stream = int(match.group(1)), "stderr"
+                results[current]["exit_code"] = int(match.group(3))
+        flush()
+        return results
+
+
+class SsmOutputChannel(object):
+    """
+    Retrieves the output of SSM commands.
+
+    Outputs are read inline from StandardOutputContent. When a bucket is set,
+    commands also write their full output to S3 (OutputS3BucketName) and the
+    outputs truncated inline by SSM are read back from there instead.
+    With `compress`, the output is gzip compressed and base64 encoded on the
+    instance, so that up to ~10 times larger JSON outputs fit inline.
+
+    :param s3_client_factory: callable(region) returning an S3 client
+    """
+
+    def __init__(self, bucket=None, prefix=None, region=None, compress=False, s3_client_factory=None):
+        self.bucket = bucket
+        self.prefix = (prefix or "").strip("/")
+        self.region = region
+        self.compress = compress
+        self._s3_client_factory = s3_client_factory
+        self.counters = Counters('inline', 's3', 's3_bytes')
+
+    def stats(self):
+        return self.counters.snapshot()
+
+    def send_command_args(self):
+        if not self.bucket:
+            return {}
+        args = {"OutputS3BucketName": self.bucket}
+        if self.prefix:
+            args["OutputS3KeyPrefix"] = self.prefix
+        if self.region:
+            args["OutputS3Region"] = self.region
+        return args
+
+    def commands(self, command):
+        if not self.compress:
+            return [command]
+        return [
+            'PCM_OUT=$(mktemp)',
+            '{',
+            command,
+            '} >"$PCM_OUT"',
+            'PCM_STATUS=$?',
+            'gzip -c "$PCM_OUT" | base64 -w0',
+            'rm -f "$PCM_OUT"',
+            'exit $PCM_STATUS',
+        ]
+
+    def output_key(self, command_id, instance_id):
+        """ Key of the stdout of a single step AWS-RunShellScript command """
+        key = f"{command_id}/{instance_id}/awsrunShellScript/0.awsrunShellScript/stdout"
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def read(self, status, command_id, instance_id, region=None):
+        """ Returns the output of a completed command invocation """
+        output = status["StandardOutputContent"]
+        if len(output) < INLINE_OUTPUT_LIMIT or not self.bucket:
+            if self.compress and len(output) >= INLINE_OUTPUT_LIMIT:
+                raise SsmOutputTruncated("The compressed command output was truncated by SSM, configure an output "
+                                         "bucket (SSM_OUTPUT_S3_BUCKET) to retrieve large outputs.")
+            self.counters.incr('inline')
+            return gzip.decompress(base64.b64decode(output)).decode() if self.compress and output else output
+
+        s3 = self._s3_client_factory(self.region or region)
+        body = s3.get_object(Bucket=self.bucket, Key=self.output_key(command_id, instance_id))["Body"]
+        self.counters.incr('s3')
+        return self._read_chunks(body.iter_chunks(S3_OUTPUT_CHUNK_SIZE))
+
+    def _read_chunks(self, chunks):
+        """ Decodes (and decompresses) the output as it is downloaded, without buffering its raw bytes """
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if self.compress else None
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        parts = []
+        pending = b""
+        for chunk in chunks:
+            self.counters.incr('s3_bytes', len(chunk))
+            if decompressor is not None:
+                # base64 is decoded by blocks of 4 characters
+                pending += chunk.translate(None, b" \t\r\n")
+                usable = len(pending) - len(pending) % 4
+                chunk, pending = decompressor.decompress(base64.b64decode(pending[:usable])), pending[usable:]
+            parts.append(decoder.decode(chunk))
+        if decompressor is not None:
+            parts.append(decoder.decode(decompressor.decompress(base64.b64decode(pending)) + decompressor.flush()))
+            if not decompressor.eof:
+                raise SsmOutputTruncated("The compressed command output read from S3 is incomplete.")
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
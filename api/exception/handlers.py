@@ -7,7 +7,6 @@ from werkzeug.routing import WebsocketMismatch
 from api.exception import CSRFError
 from api.exception.exceptions import RefreshTokenError
 from api.pcm_globals import logger
-from api.security.csrf.csrf import remove_csrf_cookie
 
 
 def boto3_exception_handler(err):
@@ -28,6 +27,9 @@ def value_error_handler(err):
     return __handler_response(code, descr)
 
 def csrf_error_handler(err):
+    # imported here, api.security.csrf imports CSRFError from this package
+    from api.security.csrf.csrf import remove_csrf_cookie
+
     descr, code = str(err), 403
     logger.error(descr, extra=dict(status=code, exception=type(err)))
     response, status_code = __handler_response(code, descr)
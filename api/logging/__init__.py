@@ -1,9 +1,35 @@
-from flask import Flask, request
+import os
+import random
+
+from flask import Flask, g, request
 
 from api.logging.http_info import log_request_body_and_headers, log_response_body_and_headers
 
 VALID_LOG_LEVELS = {'debug', 'info', 'warning', 'error', 'critical'}
 
+
+def parse_route_rules(spec, cast):
+    """ Parses per-route rules given as "<path prefix>=<value>,..." e.g. "/manager/sacct=1024,/manager/ec2_action=0" """
+    rules = {}
+    for rule in filter(None, (rule.strip() for rule in (spec or '').split(','))):
+        prefix, _, value = rule.rpartition('=')
+        rules[prefix.strip()] = cast(value)
+    return rules
+
+
+def route_rule(rules, path, default):
+    """ Value of the rule with the longest prefix of the path """
+    matches = [prefix for prefix in rules if path.startswith(prefix)]
+    return rules[max(matches, key=len)] if matches else default
+
+
+# bodies larger than this are logged truncated, without being parsed, 0 leaves the body out
+LOG_BODY_MAX_BYTES = int(os.getenv('LOG_BODY_MAX_BYTES', 4096))
+LOG_BODY_MAX_BYTES_ROUTES = parse_route_rules(os.getenv('LOG_BODY_MAX_BYTES_ROUTES'), int)
+# fraction of the requests whose request and response are logged
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 1.0))
+LOG_SAMPLE_RATE_ROUTES = parse_route_rules(os.getenv('LOG_SAMPLE_RATE_ROUTES'), float)
+
 def parse_log_entry(_logger, entry):
     """
     Parse a log entry expected from PCM frontend and logs
@@ -29,21 +55,36 @@ def push_log_entry(_logger, level, message, extra):
 
 
 class RequestResponseLogging:
-    def __init__(self, logger, app: Flask = None, urls_deny_list=['/logs']):
+    def __init__(self, logger, app: Flask = None, urls_deny_list=['/logs'],
+                 max_body_bytes=LOG_BODY_MAX_BYTES, max_body_bytes_routes=LOG_BODY_MAX_BYTES_ROUTES,
+                 sample_rate=LOG_SAMPLE_RATE, sample_rate_routes=LOG_SAMPLE_RATE_ROUTES):
         self.logger = logger
         self.urls_deny_list = urls_deny_list
+        self.max_body_bytes = max_body_bytes
+        self.max_body_bytes_routes = max_body_bytes_routes
+        self.sample_rate = sample_rate
+        self.sample_rate_routes = sample_rate_routes
         if app:
             self.init_app(app)
 
+    def _is_logged(self):
+        """ Whether the current request is logged, decided once so that requests and responses are sampled together """
+        if 'log_sampled' not in g:
+            sample_rate = route_rule(self.sample_rate_routes, request.path, self.sample_rate)
+            g.log_sampled = request.path not in self.urls_deny_list and random.random() < sample_rate
+        return g.log_sampled
+
     def init_app(self, app):
 
         def log_request():
-            if request.path not in self.urls_deny_list:
-                log_request_body_and_headers(self.logger, request)
+            if self._is_logged():
+                max_body_bytes = route_rule(self.max_body_bytes_routes, request.path, self.max_body_bytes)
+                log_request_body_and_headers(self.logger, request, max_body_bytes)
 
         def log_response(response = None):
-            if request.path not in self.urls_deny_list:
-                log_response_body_and_headers(self.logger, response)
+            if self._is_logged():
+                max_body_bytes = route_rule(self.max_body_bytes_routes, request.path, self.max_body_bytes)
+                log_response_body_and_headers(self.logger, response, max_body_bytes)
             return response
 
         app.before_request(log_request)
@@ -3,8 +3,8 @@ from typing import Union
 from flask import Request, Response
 
 
-def log_request_body_and_headers(_logger, request: Request):
-    details = __get_http_info(request)
+def log_request_body_and_headers(_logger, request: Request, max_body_bytes=None):
+    details = __get_http_info(request, max_body_bytes)
     details['path'] = request.path
     if request.args:
         details['params'] = request.args
@@ -17,16 +17,29 @@ def log_request_body_and_headers(_logger, request: Request):
     _logger.info(details)
 
 
-def log_response_body_and_headers(_logger, response: Response):
-    details = __get_http_info(response)
+def log_response_body_and_headers(_logger, response: Response, max_body_bytes=None):
+    details = __get_http_info(response, max_body_bytes)
     _logger.info(details)
 
 
-def __get_http_info(r: Union[Request,Response]) -> dict:
+def __get_http_info(r: Union[Request,Response], max_body_bytes=None) -> dict:
+    """
+    Headers and JSON body of a request or response. Bodies larger than
+    `max_body_bytes` are not parsed, only their first bytes are logged, and no
+    body is logged when it is 0.
+    """
     headers = __filter_headers(r.headers)
     details = {'headers': headers}
+    if max_body_bytes == 0:
+        return details
 
     try:
+        size = r.content_length if max_body_bytes is not None and r.is_json else None
+        if size is not None and size > max_body_bytes:
+            details['body_truncated'] = r.get_data()[:max_body_bytes].decode('utf-8', 'replace')
+            details['body_size'] = size
+            return details
+
         body = r.json
         if body:
             details['body'] = body
@@ -0,0 +1,170 @@
+import datetime
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+from api.metrics import Counters, register_metrics
+
+# on by default on Lambda, where the records are drained before each invocation returns
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "false").lower() == "true"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 100))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 0.5))
+LOG_DRAIN_TIMEOUT = float(os.getenv("LOG_DRAIN_TIMEOUT", 2))
+
+
+def _snapshot(value):
+    """ Copy of the dicts and lists of a message, which the request may still mutate once it is queued """
+    if isinstance(value, dict):
+        return {k: _snapshot(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_snapshot(v) for v in value]
+    return value
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats each record as a single JSON line, dict messages being merged into
+    the line. The Lambda request id is added when known, the records of the
+    asynchronous handler no longer going through the Lambda runtime handler
+    prefixing them with it.
+    """
+
+    def format(self, record):
+        line = {
+            "timestamp": datetime.datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        aws_request_id = getattr(record, "aws_request_id", None)
+        if aws_request_id:
+            line["aws_request_id"] = aws_request_id
+        if isinstance(record.msg, dict):
+            line.update(record.msg)
+        else:
+            line["message"] = record.getMessage()
+        if record.exc_text:
+            line["exception"] = record.exc_text
+        return json.dumps(line, default=str, separators=(",", ":"))
+
+
+class AsyncBatchHandler(logging.Handler):
+    """
+    Non-blocking log handler: records are queued by the request threads, then
+    formatted and written in batches by a background thread, so that the JSON
+    serialization of request and response details is off the request path.
+
+    Records are dropped (and counted) when the queue is full rather than
+    blocking requests. `drain` waits for the queued records to be written, e.g.
+    before a Lambda invocation returns and the environment is frozen.
+    """
+
+    def __init__(self, stream=None, max_queue=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL):
+        super().__init__()
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.setFormatter(JsonLinesFormatter())
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._thread_lock = threading.Lock()
+        # set by the Lambda entrypoints, environments handle a single invocation at a time
+        self.aws_request_id = None
+        self.counters = Counters('queued', 'written', 'dropped', 'batches', 'write_failures')
+
+    def stats(self):
+        return {**self.counters.snapshot(), 'pending': self._queue.qsize()}
+
+    def emit(self, record):
+        if isinstance(record.msg, dict):
+            record.msg = _snapshot(record.msg)
+        if self.aws_request_id is not None and not hasattr(record, "aws_request_id"):
+            record.aws_request_id = self.aws_request_id
+        if record.exc_info:
+            # tracebacks are formatted while their frames are alive, the rest of the record is left as is
+            record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+            self.counters.incr('queued')
+        except queue.Full:
+            self.counters.incr('dropped')
+
+    def drain(self, timeout=LOG_DRAIN_TIMEOUT):
+        """ Waits until the records queued so far are written, returns False on timeout """
+        if self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def flush(self):
+        self.drain()
+
+    def _ensure_started(self):
+        # the writer thread does not survive a fork, e.g. of the uWSGI workers
+        if self._pid != os.getpid():
+            with self._thread_lock:
+                if self._pid != os.getpid():
+                    if self._thread is not None:
+                        self._queue = queue.Queue(maxsize=self.max_queue)
+                    self._thread = threading.Thread(target=self._run, args=(self._queue,), name="log-writer",
+                                                    daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def _run(self, records):
+        while True:
+            # a batch is written when full, flush_interval after its first record, or when drained
+            items = [records.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(items) < self.batch_size and not isinstance(items[-1], threading.Event):
+                try:
+                    items.append(records.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            self._write([item for item in items if isinstance(item, logging.LogRecord)])
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, records):
+        if not records:
+            return
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.counters.incr('write_failures')
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("".join(line + "\n" for line in lines))
+            stream.flush()
+        except Exception:
+            self.counters.incr('write_failures')
+            return
+        self.counters.incr('written', len(lines))
+        self.counters.incr('batches')
+
+
+log_handler = AsyncBatchHandler()
+register_metrics("logging", log_handler.stats)
+
+
+def use_async_handler(logger, handler=log_handler):
+    """ Sends the records of the logger to the asynchronous handler only, instead of the handlers of the root logger """
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    logger.propagate = False
@@ -0,0 +1,113 @@
+import threading
+import time
+from contextlib import contextmanager
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def register_metrics(name, provider):
+    """
+    Register a callable returning a dict of counters under the given name,
+    so that it shows up in the /manager/get_metrics snapshot
+    """
+    with _lock:
+        _providers[name] = provider
+
+
+def metrics_snapshot():
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in providers.items()}
+
+
+class Counters(object):
+    """ Thread-safe named counters """
+
+    def __init__(self, *names):
+        self._lock = threading.Lock()
+        self._values = {name: 0 for name in names}
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+
+    def get(self, name):
+        with self._lock:
+            return self._values.get(name, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            for name in self._values:
+                self._values[name] = 0
+
+
+DEFAULT_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram(object):
+    """ Thread-safe latency histogram with fixed upper bounds expressed in milliseconds """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, value_ms):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value_ms
+            self._max = max(self._max, value_ms)
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {f'le_{bound}': count for bound, count in zip(self.buckets, self._counts)}
+            buckets['le_inf'] = self._counts[-1]
+            return {
+                'count': self._count,
+                'sum_ms': round(self._sum, 3),
+                'max_ms': round(self._max, 3),
+                'buckets': buckets,
+            }
+
+
+class Timings(object):
+    """ Thread-safe durations of named phases, e.g. the breakdown of a cold start """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def record(self, name, value_ms):
+        with self._lock:
+            self._values[name] = round(self._values.get(name, 0.0) + value_ms, 3)
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+# phases of the initialization of the process, shown under "startup" in the metrics
+startup_timings = Timings()
+register_metrics("startup", startup_timings.snapshot)
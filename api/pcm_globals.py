@@ -5,6 +5,7 @@ from flask.scaffold import Scaffold
 from werkzeug.local import LocalProxy
 
 from api.logging.logger import DefaultLogger
+from api.logging.pipeline import LOG_ASYNC, use_async_handler
 
 _logger_ctxvar = ContextVar('pcm_logger')
 
@@ -45,4 +46,7 @@ class PCMGlobals(object):
 
 
     def __create_logger(self):
-        return DefaultLogger(self.running_local)
+        _logger = DefaultLogger(self.running_local)
+        if LOG_ASYNC and not self.running_local:
+            use_async_handler(_logger.logger)
+        return _logger
@@ -0,0 +1 @@
+from api.pricing.index import PriceIndex
@@ -0,0 +1,116 @@
+import json
+import logging
+import threading
+
+from api.metrics import Counters
+
+DEFAULT_OPERATING_SYSTEM = "Linux"
+DEFAULT_TENANCY = "Shared"
+
+# Pricing endpoint only available from "us-east-1" region
+PRICING_REGION = "us-east-1"
+
+
+def _on_demand_price(terms):
+    """ Returns the hourly USD price of the first on demand term, None if not available """
+    try:
+        on_demand = next(iter(terms["OnDemand"].values()))
+        dimension = next(iter(on_demand["priceDimensions"].values()))
+        price = float(dimension["pricePerUnit"]["USD"])
+    except (KeyError, StopIteration, ValueError):
+        return None
+    return None if price != price else price  # check for NaN
+
+
+class PriceIndex(object):
+    """
+    Local index of EC2 on demand prices keyed by (region, instance type, OS, tenancy).
+
+    The index is filled lazily from the Pricing API, one product per missing key,
+    and kept in a TTLCache with a long TTL. It can also be loaded in bulk from an
+    EC2 regional offer file of the AWS Price List bulk API, so that estimates are
+    available without reaching the Pricing API.
+    """
+
+    def __init__(self, cache, client_factory, offer_files=None):
+        self.cache = cache
+        self._client_factory = client_factory
+        self._offer_files = list(offer_files or [])
+        self._offer_files_lock = threading.Lock()
+        self.counters = Counters('api_lookups', 'offer_file_prices')
+
+    def stats(self):
+        return {**self.counters.snapshot(), 'cache': self.cache.stats()}
+
+    @staticmethod
+    def key(region, instance_type, operating_system=DEFAULT_OPERATING_SYSTEM, tenancy=DEFAULT_TENANCY):
+        return "price", region, instance_type, operating_system.lower(), tenancy.lower()
+
+    def price(self, region, instance_type, operating_system=DEFAULT_OPERATING_SYSTEM, tenancy=DEFAULT_TENANCY):
+        """ Returns the on demand hourly price in USD, None when the instance type has no price """
+        self._load_pending_offer_files()
+        key = self.key(region, instance_type, operating_system, tenancy)
+        # prices are wrapped in a list so that instance types without price are cached too
+        return self.cache.get_or_load(
+            key, lambda: [self._lookup(region, instance_type, operating_system, tenancy)])[0]
+
+    def load_offer_file(self, offer_file):
+        """
+        Loads the prices of an EC2 offer file, e.g.
+        https://pricing.us-east-1.amazonaws.com/offers/v1.0/aws/AmazonEC2/current/<region>/index.json
+
+        :param offer_file: path or file object of the offer file
+        :return number of prices loaded
+        """
+        if isinstance(offer_file, str):
+            with open(offer_file) as f:
+                offer = json.load(f)
+        else:
+            offer = json.load(offer_file)
+
+        on_demand_terms = offer.get("terms", {}).get("OnDemand", {})
+        loaded = 0
+        for sku, product in offer.get("products", {}).items():
+            attributes = product.get("attributes", {})
+            if (product.get("productFamily") != "Compute Instance" or attributes.get("preInstalledSw") != "NA"
+                    or attributes.get("capacitystatus") != "Used" or sku not in on_demand_terms):
+                continue
+            price = _on_demand_price({"OnDemand": on_demand_terms[sku]})
+            if price is None:
+                continue
+            key = self.key(attributes.get("regionCode"), attributes.get("instanceType"),
+                           attributes.get("operatingSystem", ""), attributes.get("tenancy", ""))
+            # the offer file is the persistent source of these prices, keep them in memory only
+            self.cache.set(key, [price], persist=False)
+            loaded += 1
+
+        self.counters.incr('offer_file_prices', loaded)
+        return loaded
+
+    def _load_pending_offer_files(self):
+        if not self._offer_files:
+            return
+        with self._offer_files_lock:
+            while self._offer_files:
+                offer_file = self._offer_files.pop(0)
+                try:
+                    self.load_offer_file(offer_file)
+                except Exception as e:
+                    logging.warning("Unable to load offer file %s: %s", offer_file, e)
+
+    def _lookup(self, region, instance_type, operating_system, tenancy):
+        self.counters.incr('api_lookups')
+        pricing_filters = [
+            {"Field": "tenancy", "Value": tenancy, "Type": "TERM_MATCH"},
+            {"Field": "instanceType", "Value": instance_type, "Type": "TERM_MATCH"},
+            {"Field": "operatingSystem", "Value": operating_system, "Type": "TERM_MATCH"},
+            {"Field": "regionCode", "Value": region, "Type": "TERM_MATCH"},
+            {"Field": "preInstalledSw", "Value": "NA", "Type": "TERM_MATCH"},
+            {"Field": "capacityStatus", "Value": "Used", "Type": "TERM_MATCH"},
+        ]
+        prices = self._client_factory().get_products(
+            ServiceCode="AmazonEC2", Filters=pricing_filters, MaxResults=1)["PriceList"]
+        if not prices:
+            return None
+        # only the first product is used, do not parse the others
+        return _on_demand_price(json.loads(prices[0])["terms"])
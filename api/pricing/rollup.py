@@ -0,0 +1,96 @@
+import logging
+import shlex
+
+ROLLUP_DIMENSIONS = ("user", "queue", "day")
+
+# per (user, partition, node name prefix, day) usage computed by awk on the head node
+USAGE_FIELDS = ("user", "queue", "nodes", "day", "node_seconds", "jobs")
+USAGE_AWK = (
+    '$5 > 0 { n = $3; sub(/,.*/, "", n); sub(/-(\\[.*|[0-9]+)$/, "", n);'
+    ' k = $1 "|" $2 "|" n "|" substr($4, 1, 10); s[k] += $5 * $6; c[k]++ }'
+    ' END { for (k in s) printf "%s|%d|%d\\n", k, s[k], c[k] }'
+)
+
+
+def usage_command(starttime, endtime=None):
+    """
+    sacct command summing the node seconds of the job allocations started in the
+    time range. Jobs are aggregated on the head node, so that the output is
+    proportional to the number of (user, queue, compute resource, day) and not
+    to the number of jobs.
+    """
+    window = f"--starttime {starttime}" + (f" --endtime {endtime}" if endtime else "")
+    return ("sacct --allusers --allocations --noheader --parsable2 "
+            f"{window} --format=User,Partition,NodeList,Start,ElapsedRaw,NNodes "
+            f"| awk -F'|' {shlex.quote(USAGE_AWK)}")
+
+
+def usage_columns(output):
+    """
+    Splits the usage output in one list per field. Its rows are already
+    aggregated by the awk program of `usage_command`, which bounds their number
+    to the (user, queue, compute resource, day) of the time range, so they are
+    parsed one by one. Malformed rows are logged and skipped.
+    """
+    columns = {field: [] for field in USAGE_FIELDS}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        values = line.split("|")
+        try:
+            if len(values) != len(USAGE_FIELDS):
+                raise ValueError(f"expected {len(USAGE_FIELDS)} fields, got {len(values)}")
+            node_seconds, jobs = int(values[4]), int(values[5])
+        except ValueError as e:
+            logging.warning("Skipping malformed usage row %r: %s", line, e)
+            continue
+        for field, value in zip(USAGE_FIELDS[:4], values):
+            columns[field].append(value)
+        columns["node_seconds"].append(node_seconds)
+        columns["jobs"].append(jobs)
+    return columns
+
+
+def aggregate_costs(columns, price, group_by=ROLLUP_DIMENSIONS):
+    """
+    Aggregates the cost of the usage columns per group.
+
+    :param price: callable(queue, node name prefix) returning the hourly price of a node, None if unknown,
+    called once per distinct pair
+    :param group_by: dimensions of the groups, among ROLLUP_DIMENSIONS
+    :return dict with the rows of the rollup ordered by group and the totals
+    """
+    prices = {}
+    rollup = {}
+    totals = [0, 0.0, 0.0, 0.0]
+    for i, key in enumerate(zip(columns["queue"], columns["nodes"])):
+        if key not in prices:
+            prices[key] = price(*key)
+        hourly = prices[key]
+        hours = columns["node_seconds"][i] / 3600.0
+        cost = hours * hourly if hourly is not None else 0.0
+        unpriced = hours if hourly is None else 0.0
+
+        group = tuple(columns[dimension][i] for dimension in group_by)
+        row = rollup.get(group)
+        if row is None:
+            row = rollup[group] = [0, 0.0, 0.0, 0.0]
+        for totals_row in (row, totals):
+            totals_row[0] += columns["jobs"][i]
+            totals_row[1] += hours
+            totals_row[2] += cost
+            totals_row[3] += unpriced
+
+    rows = [{**dict(zip(group_by, group)), "jobs": jobs, "node_hours": round(hours, 4), "cost": round(cost, 4),
+             "unpriced_node_hours": round(unpriced, 4)}
+            for group, (jobs, hours, cost, unpriced) in sorted(rollup.items())]
+    jobs, hours, cost, unpriced = totals
+    return {
+        "rollup": rows,
+        "totals": {
+            "jobs": jobs,
+            "node_hours": round(hours, 4),
+            "cost": round(cost, 4),
+            "unpriced_node_hours": round(unpriced, 4),
+        },
+    }
@@ -1,39 +1,67 @@
 import functools
 import hashlib
+import hmac
 import os
+import threading
 
 from flask import request, current_app
 from itsdangerous import BadSignature, URLSafeTimedSerializer
 
 from api.exception import CSRFError
-from api.security.csrf import CSRF_SECRET_KEY
-from api.security.csrf.constants import CSRF_COOKIE_NAME, SALT, CSRF_TOKEN_HEADER
+from api.metrics import startup_timings
+from api.security.csrf.constants import CSRF_COOKIE_NAME, CSRF_SECRET_KEY, SALT, CSRF_TOKEN_HEADER
 
 CSRF_DEFAULT_MAX_AGE = 30
 
 digest_method = hashlib.sha256
 signer_kwargs = {'signer_kwargs': {'digest_method': digest_method}}
 
+_secret_lock = threading.Lock()
+
+
+def csrf_secret_key(app=None):
+    """ Returns the CSRF secret key of the app, derived from its fingerprint generator on first use """
+    app = app or current_app
+    secret_key = app.config.get(CSRF_SECRET_KEY)
+    if secret_key is None:
+        with _secret_lock:
+            secret_key = app.config.get(CSRF_SECRET_KEY)
+            if secret_key is None:
+                with startup_timings.measure('csrf_secret'):
+                    secret_key = app.extensions['csrf'].fingerprint()
+                app.config[CSRF_SECRET_KEY] = secret_key
+    return secret_key
+
+
+@functools.lru_cache(maxsize=16)
+def _serializer(secret_key, salt):
+    """ Serializers hold no per-call state, a single one is shared per (secret key, salt) """
+    return URLSafeTimedSerializer(secret_key, salt, **signer_kwargs)
+
+
 def generate_csrf_token(secret_key, salt):
-    serializer = URLSafeTimedSerializer(secret_key, salt, **signer_kwargs)
+    serializer = _serializer(secret_key, salt)
     csrf_token_value = hashlib.sha256(os.urandom(64)).hexdigest()
     csrf_token = serializer.dumps(csrf_token_value)
     return csrf_token
 
 
 def parse_csrf_token(secret_key, salt, token, max_age=CSRF_DEFAULT_MAX_AGE):
-    serializer = URLSafeTimedSerializer(secret_key, salt, **signer_kwargs)
-    return serializer.loads(token, max_age=max_age)
+    return _serializer(secret_key, salt).loads(token, max_age=max_age)
 
 
 def validate_csrf(secret_key, csrf_cookie, csrf_header):
     try:
+        if hmac.compare_digest(csrf_cookie.encode(), csrf_header.encode()):
+            # the client sends back the token of its cookie, a single signature check is enough
+            parse_csrf_token(secret_key, SALT, csrf_cookie)
+            return True
         csrf_cookie = parse_csrf_token(secret_key, SALT, csrf_cookie)
         csrf_header = parse_csrf_token(secret_key, SALT, csrf_header)
     except BadSignature:
         return False
 
-    return csrf_cookie == csrf_header
+    return hmac.compare_digest(str(csrf_cookie).encode(), str(csrf_header).encode())
 
 # needed to only allow tests to disable csrf
 def is_csrf_enabled():
@@ -54,7 +82,7 @@ def csrf_needed(func):
 
         csrf_cookie = request.cookies.get(CSRF_COOKIE_NAME)
         csrf_header = request.headers.get(CSRF_TOKEN_HEADER)
-        secret_key = current_app.config[CSRF_SECRET_KEY]
+        secret_key = csrf_secret_key()
 
         if not csrf_cookie:
             raise ValueError('Missing CSRF cookie')
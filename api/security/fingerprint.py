@@ -1,3 +1,7 @@
+import hashlib
+import logging
+import os
+import threading
 from hashlib import pbkdf2_hmac
 from abc import ABC
 
@@ -8,14 +12,73 @@ class IFingerprintGenerator(ABC):
         pass
 
 SALT = 'cognito-fingerprint-salt'.encode()
+ITERATIONS = 500_000
+
+class StaticFingerprintGenerator(IFingerprintGenerator):
+    """ Fingerprint derived once per deployment, e.g. stored in the Secrets Manager secret of the app """
+
+    def __init__(self, value):
+        self.value = value
+
+    def fingerprint(self):
+        return self.value
+
 
 class CognitoFingerprintGenerator(IFingerprintGenerator):
+    """
+    PBKDF2 fingerprint of the Cognito app client, computed at most once per process.
+
+    The derivation is expensive by design (500k rounds), so with `cache_dir` the
+    result is also kept in a file named after the digest of the inputs, readable
+    only by the current user, and reused by the processes (e.g. uWSGI workers)
+    started later on the same host.
+    """
 
-    def __init__(self, client_id, client_secret, user_pool_id):
+    def __init__(self, client_id, client_secret, user_pool_id, cache_dir=None):
         self.client_id = client_id
         self.client_secret = client_secret
         self.user_pool_id = user_pool_id
+        self.cache_dir = cache_dir
+        self._fingerprint = None
+        self._lock = threading.Lock()
 
     def fingerprint(self):
-        to_encrypt = self.client_id + self.client_secret + self.user_pool_id
-        return pbkdf2_hmac('sha256', to_encrypt.encode(), SALT, 500_000).hex()
\ No newline at end of file
+        if self._fingerprint is None:
+            with self._lock:
+                if self._fingerprint is None:
+                    self._fingerprint = self._read_cached() or self._derive()
+        return self._fingerprint
+
+    def _inputs(self):
+        return (self.client_id + self.client_secret + self.user_pool_id).encode()
+
+    def _derive(self):
+        fingerprint = pbkdf2_hmac('sha256', self._inputs(), SALT, ITERATIONS).hex()
+        self._write_cached(fingerprint)
+        return fingerprint
+
+    def _cache_path(self):
+        digest = hashlib.sha256(b'|'.join([self._inputs(), SALT, str(ITERATIONS).encode()])).hexdigest()
+        return os.path.join(self.cache_dir, f'pcm-fingerprint-{digest}')
+
+    def _read_cached(self):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path()) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _write_cached(self, fingerprint):
+        if not self.cache_dir:
+            return
+        path = self._cache_path()
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(fingerprint)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning('Unable to cache the fingerprint: %s', e)
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from api.clients.sessions import http
+from api.metrics import Counters
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_STALE = 24 * 3600
+DEFAULT_MIN_REFRESH_INTERVAL = 30
+
+
+def _fetch_jwks(url):
+    resp = http.get(url, timeout=5)
+    resp.raise_for_status()
+    return resp.json()
+
+
+class JWKSKeyStore(object):
+    """
+    In-process cache of the identity provider signing keys, indexed by kid.
+
+    Keys are fetched once and kept for `ttl` seconds. A token signed with an
+    unknown kid forces a refresh (key rotation), but no more often than once
+    every `min_refresh_interval` seconds. When the keys are expired and the
+    refresh fails, the stale keys are served for up to `max_stale` seconds.
+    """
+
+    def __init__(self, jwks_url, ttl=DEFAULT_TTL, max_stale=DEFAULT_MAX_STALE,
+                 min_refresh_interval=DEFAULT_MIN_REFRESH_INTERVAL, fetch=_fetch_jwks, clock=time.monotonic):
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.min_refresh_interval = min_refresh_interval
+        self._fetch = fetch
+        self._clock = clock
+
+        self._keys = {}
+        self._jwks = None
+        self._fetched_at = None
+        self._last_attempt = None
+        self._refresh_lock = threading.Lock()
+        self.counters = Counters('hits', 'misses', 'refreshes', 'forced_refreshes', 'refresh_failures', 'stale_served')
+
+    def stats(self):
+        return self.counters.snapshot()
+
+    def key_for(self, token):
+        """ Returns the key (or key set) suitable to verify the given token """
+        from jose import jwt
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid is None:
+            return self.get_jwks()
+        return self.get_key(kid) or self.get_jwks()
+
+    def get_key(self, kid):
+        self._ensure_fresh()
+        key = self._keys.get(kid)
+        if key is not None:
+            self.counters.incr('hits')
+            return key
+
+        self.counters.incr('misses')
+        if self._can_force_refresh():
+            self.counters.incr('forced_refreshes')
+            self.refresh()
+        return self._keys.get(kid)
+
+    def get_jwks(self):
+        self._ensure_fresh()
+        return self._jwks or {'keys': []}
+
+    def refresh(self):
+        """ Fetches the key set, returns True on success """
+        with self._refresh_lock:
+            self._last_attempt = self._clock()
+            try:
+                jwks = self._fetch(self.jwks_url)
+            except Exception:
+                self.counters.incr('refresh_failures')
+                return False
+            self._jwks = jwks
+            self._keys = {key['kid']: key for key in jwks.get('keys', []) if 'kid' in key}
+            self._fetched_at = self._clock()
+            self.counters.incr('refreshes')
+            return True
+
+    def invalidate(self):
+        with self._refresh_lock:
+            self._keys, self._jwks, self._fetched_at, self._last_attempt = {}, None, None, None
+
+    def _age(self):
+        return None if self._fetched_at is None else self._clock() - self._fetched_at
+
+    def _can_force_refresh(self):
+        return self._last_attempt is None or self._clock() - self._last_attempt >= self.min_refresh_interval
+
+    def _ensure_fresh(self):
+        age = self._age()
+        if age is not None and age < self.ttl:
+            return
+
+        if age is None:
+            # nothing to serve yet, every caller has to wait for the keys
+            if not self.refresh() and self._fetched_at is None:
+                raise Exception('Unable to retrieve JWKS from %s' % self.jwks_url)
+            return
+
+        # stale-while-revalidate: a single caller refreshes, the others keep using the current keys
+        if not self._refresh_lock.locked() and self._can_force_refresh() and self.refresh():
+            return
+        if age >= self.ttl + self.max_stale:
+            raise Exception('JWKS expired and could not be refreshed from %s' % self.jwks_url)
+        self.counters.incr('stale_served')
@@ -0,0 +1,68 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from api.metrics import Counters
+
+DEFAULT_MAX_SIZE = 1024
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class VerifiedTokenCache(object):
+    """
+    Bounded LRU of the claims of tokens whose signature has already been verified.
+
+    Entries are keyed by the sha256 digest of the token, so the raw token is never
+    kept in memory, and expire at the `exp` claim of the token: tokens without
+    an `exp` claim are never cached.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, clock=time.time):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = Counters('hits', 'misses', 'evictions', 'invalidations')
+
+    def stats(self):
+        return {**self.counters.snapshot(), 'size': len(self._entries)}
+
+    def get(self, token):
+        key = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, claims = entry
+                if self._clock() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.counters.incr('hits')
+                    return claims
+                del self._entries[key]
+        self.counters.incr('misses')
+        return None
+
+    def put(self, token, claims):
+        expires_at = claims.get('exp') if isinstance(claims, dict) else None
+        if not isinstance(expires_at, (int, float)) or self.max_size <= 0:
+            return
+
+        key = token_digest(token)
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.counters.incr('evictions')
+
+    def invalidate(self, token):
+        with self._lock:
+            if self._entries.pop(token_digest(token), None) is not None:
+                self.counters.incr('invalidations')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,178 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+import requests
+
+from api.agent import AgentUnavailable, HeadNodeAgents, LocalTunnel, install_script
+from api.agent.server import peer_uid, regular_user, serve_in_thread
+
+TOKEN = 'token'
+
+
+def sh_runner(user, command, timeout):
+    """ Runs the command as the current user, the local stand-in of runuser """
+    proc = subprocess.run(['sh', '-c', command], capture_output=True, text=True, timeout=timeout)
+    return proc.returncode, proc.stdout, proc.stderr
+
+
+def serve_agent(**kwargs):
+    """ Local agent accepting every user but root, its token readable by the current user """
+    kwargs.setdefault('token_reader_uids', (os.getuid(),))
+    return serve_in_thread(TOKEN, runner=sh_runner, allowed_user=lambda user: user != 'root', **kwargs)
+
+
+@pytest.fixture
+def agent():
+    server = serve_agent()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def deployments():
+    return []
+
+
+@pytest.fixture
+def agents(agent, deployments):
+    def deploy(region, instance_id, port):
+        deployments.append((region, instance_id, port))
+
+    agents = HeadNodeAgents(deploy, tunnel_factory=LocalTunnel, port=agent.server_address[1], timeout=5)
+    yield agents
+    agents.close()
+
+
+def test_head_node_agent_run(agents, deployments):
+    """
+    Given channels to head node agents
+      When commands are run on a head node
+        Then the agent should be deployed once
+        Then the output of the commands should be returned
+    """
+    assert agents.run('eu-west-1', 'i-123', 'ec2-user', 'echo hello') == 'hello\n'
+    assert agents.run('eu-west-1', 'i-123', 'ec2-user', 'echo a\\|b | tr a c') == 'c|b\n'
+
+    assert deployments == [('eu-west-1', 'i-123', agents.port)]
+    assert agents.stats()['queries'] == 2
+
+
+def test_head_node_agent_command_failure(agents):
+    with pytest.raises(Exception, match='boom'):
+        agents.run('eu-west-1', 'i-123', 'ec2-user', 'echo boom >&2; exit 1')
+
+
+def test_head_node_agent_rejects_invalid_token(agent):
+    resp = requests.post(f'http://127.0.0.1:{agent.server_address[1]}/run', json={'user': 'ec2-user', 'command': 'id'},
+                         headers={'Authorization': 'Bearer wrong'})
+
+    assert resp.status_code == 401
+
+
+def test_head_node_agent_token_is_only_served_to_token_readers():
+    """
+    Given an agent whose token may only be read by root, e.g. the SSM agent forwarding the tunnel
+      When another user connects to it
+        Then the token should not be served and the channel should not be opened
+    """
+    server = serve_agent(token_reader_uids=(os.getuid() + 1,))
+    try:
+        agents = HeadNodeAgents(lambda *args: None, tunnel_factory=LocalTunnel, port=server.server_address[1])
+        with pytest.raises(AgentUnavailable):
+            agents.run('eu-west-1', 'i-123', 'ec2-user', 'echo hello')
+        assert agents.stats()['connect_failures'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_head_node_agent_rejects_root(agents):
+    """
+    Given channels to head node agents
+      When a command is run as root
+        Then it should be rejected by the agent and the channel kept
+    """
+    with pytest.raises(Exception, match='Invalid user'):
+        agents.run('eu-west-1', 'i-123', 'root', 'id')
+
+    assert agents.run('eu-west-1', 'i-123', 'ec2-user', 'echo hello') == 'hello\n'
+    assert agents.stats()['connects'] == 1
+
+
+def test_regular_user():
+    assert not regular_user('root')
+    assert not regular_user('daemon')
+    assert not regular_user('nobody')
+    assert not regular_user('not-a-user')
+    assert not regular_user('$(reboot)')
+
+
+def test_peer_uid(tmp_path):
+    proc_net_tcp = tmp_path / 'tcp'
+    proc_net_tcp.write_text(
+        '  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n'
+        '   0: 0100007F:223D 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 1 1\n'
+        '   1: 0100007F:D431 0100007F:223D 01 00000000:00000000 00:00000000 00000000     0        0 2 1\n'
+        '   2: 0100007F:223D 0100007F:D431 01 00000000:00000000 00:00000000 00000000  1000        0 3 1\n')
+
+    assert peer_uid(0xD431, 0x223D, str(proc_net_tcp)) == 0
+    assert peer_uid(0xD432, 0x223D, str(proc_net_tcp)) is None
+
+
+def test_head_node_agent_unavailable(deployments):
+    """
+    Given channels to head node agents
+      When the agent cannot be deployed
+        Then AgentUnavailable should be raised
+        Then the deployment should not be retried before the retry interval
+    """
+    def deploy(region, instance_id, port):
+        deployments.append(instance_id)
+        raise Exception('SSM agent offline')
+
+    agents = HeadNodeAgents(deploy, tunnel_factory=LocalTunnel, retry_interval=60)
+
+    for _ in range(2):
+        with pytest.raises(AgentUnavailable):
+            agents.run('eu-west-1', 'i-123', 'ec2-user', 'echo hello')
+    assert deployments == ['i-123']
+
+
+def test_ssm_command_falls_back_to_run_command(mocker):
+    import api.PclusterApiHandler as handler
+
+    agents = mocker.patch.object(handler, 'head_node_agents')
+    agents.run.side_effect = AgentUnavailable('unavailable')
+    run_ssm_command = mocker.patch.object(handler, '_run_ssm_command', return_value='output')
+
+    assert handler.ssm_command('eu-west-1', 'i-123', 'ec2-user', 'squeue') == 'output'
+    run_ssm_command.assert_called_once()
+
+
+@pytest.mark.skipif(shutil.which('python3') is None, reason='python3 is not installed')
+def test_install_script(tmp_path):
+    """
+    Given the install script of the agent
+      When it is run twice
+        Then the agent should be started once
+        Then its token should only be written to a file readable by its owner
+    """
+    script = install_script(0).replace('/opt/pcluster-manager', str(tmp_path)).replace(
+        '/var/log/pcluster-manager-agent.log', str(tmp_path / 'agent.log'))
+
+    try:
+        first = subprocess.run(['sh', '-c', script], capture_output=True, text=True)
+        second = subprocess.run(['sh', '-c', script], capture_output=True, text=True)
+
+        assert first.returncode == 0, first.stderr
+        assert second.returncode == 0, second.stderr
+        token = (tmp_path / 'agent.token').read_text().strip()
+        assert len(token) == 64
+        assert token not in first.stdout + second.stdout
+        assert (tmp_path / 'agent.token').stat().st_mode & 0o077 == 0
+        assert len(list(tmp_path.glob('agent-*.py'))) == 1
+    finally:
+        subprocess.run(['pkill', '-f', f'{tmp_path}/agent-'])
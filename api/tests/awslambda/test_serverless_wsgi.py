@@ -0,0 +1,138 @@
+import base64
+import gzip
+import json
+
+import pytest
+from werkzeug.wrappers import Response
+
+from awslambda import serverless_wsgi
+from awslambda.serverless_wsgi import all_casings, generate_response, group_headers, header_casings, \
+    negotiate_encoding, setup_environ_items, split_headers
+
+
+def _response():
+    response = Response('{"version": "3.1.0"}', mimetype='application/json')
+    response.headers.add('X-Frame-Options', 'DENY')
+    for name in ('accessToken', 'idToken', 'refreshToken'):
+        response.set_cookie(name, f'{name}-value', httponly=True, secure=True, samesite='Lax')
+    return response
+
+
+def test_all_casings_first_letters_change_first():
+    assert list(all_casings('a-b')) == ['a-b', 'A-b', 'a-B', 'A-B']
+    assert list(all_casings('')) == ['']
+
+
+def test_header_casings_are_distinct_and_cached():
+    casings = header_casings('Set-Cookie', 4)
+
+    assert casings == ('set-cookie', 'Set-cookie', 'sEt-cookie', 'SEt-cookie')
+    assert header_casings('Set-Cookie', 4) is casings
+
+
+def test_split_headers_case_mutates_repeated_headers():
+    """
+    Given a response setting several cookies
+      When it is returned through a payload format 1.0 event without multi value headers
+        Then each cookie should be returned under a different casing of Set-Cookie
+    """
+    headers = split_headers(_response().headers)
+
+    cookies = {name: value for name, value in headers.items() if name.lower() == 'set-cookie'}
+    assert len(cookies) == 3
+    assert sorted(value.split('=')[0] for value in cookies.values()) == ['accessToken', 'idToken', 'refreshToken']
+    assert headers['X-Frame-Options'] == 'DENY'
+
+
+def test_group_headers_once_per_name():
+    headers = group_headers(_response().headers)
+
+    assert list(headers) == ['Content-Type', 'Content-Length', 'X-Frame-Options', 'Set-Cookie']
+    assert len(headers['Set-Cookie']) == 3
+
+
+def test_generate_response_v2_returns_cookies_natively():
+    """
+    Given a response setting several cookies
+      When it is returned through a payload format 2.0 event
+        Then the cookies should be returned in the cookies list
+        Then no case-mutated header should be returned
+    """
+    response = _response()
+    response.headers.add('Vary', 'Cookie')
+    response.headers.add('Vary', 'Accept-Encoding')
+
+    returned = generate_response(response, {'version': '2.0'})
+
+    assert [cookie.split('=')[0] for cookie in returned['cookies']] == ['accessToken', 'idToken', 'refreshToken']
+    assert all(name.lower() != 'set-cookie' for name in returned['headers'])
+    assert returned['headers']['Vary'] == 'Cookie,Accept-Encoding'
+    assert returned['body'] == '{"version": "3.1.0"}'
+
+
+def test_generate_response_v2_without_cookies():
+    returned = generate_response(Response('ok'), {'version': '2.0'})
+
+    assert 'cookies' not in returned
+    assert returned['statusCode'] == 200
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding('gzip, deflate, br', available=['br', 'gzip']) == 'br'
+    assert negotiate_encoding('gzip;q=1.0, br;q=0.5', available=['br', 'gzip']) == 'gzip'
+    assert negotiate_encoding('br;q=0, *', available=['br', 'gzip']) == 'gzip'
+    assert negotiate_encoding('identity', available=['br', 'gzip']) is None
+    assert negotiate_encoding(None, available=['gzip']) is None
+    assert negotiate_encoding('gzip;q=invalid', available=['gzip']) is None
+
+
+def _json_response(size):
+    return Response(json.dumps({'jobs': [{'job_id': i, 'name': 'job'} for i in range(size)]}),
+                    mimetype='application/json')
+
+
+def test_generate_response_compresses_large_text_responses(monkeypatch):
+    """
+    Given a large JSON response and a client accepting gzip
+      When it is returned to API Gateway
+        Then the body should be gzipped and base64 encoded
+        Then the content coding and the Vary header should be set
+    """
+    monkeypatch.setattr(serverless_wsgi, 'RESPONSE_COMPRESSION', ['gzip'])
+    response = _json_response(1000)
+    response.set_etag('abc')
+    expected = response.get_data()
+
+    returned = generate_response(response, {'version': '2.0', 'headers': {'accept-encoding': 'gzip, deflate'}})
+
+    assert returned['isBase64Encoded']
+    body = base64.b64decode(returned['body'])
+    assert gzip.decompress(body) == expected
+    assert returned['headers']['Content-Encoding'] == 'gzip'
+    assert returned['headers']['Content-Length'] == str(len(body))
+    assert returned['headers']['Vary'] == 'Accept-Encoding'
+    assert returned['headers']['ETag'] == 'W/"abc"'
+
+
+@pytest.mark.parametrize('response, accept_encoding', [
+    (_json_response(1000), None),
+    (_json_response(1000), 'identity'),
+    (_json_response(1), 'gzip'),
+    (Response(b'\x89PNG' * 1000, mimetype='image/png'), 'gzip'),
+])
+def test_generate_response_does_not_compress(monkeypatch, response, accept_encoding):
+    monkeypatch.setattr(serverless_wsgi, 'RESPONSE_COMPRESSION', ['gzip'])
+    headers = {'Accept-Encoding': [accept_encoding]} if accept_encoding else {}
+
+    returned = generate_response(response, {'multiValueHeaders': headers})
+
+    body = base64.b64decode(returned['body']) if returned['isBase64Encoded'] else returned['body'].encode()
+    assert 'Content-Encoding' not in returned['multiValueHeaders']
+    assert body == response.get_data()
+
+
+def test_setup_environ_items_transcodes_only_non_ascii_strings():
+    environ = setup_environ_items({'PATH_INFO': '/café', 'QUERY_STRING': 'a=1', 'wsgi.input': None}, {})
+
+    assert environ['PATH_INFO'] == '/cafÃ©'
+    assert environ['QUERY_STRING'] == 'a=1'
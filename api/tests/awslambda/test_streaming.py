@@ -0,0 +1,103 @@
+import json
+
+from flask import Flask, Response, stream_with_context
+
+from awslambda.streaming import PRELUDE_DELIMITER, serve, stream_response
+
+
+def _event(path):
+    return {
+        'version': '2.0',
+        'rawPath': path,
+        'headers': {'host': 'abc.lambda-url.us-east-1.on.aws'},
+        'requestContext': {'http': {'method': 'GET', 'path': path}},
+        'isBase64Encoded': False,
+    }
+
+
+def _streaming_app(produced):
+    app = Flask(__name__)
+
+    @app.route('/jobs')
+    def jobs():
+        def pages():
+            for page in range(3):
+                produced.append(page)
+                yield json.dumps({'page': page}) + '\n'
+
+        response = Response(stream_with_context(pages()), mimetype='application/x-ndjson')
+        response.set_cookie('accessToken', 'token')
+        return response
+
+    @app.route('/config')
+    def config():
+        return 'x' * 10
+
+    @app.route('/fail')
+    def fail():
+        raise ValueError('boom')
+
+    return app
+
+
+def test_stream_response_sends_prelude_then_chunks_as_produced():
+    """
+    Given an app producing its response page by page
+      When its response is streamed
+        Then the prelude should carry the status, headers and cookies
+        Then each page should be sent before the next one is produced
+    """
+    produced = []
+    chunks = stream_response(_streaming_app(produced), _event('/jobs'), None)
+
+    prelude, delimiter = next(chunks).split(PRELUDE_DELIMITER)
+    assert delimiter == b''
+    prelude = json.loads(prelude)
+    assert prelude['statusCode'] == 200
+    assert prelude['headers']['Content-Type'] == 'application/x-ndjson'
+    assert prelude['cookies'][0].startswith('accessToken=token')
+
+    assert bytes(next(chunks)) == b'{"page": 0}\n'
+    assert produced == [0]
+    assert [bytes(chunk) for chunk in chunks] == [b'{"page": 1}\n', b'{"page": 2}\n']
+
+
+def test_stream_response_splits_large_bodies():
+    chunks = list(stream_response(_streaming_app([]), _event('/config'), None, chunk_size=4))
+
+    assert [bytes(chunk) for chunk in chunks[1:]] == [b'xxxx', b'xxxx', b'xx']
+
+
+class FakeRuntime(object):
+    def __init__(self, events):
+        self.events = list(events)
+        self.responses = {}
+        self.errors = {}
+
+    def next_invocation(self):
+        request_id = str(len(self.events))
+        return request_id, self.events.pop(0), None
+
+    def stream_response(self, request_id, chunks):
+        self.responses[request_id] = b''.join(chunks)
+
+    def post_error(self, request_id, error):
+        self.errors[request_id] = error
+
+
+def test_serve_streams_each_invocation():
+    """
+    Given invocations of the streaming entrypoint
+      When they are served
+        Then each response should be streamed to the Runtime API
+        Then errors raised by the app should be returned as a 500 response
+    """
+    runtime = FakeRuntime([_event('/config'), _event('/fail')])
+
+    serve(_streaming_app([]), runtime, max_invocations=2)
+
+    prelude, body = runtime.responses['2'].split(PRELUDE_DELIMITER)
+    assert json.loads(prelude)['statusCode'] == 200
+    assert body == b'x' * 10
+    assert json.loads(runtime.responses['1'].split(PRELUDE_DELIMITER)[0])['statusCode'] == 500
+    assert runtime.errors == {}
@@ -0,0 +1,108 @@
+from unittest.mock import MagicMock
+
+from api.cache.cluster_config import ClusterConfigCache
+
+CONFIG_V1 = """
+Scheduling:
+  SlurmQueues:
+    - Name: queue1
+      ComputeResources:
+        - Name: cr1
+          InstanceType: c5.xlarge
+"""
+
+
+class MockResponse:
+    def __init__(self, status_code, text='', etag=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {'ETag': etag} if etag else {}
+
+
+def _description(version):
+    return {'lastUpdatedTime': version, 'clusterConfiguration': {'url': f'https://bucket/config?v={version}'}}
+
+
+def test_cluster_config_cache_hit(clock):
+    """
+    Given a cluster configuration cache
+      When the same configuration is requested within the describe TTL
+        Then neither the describe nor the download should be repeated
+        Then the YAML should be parsed only once
+    """
+    cache = ClusterConfigCache(describe_ttl=30, clock=clock)
+    describe = MagicMock(return_value=_description('v1'))
+    download = MagicMock(return_value=MockResponse(200, CONFIG_V1, '"etag-1"'))
+
+    first = cache.get('eu-west-1', 'cluster', describe, download)
+    second = cache.get('eu-west-1', 'cluster', describe, download)
+
+    assert first is second
+    assert second.compute_resources('queue1') == [{'Name': 'cr1', 'InstanceType': 'c5.xlarge'}]
+    describe.assert_called_once()
+    download.assert_called_once_with('https://bucket/config?v=v1', None)
+
+
+def test_cluster_config_cache_same_version_skips_download(clock):
+    """
+    Given a cluster configuration cache
+      When the describe TTL expired but the cluster was not updated
+        Then the configuration should not be downloaded again
+    """
+    cache = ClusterConfigCache(describe_ttl=30, clock=clock)
+    describe = MagicMock(return_value=_description('v1'))
+    download = MagicMock(return_value=MockResponse(200, CONFIG_V1, '"etag-1"'))
+
+    cache.get('eu-west-1', 'cluster', describe, download)
+    clock.now += 31
+    cache.get('eu-west-1', 'cluster', describe, download)
+
+    assert describe.call_count == 2
+    download.assert_called_once()
+
+
+def test_cluster_config_cache_new_version_conditional_download(clock):
+    """
+    Given a cluster configuration cache
+      When the cluster version changes
+        Then the configuration should be downloaded with the ETag of the cached one
+        Then a 304 response should reuse the cached configuration
+    """
+    cache = ClusterConfigCache(describe_ttl=30, clock=clock)
+    describe = MagicMock(side_effect=[_description('v1'), _description('v2')])
+    download = MagicMock(side_effect=[MockResponse(200, CONFIG_V1, '"etag-1"'), MockResponse(304)])
+
+    first = cache.get('eu-west-1', 'cluster', describe, download)
+    first.queues
+    clock.now += 31
+    second = cache.get('eu-west-1', 'cluster', describe, download)
+
+    download.assert_called_with('https://bucket/config?v=v2', '"etag-1"')
+    assert second.version == 'v2'
+    assert second.text == CONFIG_V1
+    assert second._queues is first._queues
+    assert cache.stats()['not_modified'] == 1
+
+
+def test_cluster_config_cache_invalidate(clock):
+    cache = ClusterConfigCache(describe_ttl=30, clock=clock)
+    describe = MagicMock(return_value=_description('v1'))
+    download = MagicMock(return_value=MockResponse(200, CONFIG_V1))
+
+    cache.get('eu-west-1', 'cluster', describe, download)
+    cache.get('eu-west-1', 'other', describe, download)
+    cache.invalidate('cluster')
+    cache.get('eu-west-1', 'cluster', describe, download)
+    cache.get('eu-west-1', 'other', describe, download)
+
+    assert describe.call_count == 3
+    assert download.call_count == 3
+
+
+def test_cluster_config_cache_does_not_cache_failed_downloads(clock):
+    cache = ClusterConfigCache(describe_ttl=30, clock=clock)
+    describe = MagicMock(return_value=_description('v1'))
+    download = MagicMock(side_effect=[MockResponse(403, 'denied'), MockResponse(200, CONFIG_V1)])
+
+    assert cache.get('eu-west-1', 'cluster', describe, download).text == 'denied'
+    assert cache.get('eu-west-1', 'cluster', describe, download).text == CONFIG_V1
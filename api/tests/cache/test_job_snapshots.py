@@ -0,0 +1,30 @@
+from api.cache.job_snapshots import JobSnapshots, jobs_version
+
+
+def test_jobs_version_is_content_based():
+    assert jobs_version([{'job_id': 1, 'name': 'a'}]) == jobs_version([{'name': 'a', 'job_id': 1}])
+    assert jobs_version([{'job_id': 1}]) != jobs_version([{'job_id': 2}])
+
+
+def test_job_snapshots_delta():
+    """
+    Given the snapshots of a job queue
+      When the delta since a known version is requested
+        Then the added, removed and changed jobs should be returned
+      When the version is unknown or evicted
+        Then the full job list should be returned
+    """
+    snapshots = JobSnapshots(max_versions=2)
+    key = ('eu-west-1', 'i-123', 'ec2-user')
+    v1 = snapshots.record(key, [{'job_id': 1, 'job_state': 'PENDING'}])
+
+    delta = snapshots.delta(key, v1, [{'job_id': 1, 'job_state': 'RUNNING'}, {'job_id': 2, 'job_state': 'PENDING'}])
+
+    assert delta['added'] == [{'job_id': 2, 'job_state': 'PENDING'}]
+    assert delta['changed'] == [{'job_id': 1, 'job_state': 'RUNNING'}]
+    assert delta['removed'] == []
+    assert snapshots.delta(key, delta['version'], [])['removed'] == [1, 2]
+
+    assert snapshots.delta(key, v1, [])['reset'] is True
+    assert snapshots.delta(('eu-west-1', 'i-456', 'ec2-user'), v1, [])['reset'] is True
+    assert snapshots.stats() == {'deltas': 2, 'resets': 2, 'unchanged': 0, 'keys': 2}
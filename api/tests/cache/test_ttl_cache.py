@@ -0,0 +1,133 @@
+import datetime
+import os
+import threading
+import time
+
+import pytest
+
+from api.cache import TTLCache, parse_ttls
+
+
+def test_ttl_cache_per_kind_ttl(clock):
+    """
+    Given a TTL cache with a TTL per kind
+      When entries of different kinds are stored
+        Then each of them should expire after the TTL of its kind
+    """
+    cache = TTLCache('test', 10, ttls={'long': 100}, clock=clock)
+    cache.set(('short', 'eu-west-1'), 'a')
+    cache.set(('long', 'eu-west-1'), 'b')
+
+    clock.now += 50
+
+    assert cache.get(('short', 'eu-west-1')) is None
+    assert cache.get(('long', 'eu-west-1')) == 'b'
+
+
+def test_ttl_cache_persistence(clock, tmp_path):
+    """
+    Given a TTL cache persisted on disk
+      When a new cache is built on the same directory
+        Then it should serve the entries that are not expired
+    """
+    cache = TTLCache('test', 10, persist_dir=str(tmp_path), clock=clock,
+                     json_default=lambda o: o.isoformat())
+    cache.set(('vpcs', 'eu-west-1'), [{'CreationTime': datetime.date(2023, 1, 1)}])
+
+    restarted = TTLCache('test', 10, persist_dir=str(tmp_path), clock=clock)
+    assert restarted.get(('vpcs', 'eu-west-1')) == [{'CreationTime': '2023-01-01'}]
+    assert restarted.stats()['disk_hits'] == 1
+
+    clock.now += 11
+    assert TTLCache('test', 10, persist_dir=str(tmp_path), clock=clock).get(('vpcs', 'eu-west-1')) is None
+
+
+def test_ttl_cache_persisted_entries_are_private(clock, tmp_path):
+    """
+    Given a TTL cache persisted in a shared directory
+      When an entry is stored, whatever the umask
+        Then its file should only be readable by its owner
+    """
+    umask = os.umask(0)
+    try:
+        TTLCache('test', 10, persist_dir=str(tmp_path), clock=clock).set(('vpcs', 'eu-west-1'), 'a')
+    finally:
+        os.umask(umask)
+
+    [path] = tmp_path.iterdir()
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_ttl_cache_invalidate(clock, tmp_path):
+    cache = TTLCache('test', 10, persist_dir=str(tmp_path), clock=clock)
+    cache.set(('vpcs', 'eu-west-1'), 'a')
+    cache.set(('vpcs', 'us-east-1'), 'b')
+
+    assert cache.invalidate(lambda key: key[1] == 'eu-west-1') == 1
+
+    restarted = TTLCache('test', 10, persist_dir=str(tmp_path), clock=clock)
+    assert restarted.get(('vpcs', 'eu-west-1')) is None
+    assert restarted.get(('vpcs', 'us-east-1')) == 'b'
+
+
+def test_ttl_cache_get_or_load_coalesces_concurrent_loads():
+    """
+    Given a TTL cache
+      When many threads load the same key concurrently
+        Then the loader should be invoked only once
+    """
+    cache = TTLCache('test', 10)
+    calls = []
+    started = threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load(('k',), loader))) for _ in range(5)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 4
+
+
+def test_ttl_cache_get_or_load_does_not_cache_failures():
+    cache = TTLCache('test', 10)
+
+    def failing():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        cache.get_or_load(('k',), failing)
+    assert cache.get_or_load(('k',), lambda: 'value') == 'value'
+
+
+def test_ttl_cache_get_or_load_entry(clock):
+    cache = TTLCache('test', 10, clock=clock)
+
+    assert cache.get_or_load_entry(('k',), lambda: 'value') == (1000.0, 'value')
+    clock.now += 5
+    assert cache.get_or_load_entry(('k',), lambda: 'other') == (1000.0, 'value')
+
+
+def test_ttl_cache_max_size(clock):
+    cache = TTLCache('test', 10, max_size=2, clock=clock)
+    for i in range(3):
+        cache.set(('k', i), i)
+
+    assert cache.get(('k', 0)) is None
+    assert cache.get(('k', 2)) == 2
+
+
+def test_parse_ttls():
+    assert parse_ttls('instance_types=86400, vpcs=60') == {'instance_types': 86400, 'vpcs': 60}
+    assert parse_ttls('') == {}
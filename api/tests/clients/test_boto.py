@@ -0,0 +1,128 @@
+import threading
+
+import pytest
+from botocore.credentials import Credentials
+from botocore.exceptions import InvalidRegionError
+
+from api.clients.boto import BotoClientRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-west-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'access-key')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'secret-key')
+    return BotoClientRegistry()
+
+
+def test_boto_client_registry_builds_each_client_once(registry):
+    """
+    Given a boto client registry
+      When the same client is requested several times
+        Then it should be built only once
+    """
+    ec2 = registry.client('ec2', 'us-east-1')
+
+    assert registry.client('ec2', 'us-east-1') is ec2
+    assert registry.stats()['constructions'] == 1
+    assert registry.stats()['hits'] == 1
+    assert ec2.meta.region_name == 'us-east-1'
+
+
+def test_boto_client_registry_keys_by_service_region_and_credentials(registry):
+    credentials = Credentials('other-key', 'other-secret')
+
+    default_region = registry.client('ec2')
+    other_region = registry.client('ec2', 'us-west-2')
+    other_service = registry.client('ssm', 'us-west-2')
+    other_credentials = registry.client('ec2', 'us-west-2', credentials=credentials)
+
+    assert len({id(default_region), id(other_region), id(other_service), id(other_credentials)}) == 4
+    assert default_region.meta.region_name == 'eu-west-1'
+    assert other_credentials._request_signer._credentials.access_key == 'other-key'
+
+
+def test_boto_client_registry_keys_by_access_key(registry):
+    """
+    Given credentials held in different objects
+      When clients are requested with them
+        Then equal credentials should share a client and other access keys should not
+    """
+    client = registry.client('ec2', 'us-west-2', credentials=Credentials('other-key', 'other-secret'))
+
+    assert registry.client('ec2', 'us-west-2', credentials=Credentials('other-key', 'other-secret')) is client
+    assert registry.client('ec2', 'us-west-2', credentials=Credentials('rotated-key', 'other-secret')) is not client
+
+
+def test_boto_client_registry_rejects_invalid_regions(registry):
+    with pytest.raises(InvalidRegionError):
+        registry.client('ec2', 'not a region')
+
+    assert registry.stats()['clients'] == []
+
+
+def test_boto_client_registry_is_bounded(registry):
+    """
+    Given a boto client registry holding at most 2 clients
+      When a third client is requested
+        Then the least recently used one should be dropped
+    """
+    registry.max_clients = 2
+    registry.client('ec2', 'us-east-1')
+    registry.client('ec2', 'us-east-2')
+    registry.client('ec2', 'us-east-1')
+
+    registry.client('ec2', 'us-west-1')
+
+    assert registry.stats()['clients'] == ['ec2:us-east-1', 'ec2:us-west-1']
+    assert registry.stats()['evictions'] == 1
+
+
+def test_boto_client_registry_is_thread_safe(registry):
+    barrier = threading.Barrier(8)
+    clients = []
+
+    def worker():
+        barrier.wait()
+        clients.append(registry.client('ec2', 'us-east-1'))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(c) for c in clients}) == 1
+    assert registry.stats()['constructions'] == 1
+
+
+def test_boto_client_registry_warm_up(registry):
+    registry.warm_up(['ec2', 'not-a-service'])
+
+    assert registry.stats()['clients'] == ['ec2:default']
+
+
+def test_boto_client_registry_tuned_config(registry):
+    config = registry.client('ec2').meta.config
+
+    assert config.max_pool_connections == 25
+    assert config.retries['mode'] == 'standard'
+
+
+def test_boto_client_registry_reset_credentials(registry, monkeypatch):
+    """
+    Given clients built with credentials that changed since, e.g. in a restored Lambda snapshot
+      When the credentials are reset
+        Then new clients should use the current credentials
+        Then the service models already loaded should be reused
+    """
+    ec2 = registry.client('ec2')
+    loader = registry.session._session.get_component('data_loader')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'restored-access-key')
+
+    registry.reset_credentials()
+    restored = registry.client('ec2')
+
+    assert restored is not ec2
+    assert restored._request_signer._credentials.access_key == 'restored-access-key'
+    assert registry.session._session.get_component('data_loader') is loader
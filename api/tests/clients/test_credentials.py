@@ -0,0 +1,89 @@
+import datetime
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from api.clients.credentials import AssumedRoleCredentialProvider
+
+
+def _sts_response(expires_in):
+    expiration = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expires_in)
+    return {'Credentials': {
+        'AccessKeyId': 'access-key',
+        'SecretAccessKey': 'secret-key',
+        'SessionToken': 'session-token',
+        'Expiration': expiration,
+    }}
+
+
+@pytest.fixture
+def sts():
+    return MagicMock()
+
+
+def test_assumed_role_credentials_are_reused(sts):
+    """
+    Given an assumed role credential provider
+      When credentials are requested many times before their expiration
+        Then the role should be assumed only once
+    """
+    sts.assume_role.return_value = _sts_response(3600)
+    provider = AssumedRoleCredentialProvider('role-arn', external_id='ext-id', sts_client_factory=lambda: sts)
+
+    for _ in range(5):
+        frozen = provider.get_credentials().get_frozen_credentials()
+
+    assert frozen.access_key == 'access-key'
+    assert frozen.token == 'session-token'
+    sts.assume_role.assert_called_once_with(RoleArn='role-arn', RoleSessionName='api_session', ExternalId='ext-id')
+    assert provider.stats()['refreshes'] == 1
+    assert provider.stats()['refresh_latency']['count'] == 1
+
+
+def test_assumed_role_credentials_are_refreshed_before_expiration(sts):
+    """
+    Given an assumed role credential provider
+      When credentials are about to expire
+        Then they should be refreshed
+    """
+    sts.assume_role.side_effect = [_sts_response(60), _sts_response(3600)]
+    provider = AssumedRoleCredentialProvider('role-arn', sts_client_factory=lambda: sts)
+
+    provider.get_credentials().get_frozen_credentials()
+    provider.get_credentials().get_frozen_credentials()
+
+    assert sts.assume_role.call_count == 2
+
+
+def test_assumed_role_credentials_single_flight(sts):
+    """
+    Given an assumed role credential provider
+      When many threads request credentials concurrently
+        Then STS should be called only once
+    """
+    barrier = threading.Barrier(8)
+    sts.assume_role.return_value = _sts_response(3600)
+    provider = AssumedRoleCredentialProvider('role-arn', sts_client_factory=lambda: sts)
+
+    def worker():
+        barrier.wait()
+        provider.get_credentials().get_frozen_credentials()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    sts.assume_role.assert_called_once()
+
+
+def test_assumed_role_failures_are_counted(sts):
+    sts.assume_role.side_effect = Exception('throttled')
+    provider = AssumedRoleCredentialProvider('role-arn', sts_client_factory=lambda: sts)
+
+    with pytest.raises(Exception):
+        provider.get_credentials()
+
+    assert provider.stats()['refresh_failures'] == 1
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from api.clients.fanout import fan_out, server_timing
+
+
+def test_fan_out_runs_calls_concurrently():
+    """
+    Given a set of independent calls
+      When they are fanned out
+        Then they should run concurrently
+    """
+    barrier = threading.Barrier(3, timeout=5)
+
+    def call(value):
+        barrier.wait()
+        return value
+
+    outcomes = fan_out({'a': lambda: call(1), 'b': lambda: call(2), 'c': lambda: call(3)})
+
+    assert {name: o.value() for name, o in outcomes.items()} == {'a': 1, 'b': 2, 'c': 3}
+
+
+def test_fan_out_isolates_failures():
+    """
+    Given a set of independent calls
+      When one of them fails
+        Then the others should still succeed
+        Then the failure should be raised only when its value is requested without a default
+    """
+    def failing():
+        raise ValueError('boom')
+
+    outcomes = fan_out({'ok': lambda: 'value', 'ko': failing})
+
+    assert outcomes['ok'].value() == 'value'
+    assert outcomes['ko'].value(default=[]) == []
+    with pytest.raises(ValueError):
+        outcomes['ko'].value()
+
+
+def test_server_timing():
+    outcomes = fan_out({'vpcs': lambda: None, 'subnets': lambda: None})
+
+    header = server_timing(outcomes)
+
+    assert header.startswith('vpcs;dur=')
+    assert ', subnets;dur=' in header
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from api.clients.secrets import SecretPrefetcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def test_prefetched_secret_is_fetched_in_background():
+    """
+    Given a secret prefetched while the application is imported
+      When the secret is requested
+        Then it should wait for the background fetch instead of fetching it again
+    """
+    release = threading.Event()
+    calls = []
+
+    def fetch(secret_id):
+        calls.append((secret_id, threading.current_thread().name))
+        release.wait(5)
+        return {'userPoolId': 'pool'}
+
+    prefetcher = SecretPrefetcher(fetch=fetch)
+    prefetcher.prefetch('secret')
+    prefetcher.prefetch('secret')
+    release.set()
+
+    assert prefetcher.get('secret', timeout=5) == {'userPoolId': 'pool'}
+    assert calls == [('secret', 'secret-prefetch')]
+
+
+def test_secret_not_prefetched_is_fetched_synchronously():
+    """
+    Given a secret that was not prefetched, or whose prefetched value was already used
+      When the secret is requested
+        Then it should be fetched in the calling thread
+    """
+    calls = []
+
+    def fetch(secret_id):
+        calls.append(threading.current_thread().name)
+        return {'clientId': str(len(calls))}
+
+    prefetcher = SecretPrefetcher(fetch=fetch)
+    prefetcher.prefetch('secret')
+
+    assert prefetcher.get('secret', timeout=5) == {'clientId': '1'}
+    assert prefetcher.get('secret') == {'clientId': '2'}
+    assert calls == ['secret-prefetch', threading.current_thread().name]
+
+
+def test_prefetch_failure_is_raised_by_get():
+    """
+    Given a prefetch that fails
+      When the secret is requested
+        Then the error should be raised to the caller
+    """
+    def fetch(secret_id):
+        raise ValueError('AccessDenied')
+
+    prefetcher = SecretPrefetcher(fetch=fetch)
+    prefetcher.prefetch('secret')
+
+    with pytest.raises(ValueError):
+        prefetcher.get('secret', timeout=5)
+
+
+def test_app_import_defers_route_specific_modules():
+    """
+    Given the application module
+      When it is imported, e.g. on a Lambda cold start
+        Then the modules only needed by some routes should not be imported
+    """
+    env = {k: v for k, v in os.environ.items() if k != 'SECRET_ID'}
+    code = "import sys, app; print(' '.join(m for m in ('yaml', 'jose.jwt') if m in sys.modules))"
+    proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, stdout=subprocess.PIPE, check=True)
+
+    assert proc.stdout.decode().strip() == ''
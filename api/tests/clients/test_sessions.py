@@ -0,0 +1,93 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api.clients.sessions import PooledHttpClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    statuses = []
+    hits = []
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.hits.append(self.command)
+        status = self.statuses.pop(0) if self.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.send_header('Set-Cookie', 'session=leaked')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.statuses, _Handler.hits = [], []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_pooled_http_client_reuses_connections(server):
+    """
+    Given a pooled http client
+      When several requests are sent to the same host
+        Then a single keep-alive connection should be opened
+    """
+    client = PooledHttpClient(max_retries=0)
+
+    for _ in range(5):
+        assert client.get(f'{server}/path').status_code == 200
+
+    pool_stats = list(client.stats()['pools'].values())
+    assert pool_stats == [{'connections_opened': 1, 'requests': 5}]
+
+
+def test_pooled_http_client_retries_idempotent_methods(server):
+    """
+    Given a pooled http client
+      When a GET receives a 503
+        Then it should be retried
+      When a POST receives a 503
+        Then it should not be retried
+    """
+    client = PooledHttpClient(max_retries=2, backoff_factor=0)
+
+    _Handler.statuses = [503, 200]
+    assert client.get(f'{server}/path').status_code == 200
+    assert _Handler.hits == ['GET', 'GET']
+
+    _Handler.statuses, _Handler.hits = [503, 200], []
+    assert client.post(f'{server}/path', data='body').status_code == 503
+    assert _Handler.hits == ['POST']
+
+
+def test_pooled_http_client_does_not_store_cookies(server):
+    client = PooledHttpClient(max_retries=0)
+
+    client.get(f'{server}/path')
+
+    assert len(client.session.cookies) == 0
+
+
+def test_pooled_http_client_dedicated_host_pool(server):
+    client = PooledHttpClient(pool_maxsize=10)
+    client.configure_host(f'{server}/prod', 42)
+
+    adapter = client.session.get_adapter(f'{server}/prod/v3/clusters')
+
+    assert adapter._pool_maxsize == 42
+    assert adapter.timeout == client.timeout
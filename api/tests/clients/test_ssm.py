@@ -0,0 +1,222 @@
+import base64
+import gzip
+import io
+import os
+import shutil
+import subprocess
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+from api.clients.ssm import INLINE_OUTPUT_LIMIT, CommandBatch, SsmCommandWaiter, SsmOutputChannel, \
+    SsmOutputTruncated
+
+
+def streaming_body(data):
+    return StreamingBody(io.BytesIO(data), len(data))
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_time():
+    return FakeTime()
+
+
+@pytest.fixture
+def waiter(fake_time):
+    return SsmCommandWaiter(initial_delay=0.1, max_delay=0.5, sleep=fake_time.sleep, clock=fake_time.clock)
+
+
+def _invocation_does_not_exist():
+    return ClientError({'Error': {'Code': 'InvocationDoesNotExist', 'Message': ''}}, 'GetCommandInvocation')
+
+
+def test_ssm_waiter_backs_off_exponentially(waiter, fake_time):
+    """
+    Given an SSM command waiter
+      When the command is still in progress
+        Then it should probe again with an exponential backoff capped at max_delay
+      When the command completes
+        Then it should return its status and record the time to completion
+    """
+    ssm = MagicMock()
+    ssm.get_command_invocation.side_effect = [{'Status': 'Pending'}] + [{'Status': 'InProgress'}] * 4 + [
+        {'Status': 'Success', 'StandardOutputContent': 'out'}]
+
+    status = waiter.wait(ssm, 'command-id', 'i-123', timeout=60, command_type='squeue')
+
+    assert status['StandardOutputContent'] == 'out'
+    assert fake_time.sleeps == [0.1, 0.2, 0.4, 0.5, 0.5, 0.5]
+    assert waiter.stats()['time_to_completion']['squeue']['count'] == 1
+    assert waiter.stats()['probes'] == 6
+
+
+def test_ssm_waiter_retries_invocation_does_not_exist(waiter):
+    ssm = MagicMock()
+    ssm.get_command_invocation.side_effect = [_invocation_does_not_exist(), {'Status': 'Success'}]
+
+    assert waiter.wait(ssm, 'command-id', 'i-123', timeout=60)['Status'] == 'Success'
+    assert waiter.stats()['not_yet_registered'] == 1
+
+
+def test_ssm_waiter_raises_other_errors(waiter):
+    ssm = MagicMock()
+    ssm.get_command_invocation.side_effect = ClientError({'Error': {'Code': 'AccessDenied'}}, 'GetCommandInvocation')
+
+    with pytest.raises(ClientError):
+        waiter.wait(ssm, 'command-id', 'i-123', timeout=60)
+
+
+def test_ssm_waiter_timeout(waiter, fake_time):
+    """
+    Given an SSM command waiter
+      When the command does not complete within the timeout
+        Then it should return None without sleeping past the timeout
+    """
+    ssm = MagicMock()
+    ssm.get_command_invocation.return_value = {'Status': 'InProgress'}
+
+    assert waiter.wait(ssm, 'command-id', 'i-123', timeout=2) is None
+    assert fake_time.now == pytest.approx(2)
+    assert waiter.stats()['timeouts'] == 1
+
+
+def test_ssm_waiter_failed_command_is_returned(waiter):
+    ssm = MagicMock()
+    ssm.get_command_invocation.return_value = {'Status': 'Failed', 'StandardErrorContent': 'error'}
+
+    assert waiter.wait(ssm, 'command-id', 'i-123', timeout=60)['Status'] == 'Failed'
+
+
+def test_command_batch_demultiplex():
+    """
+    Given a batch of commands
+      When its output is demultiplexed
+        Then the stdout, stderr and exit code of each command should be returned
+        Then the commands whose output is missing should have no exit code
+    """
+    batch = CommandBatch(['echo a', 'false', 'printf b', 'echo c'], token='t')
+    marker = '__PCM_BATCH_t__'
+    output = '\n'.join([
+        f'{marker}:0:stdout', 'a', 'a2', f'{marker}:0:exit:0',
+        f'{marker}:1:stdout', f'{marker}:1:exit:1', 'error',
+        f'{marker}:2:stdout', f'b{marker}:2:exit:0',
+        f'{marker}:3:stdout', 'c',
+    ])
+
+    assert batch.demultiplex(output) == [
+        {'stdout': 'a\na2', 'stderr': '', 'exit_code': 0},
+        {'stdout': '', 'stderr': 'error', 'exit_code': 1},
+        {'stdout': 'b', 'stderr': '', 'exit_code': 0},
+        {'stdout': 'c', 'stderr': '', 'exit_code': None},
+    ]
+
+
+def test_command_batch_script():
+    batch = CommandBatch(['echo a'], token='t')
+
+    assert batch.script() == [
+        'PCM_ERR=$(mktemp)',
+        'echo "__PCM_BATCH_t__:0:stdout"',
+        'echo a 2>"$PCM_ERR"',
+        'echo "__PCM_BATCH_t__:0:exit:$?"',
+        'cat "$PCM_ERR"',
+        'echo "__PCM_BATCH_t__:end"',
+        'rm -f "$PCM_ERR"',
+    ]
+
+
+def test_ssm_output_channel_inline():
+    channel = SsmOutputChannel()
+
+    assert channel.send_command_args() == {}
+    assert channel.commands('squeue') == ['squeue']
+    assert channel.read({'StandardOutputContent': 'out'}, 'command-id', 'i-123') == 'out'
+
+
+def test_ssm_output_channel_s3():
+    """
+    Given an SSM output channel with a bucket
+      When the output of a command is truncated inline
+        Then it should be read from S3
+      When the output of a command is complete inline
+        Then S3 should not be called
+    """
+    s3 = MagicMock()
+    s3.get_object.return_value = {'Body': streaming_body(b'x' * 30000)}
+    channel = SsmOutputChannel('bucket', '/prefix/', s3_client_factory=lambda region: s3)
+
+    assert channel.send_command_args() == {'OutputS3BucketName': 'bucket', 'OutputS3KeyPrefix': 'prefix'}
+    assert channel.read({'StandardOutputContent': 'out'}, 'command-id', 'i-123', 'eu-west-1') == 'out'
+    s3.get_object.assert_not_called()
+
+    output = channel.read({'StandardOutputContent': 'x' * INLINE_OUTPUT_LIMIT}, 'command-id', 'i-123', 'eu-west-1')
+
+    assert output == 'x' * 30000
+    s3.get_object.assert_called_once_with(
+        Bucket='bucket', Key='prefix/command-id/i-123/awsrunShellScript/0.awsrunShellScript/stdout')
+    assert channel.stats() == {'inline': 1, 's3': 1, 's3_bytes': 30000}
+
+
+@pytest.mark.skipif(shutil.which('base64') is None or shutil.which('gzip') is None, reason='gzip is not installed')
+def test_ssm_output_channel_compressed():
+    """
+    Given an SSM output channel with compression
+      When a command runs
+        Then its output should be decompressed
+        Then its exit code should be preserved
+    """
+    channel = SsmOutputChannel(compress=True)
+    output = '{"jobs": []}\n' * 5000
+
+    result = subprocess.run(['sh', '-c', '\n'.join(channel.commands(f"(printf '{output}'; exit 3)"))],
+                            capture_output=True, text=True)
+
+    assert result.returncode == 3
+    assert len(result.stdout) < INLINE_OUTPUT_LIMIT
+    assert channel.read({'StandardOutputContent': result.stdout}, 'command-id', 'i-123') == output
+
+
+def test_ssm_output_channel_compressed_truncated_without_bucket():
+    """
+    Given an SSM output channel with compression and no bucket
+      When the compressed output of a command is truncated inline by SSM
+        Then a clear error should be raised instead of a decompression failure
+    """
+    channel = SsmOutputChannel(compress=True)
+    encoded = base64.b64encode(gzip.compress(os.urandom(93000).hex().encode())).decode()
+
+    with pytest.raises(SsmOutputTruncated, match='configure an output bucket'):
+        channel.read({'StandardOutputContent': encoded[:INLINE_OUTPUT_LIMIT]}, 'command-id', 'i-123')
+
+
+def test_ssm_output_channel_compressed_s3():
+    """
+    Given an SSM output channel with compression and a bucket
+      When the compressed output of a command is truncated inline by SSM
+        Then it should be read from S3 and decompressed chunk by chunk
+    """
+    output = ''.join(f'{{"job_id": {i}, "name": "caf\u00e9-{os.urandom(8).hex()}"}}\n' for i in range(5000))
+    encoded = base64.b64encode(gzip.compress(output.encode())) + b'\n'
+    s3 = MagicMock()
+    s3.get_object.return_value = {'Body': streaming_body(encoded)}
+    channel = SsmOutputChannel('bucket', compress=True, s3_client_factory=lambda region: s3)
+
+    result = channel.read({'StandardOutputContent': encoded[:INLINE_OUTPUT_LIMIT].decode()}, 'command-id', 'i-123')
+
+    assert result == output
+    assert channel.stats()['s3_bytes'] == len(encoded)
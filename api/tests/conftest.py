@@ -1,9 +1,33 @@
 import pytest
 
 import api.security
+from api.PclusterApiHandler import slurm_queries
 from app import run
 import app as _app
 
+class FakeClock:
+    """ Clock of the caches under test, moved forward by setting `now` """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(autouse=True)
+def clear_slurm_queries():
+    """ Slurm query results are cached per head node, tests must not see the results of the others """
+    slurm_queries.clear()
+    yield
+    slurm_queries.clear()
+
+
 @pytest.fixture(autouse=True)
 def mock_cognito_variables(mocker):
     mocker.patch.object(_app, 'CLIENT_ID', 'client-id')
@@ -1,8 +1,9 @@
 from unittest.mock import MagicMock
 
-from flask import Response
+from flask import Flask, Response
 
-from api.logging import RequestResponseLogging, log_request_body_and_headers, log_response_body_and_headers
+from api.logging import RequestResponseLogging, log_request_body_and_headers, log_response_body_and_headers, \
+    parse_route_rules, route_rule
 from api.logging.logger import DefaultLogger
 import logging
 
@@ -125,3 +126,67 @@ def test_log_response_body_and_headers():
     }
 
     mock_logger.info.assert_called_once_with(expected_details)
+
+
+def test_log_response_body_truncated():
+    """
+    Given a JSON response larger than the max body bytes
+      when logging the response
+        it should log its first bytes and size without parsing it
+    """
+    mock_logger = MagicMock()
+    response = Response('{"jobs": ["job-1", "job-2"]}', mimetype='application/json')
+
+    log_response_body_and_headers(mock_logger, response, max_body_bytes=8)
+
+    details = mock_logger.info.call_args[0][0]
+    assert details['body_truncated'] == '{"jobs":'
+    assert details['body_size'] == 28
+    assert 'body' not in details
+
+
+def test_log_response_body_omitted():
+    """
+    Given a max body bytes of 0
+      when logging the response
+        it should only log the headers
+    """
+    mock_logger = MagicMock()
+
+    log_response_body_and_headers(mock_logger, MockRequest(), max_body_bytes=0)
+
+    mock_logger.info.assert_called_once_with({'headers': {'int_value': 100}})
+
+
+def test_route_rules():
+    """
+    Given per-route rules
+      when looking up the rule of a path
+        it should use the longest matching prefix, or the default
+    """
+    rules = parse_route_rules('/manager=1024, /manager/sacct=0', int)
+
+    assert rules == {'/manager': 1024, '/manager/sacct': 0}
+    assert route_rule(rules, '/manager/sacct', 4096) == 0
+    assert route_rule(rules, '/manager/get_version', 4096) == 1024
+    assert route_rule(rules, '/api', 4096) == 4096
+
+
+def test_request_response_logging_sampling(mocker):
+    """
+        Given a Flask app
+          when using the RequestResponseLogging extension with a sample rate of 0 for a route
+            it should log neither the request nor the response of that route
+        """
+    mock_log_request = mocker.patch('api.logging.log_request_body_and_headers')
+    mock_log_response = mocker.patch('api.logging.log_response_body_and_headers')
+
+    app = Flask(__name__)
+    RequestResponseLogging(MagicMock(), app, sample_rate_routes={'/manager/sacct': 0.0})
+
+    with app.test_request_context('/manager/sacct'):
+        app.preprocess_request()
+        app.process_response(Response('fake-response'))
+
+    mock_log_request.assert_not_called()
+    mock_log_response.assert_not_called()
@@ -0,0 +1,159 @@
+import io
+import json
+import logging
+import threading
+
+from api.logging.pipeline import AsyncBatchHandler, JsonLinesFormatter, use_async_handler
+
+
+def _record(msg, name='pcluster-manager', level=logging.INFO, exc_info=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, None, exc_info)
+
+
+def test_async_batch_handler_writes_json_lines():
+    """
+    Given an AsyncBatchHandler
+      when records are emitted and the handler is drained
+        it should write one JSON line per record, in order
+    """
+    stream = io.StringIO()
+    handler = AsyncBatchHandler(stream, batch_size=10, flush_interval=10)
+
+    handler.emit(_record({'path': '/manager/get_version'}))
+    handler.emit(_record('second'))
+
+    assert handler.drain(timeout=5)
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines[0]['path'] == '/manager/get_version'
+    assert lines[0]['level'] == 'INFO'
+    assert lines[1]['message'] == 'second'
+    assert handler.stats()['written'] == 2
+    assert handler.stats()['pending'] == 0
+
+
+def test_async_batch_handler_batches_writes():
+    """
+    Given an AsyncBatchHandler with a batch size of 2
+      when 4 records are emitted and the handler is drained
+        it should write them in 2 batches
+    """
+    stream = io.StringIO()
+    handler = AsyncBatchHandler(stream, batch_size=2, flush_interval=10)
+
+    for i in range(4):
+        handler.emit(_record(f'record {i}'))
+
+    assert handler.drain(timeout=5)
+    assert len(stream.getvalue().splitlines()) == 4
+    assert handler.stats()['batches'] == 2
+
+
+def test_async_batch_handler_drops_records_when_full():
+    """
+    Given an AsyncBatchHandler whose writes are blocked
+      when more records than the queue size are emitted
+        it should drop and count them instead of blocking
+    """
+    unblock = threading.Event()
+
+    class BlockedStream(io.StringIO):
+        def write(self, s):
+            unblock.wait(5)
+            return super().write(s)
+
+    handler = AsyncBatchHandler(BlockedStream(), max_queue=2, batch_size=1, flush_interval=0)
+    handler.emit(_record('written'))
+    while handler.stats()['pending']:
+        pass  # the writer is blocked on the first record
+    for i in range(4):
+        handler.emit(_record(f'queued {i}'))
+
+    assert handler.stats()['dropped'] == 2
+    unblock.set()
+    assert handler.drain(timeout=5)
+    assert handler.stats()['written'] == 3
+
+
+def test_async_batch_handler_formats_exceptions_when_emitted():
+    """
+    Given an AsyncBatchHandler
+      when a record with an exception is emitted
+        it should log the traceback
+    """
+    stream = io.StringIO()
+    handler = AsyncBatchHandler(stream)
+    try:
+        raise ValueError('failure')
+    except ValueError:
+        import sys
+        handler.emit(_record('error', level=logging.ERROR, exc_info=sys.exc_info()))
+
+    assert handler.drain(timeout=5)
+    line = json.loads(stream.getvalue())
+    assert 'ValueError: failure' in line['exception']
+
+
+def test_json_lines_formatter_serializes_unknown_types():
+    """
+    Given a JsonLinesFormatter
+      when a dict message has non JSON values
+        it should merge it into the line with the values as strings
+    """
+    line = json.loads(JsonLinesFormatter().format(_record({'params': {'region'}, 'status': 200})))
+
+    assert line['params'] == "{'region'}"
+    assert line['status'] == 200
+    assert line['logger'] == 'pcluster-manager'
+
+
+def test_use_async_handler():
+    """
+    Given a logger
+      when using the async handler
+        it should only send its records to the handler
+    """
+    logger = logging.getLogger('test-use-async-handler')
+    handler = AsyncBatchHandler(io.StringIO())
+
+    use_async_handler(logger, handler)
+    use_async_handler(logger, handler)
+
+    assert logger.handlers == [handler]
+    assert not logger.propagate
+
+
+def test_async_batch_handler_snapshots_messages():
+    """
+    Given an AsyncBatchHandler
+      When the details of a queued record are mutated, e.g. a request body handled after being logged
+        Then the record should be written as it was emitted
+    """
+    stream = io.StringIO()
+    handler = AsyncBatchHandler(stream, flush_interval=10)
+    details = {'headers': {'Host': 'localhost'}, 'body': {'jobs': ['1']}}
+    record = {'message': details}
+
+    handler.emit(_record(record))
+    details['body']['jobs'].append('2')
+    record['status'] = 500
+
+    assert handler.drain(timeout=5)
+    line = json.loads(stream.getvalue())
+    assert line['message']['body'] == {'jobs': ['1']}
+    assert 'status' not in line
+
+
+def test_async_batch_handler_adds_the_aws_request_id():
+    """
+    Given an AsyncBatchHandler handling a Lambda invocation
+      When a record is emitted
+        Then its line should hold the request id of the invocation
+    """
+    stream = io.StringIO()
+    handler = AsyncBatchHandler(stream)
+    handler.aws_request_id = 'c6af9ac6-7b61-11e6-9a41-93e8deadbeef'
+
+    handler.emit(_record('handled'))
+
+    assert handler.drain(timeout=5)
+    assert json.loads(stream.getvalue())['aws_request_id'] == 'c6af9ac6-7b61-11e6-9a41-93e8deadbeef'
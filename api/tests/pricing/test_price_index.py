@@ -0,0 +1,81 @@
+import io
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from api.cache import TTLCache
+from api.pricing import PriceIndex
+
+
+def _terms(price):
+    return {'OnDemand': {'SKU.TERM': {'priceDimensions': {'SKU.TERM.DIM': {'pricePerUnit': {'USD': price}}}}}}
+
+
+@pytest.fixture
+def pricing_client():
+    client = MagicMock()
+    client.get_products.return_value = {'PriceList': [json.dumps({'terms': _terms('0.192')}), 'not-parsed']}
+    return client
+
+
+@pytest.fixture
+def index(pricing_client):
+    return PriceIndex(TTLCache('prices', 3600), client_factory=lambda: pricing_client)
+
+
+def test_price_index_lookups_are_cached(index, pricing_client):
+    """
+    Given a price index
+      When the same price is requested several times
+        Then the Pricing API should be called only once
+    """
+    assert index.price('eu-west-1', 'c5.xlarge') == 0.192
+    assert index.price('eu-west-1', 'c5.xlarge') == 0.192
+
+    pricing_client.get_products.assert_called_once()
+    filters = {f['Field']: f['Value'] for f in pricing_client.get_products.call_args.kwargs['Filters']}
+    assert filters['instanceType'] == 'c5.xlarge'
+    assert filters['regionCode'] == 'eu-west-1'
+    assert index.stats()['api_lookups'] == 1
+
+
+def test_price_index_instance_type_without_price(index, pricing_client):
+    pricing_client.get_products.return_value = {'PriceList': []}
+
+    assert index.price('eu-west-1', 'unknown') is None
+    assert index.price('eu-west-1', 'unknown') is None
+    pricing_client.get_products.assert_called_once()
+
+
+def test_price_index_nan_price(index, pricing_client):
+    pricing_client.get_products.return_value = {'PriceList': [json.dumps({'terms': _terms('NaN')})]}
+
+    assert index.price('eu-west-1', 'c5.xlarge') is None
+
+
+def test_price_index_load_offer_file(pricing_client):
+    """
+    Given a price index loaded from an offer file
+      When a price contained in the offer file is requested
+        Then the Pricing API should not be called
+    """
+    def product(instance_type, **attributes):
+        return {'productFamily': 'Compute Instance', 'attributes': {
+            'instanceType': instance_type, 'regionCode': 'eu-west-1', 'operatingSystem': 'Linux',
+            'tenancy': 'Shared', 'preInstalledSw': 'NA', 'capacitystatus': 'Used', **attributes}}
+
+    offer = {
+        'products': {
+            'SKU1': product('c5.xlarge'),
+            'SKU2': product('c5.2xlarge', capacitystatus='UnusedCapacityReservation'),
+            'SKU3': {'productFamily': 'Storage', 'attributes': {}},
+        },
+        'terms': {'OnDemand': {'SKU1': _terms('0.192')['OnDemand'], 'SKU2': _terms('0.384')['OnDemand']}},
+    }
+    index = PriceIndex(TTLCache('prices', 3600), client_factory=lambda: pricing_client,
+                       offer_files=[io.StringIO(json.dumps(offer))])
+
+    assert index.price('eu-west-1', 'c5.xlarge') == 0.192
+    pricing_client.get_products.assert_not_called()
+    assert index.stats()['offer_file_prices'] == 1
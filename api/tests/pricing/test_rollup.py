@@ -0,0 +1,85 @@
+import shutil
+import subprocess
+
+import pytest
+
+from api.pricing.rollup import USAGE_AWK, aggregate_costs, usage_columns, usage_command
+
+# User|Partition|NodeList|Start|ElapsedRaw|NNodes
+SACCT_OUTPUT = """alice|q1|q1-dy-cr1-[1-2]|2022-08-08T10:00:00|3600|2
+alice|q1|q1-dy-cr1-3|2022-08-08T12:00:00|1800|1
+alice|q1|q1-st-cr-gpu-1,q1-dy-cr-gpu-[2-3]|2022-08-09T01:00:00|3600|3
+bob|q2|q2-dy-cr1-1|2022-08-08T10:00:00|7200|1
+bob|q2|None assigned|Unknown|0|1
+"""
+
+
+@pytest.mark.skipif(shutil.which('awk') is None, reason='awk is not installed')
+def test_usage_aggregation():
+    """
+    Given the usage awk program run on the head node
+      When it aggregates sacct allocations
+        Then it should sum the node seconds per user, queue, node name prefix and day
+        Then the jobs that did not run should be ignored
+    """
+    output = subprocess.run(['awk', '-F|', USAGE_AWK], input=SACCT_OUTPUT, capture_output=True, text=True).stdout
+
+    assert sorted(output.splitlines()) == [
+        'alice|q1|q1-dy-cr1|2022-08-08|9000|2',
+        'alice|q1|q1-st-cr-gpu|2022-08-09|10800|1',
+        'bob|q2|q2-dy-cr1|2022-08-08|7200|1',
+    ]
+
+
+def test_usage_command():
+    assert usage_command('2022-08-01', '2022-09-01').startswith(
+        'sacct --allusers --allocations --noheader --parsable2 --starttime 2022-08-01 --endtime 2022-09-01 ')
+
+
+def test_aggregate_costs():
+    """
+    Given usage columns
+      When their cost is aggregated
+        Then prices should be looked up once per queue and node name prefix
+        Then the node hours without price should be reported
+    """
+    columns = usage_columns('alice|q1|q1-dy-cr1|2022-08-08|9000|2\n'
+                            'alice|q1|q1-dy-cr1|2022-08-09|3600|1\n'
+                            'bob|q1|q1-dy-cr1|2022-08-08|7200|1\n'
+                            'bob|q2|q2-dy-cr1|2022-08-08|3600|4\n')
+    lookups = []
+
+    def price(queue, nodes):
+        lookups.append((queue, nodes))
+        return {'q1': 0.5}.get(queue)
+
+    result = aggregate_costs(columns, price, group_by=('user',))
+
+    assert sorted(lookups) == [('q1', 'q1-dy-cr1'), ('q2', 'q2-dy-cr1')]
+    assert result['rollup'] == [
+        {'user': 'alice', 'jobs': 3, 'node_hours': 3.5, 'cost': 1.75, 'unpriced_node_hours': 0},
+        {'user': 'bob', 'jobs': 5, 'node_hours': 3.0, 'cost': 1.0, 'unpriced_node_hours': 1.0},
+    ]
+    assert result['totals'] == {'jobs': 8, 'node_hours': 6.5, 'cost': 2.75, 'unpriced_node_hours': 1.0}
+
+
+def test_aggregate_costs_empty():
+    assert aggregate_costs(usage_columns(''), lambda *args: 1.0) == {
+        'rollup': [], 'totals': {'jobs': 0, 'node_hours': 0, 'cost': 0, 'unpriced_node_hours': 0}}
+
+
+def test_usage_columns_skips_malformed_rows(caplog):
+    """
+    Given a usage output with malformed rows
+      When it is split in columns
+        Then the malformed rows should be logged and skipped without shifting the other rows
+    """
+    columns = usage_columns('alice|q1|q1-dy-cr1|2022-08-08|9000|2\n'
+                            'truncated|q1\n'
+                            'bob|q2|q2-dy-cr1|2022-08-08|not-a-number|1\n'
+                            'bob|q2|q2-dy-cr1|2022-08-09|3600|1\n')
+
+    assert columns['user'] == ['alice', 'bob']
+    assert columns['day'] == ['2022-08-08', '2022-08-09']
+    assert columns['node_seconds'] == [9000, 3600]
+    assert caplog.text.count('Skipping malformed usage row') == 2
@@ -8,8 +8,8 @@ from itsdangerous import BadSignature
 
 from api.exception import CSRFError
 from api.security.csrf import CSRF, generate_csrf_token
-from api.security.csrf.constants import CSRF_COOKIE_NAME
-from api.security.csrf.csrf import parse_csrf_token, validate_csrf, csrf_needed
+from api.security.csrf.constants import CSRF_COOKIE_NAME, SALT as CSRF_SALT
+from api.security.csrf.csrf import csrf_secret_key, parse_csrf_token, validate_csrf, csrf_needed
 
 SECRET_KEY, SALT = 'aaaaaa', 'bbbbb'
 MOCK_URANDOM_VALUE = b'random-value'
@@ -30,6 +30,8 @@ def test_crsf_extension_get_new_csrf(app):
               it should return the csrf_token in a json
     """
     CSRF(app)
+    # derived before taking the time, so that the slow key derivation does not shift the expiration
+    csrf_secret_key(app)
     now = datetime.datetime.utcnow()
     expected_expiration = (now + datetime.timedelta(seconds=30)).strftime('%a, %d %b %Y %H:%M:%S')
     resp = app.test_client().get('/csrf')
@@ -142,3 +144,37 @@ def test_fail_validate_csrf(mock_parse_csrf):
 
     assert not valid
     mock_parse_csrf.assert_has_calls(calls)
+
+
+def test_csrf_secret_key_is_derived_lazily(mocker):
+    """
+    When the CSRF extension is applied
+      it should not derive the secret key
+      when CSRF is first used
+        it should derive the secret key once
+    """
+    from flask import Flask
+    from api.security.csrf.csrf import csrf_secret_key
+
+    generator = mocker.Mock()
+    generator.fingerprint.return_value = 'secret'
+    app = Flask(__name__)
+    CSRF(app, generator)
+
+    generator.fingerprint.assert_not_called()
+    with app.app_context():
+        assert csrf_secret_key() == csrf_secret_key() == 'secret'
+    generator.fingerprint.assert_called_once()
+
+
+def test_validate_csrf_same_token(mock_urandom):
+    """
+    When the csrf header holds the token of the csrf cookie
+      it should succeed if the token is valid
+      it should fail if the token is not signed with the secret key
+    """
+    csrf_token = generate_csrf_token(SECRET_KEY, CSRF_SALT)
+
+    assert validate_csrf(SECRET_KEY, csrf_token, csrf_token)
+    assert not validate_csrf('other-secret', csrf_token, csrf_token)
+    assert not validate_csrf(SECRET_KEY, 'forged', 'forged')
@@ -0,0 +1,93 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from api.security.jwks import JWKSKeyStore
+
+JWKS = {'keys': [{'kid': 'key-1', 'kty': 'RSA'}, {'kid': 'key-2', 'kty': 'RSA'}]}
+ROTATED_JWKS = {'keys': [{'kid': 'key-3', 'kty': 'RSA'}]}
+
+
+def test_jwks_store_fetches_once_within_ttl(clock):
+    """
+    Given a JWKS key store
+      When the same kid is requested several times within the TTL
+        Then the key set should be fetched only once
+    """
+    fetch = MagicMock(return_value=JWKS)
+    store = JWKSKeyStore('url', ttl=60, fetch=fetch, clock=clock)
+
+    for _ in range(5):
+        assert store.get_key('key-1') == {'kid': 'key-1', 'kty': 'RSA'}
+
+    fetch.assert_called_once_with('url')
+    assert store.stats()['hits'] == 5
+    assert store.stats()['refreshes'] == 1
+
+
+def test_jwks_store_refreshes_after_ttl(clock):
+    fetch = MagicMock(return_value=JWKS)
+    store = JWKSKeyStore('url', ttl=60, fetch=fetch, clock=clock)
+
+    store.get_key('key-1')
+    clock.now += 61
+    store.get_key('key-1')
+
+    assert fetch.call_count == 2
+
+
+def test_jwks_store_unknown_kid_forces_a_bounded_refresh(clock):
+    """
+    Given a JWKS key store
+      When a token with an unknown kid is presented
+        Then it should refresh the keys to pick up a rotation
+      When unknown kids keep arriving
+        Then it should not refresh more than once per min_refresh_interval
+    """
+    fetch = MagicMock(side_effect=[JWKS, ROTATED_JWKS, ROTATED_JWKS])
+    store = JWKSKeyStore('url', ttl=3600, min_refresh_interval=30, fetch=fetch, clock=clock)
+    store.get_key('key-1')
+
+    clock.now += 31
+    assert store.get_key('key-3') == {'kid': 'key-3', 'kty': 'RSA'}
+    for _ in range(10):
+        assert store.get_key('bogus') is None
+
+    assert fetch.call_count == 2
+    assert store.stats()['forced_refreshes'] == 1
+    assert store.stats()['misses'] == 11
+
+
+def test_jwks_store_serves_stale_keys_when_refresh_fails(clock):
+    """
+    Given a JWKS key store with expired keys
+      When the identity provider cannot be reached
+        Then it should keep serving the stale keys up to max_stale
+        Then it should fail afterwards
+    """
+    fetch = MagicMock(side_effect=[JWKS, Exception('boom'), Exception('boom')])
+    store = JWKSKeyStore('url', ttl=60, max_stale=120, min_refresh_interval=0, fetch=fetch, clock=clock)
+    store.get_key('key-1')
+
+    clock.now += 100
+    assert store.get_key('key-1') == {'kid': 'key-1', 'kty': 'RSA'}
+    assert store.stats()['refresh_failures'] == 1
+    assert store.stats()['stale_served'] == 1
+
+    clock.now += 100
+    with pytest.raises(Exception):
+        store.get_key('key-1')
+
+
+def test_jwks_store_fails_without_keys(clock):
+    store = JWKSKeyStore('url', fetch=MagicMock(side_effect=Exception('boom')), clock=clock)
+
+    with pytest.raises(Exception):
+        store.get_jwks()
+
+
+def test_jwks_store_key_for_token_without_kid_returns_key_set(clock, mocker):
+    mocker.patch('jose.jwt.get_unverified_header', return_value={'alg': 'RS256'})
+    store = JWKSKeyStore('url', fetch=MagicMock(return_value=JWKS), clock=clock)
+
+    assert store.key_for('token') == JWKS
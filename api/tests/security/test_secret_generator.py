@@ -1,4 +1,9 @@
-from api.security.fingerprint import CognitoFingerprintGenerator
+import os
+import stat
+
+from api.security.fingerprint import CognitoFingerprintGenerator, StaticFingerprintGenerator
+
+EXPECTED_FINGERPRINT = '88056a6f3236e82b05de9bbb01a979b2877563c0c971148bc20aaa9aad8b3b85'
 
 
 def test_cognito_fingerprint_generator():
@@ -8,9 +13,42 @@ def test_cognito_fingerprint_generator():
         it should produce the same fingerprint everytime
     """
     client_id, client_secret, user_pool_id = 'client-id', 'client-secret', 'pool-id'
-    expected_fingerprint = '88056a6f3236e82b05de9bbb01a979b2877563c0c971148bc20aaa9aad8b3b85'
+    expected_fingerprint = EXPECTED_FINGERPRINT
 
     gen = CognitoFingerprintGenerator(client_id, client_secret, user_pool_id)
     fingerprint = gen.fingerprint()
 
     assert fingerprint == expected_fingerprint
+
+
+def test_cognito_fingerprint_generator_derives_once(mocker):
+    pbkdf2 = mocker.patch('api.security.fingerprint.pbkdf2_hmac', return_value=b'\x01')
+    gen = CognitoFingerprintGenerator('client-id', 'client-secret', 'pool-id')
+
+    assert gen.fingerprint() == gen.fingerprint() == '01'
+    pbkdf2.assert_called_once()
+
+
+def test_cognito_fingerprint_generator_file_cache(tmp_path, mocker):
+    """
+    With a cache directory
+      and a CognitoFingerprintGenerator
+        it should store the fingerprint in a file only readable by the current user
+        it should reuse the fingerprint in another process
+        it should not reuse the fingerprint of other inputs
+    """
+    CognitoFingerprintGenerator('client-id', 'client-secret', 'pool-id', cache_dir=str(tmp_path)).fingerprint()
+    cached, = tmp_path.iterdir()
+    assert stat.S_IMODE(os.stat(cached).st_mode) == 0o600
+
+    pbkdf2 = mocker.patch('api.security.fingerprint.pbkdf2_hmac', return_value=b'\x01')
+    gen = CognitoFingerprintGenerator('client-id', 'client-secret', 'pool-id', cache_dir=str(tmp_path))
+    assert gen.fingerprint() == EXPECTED_FINGERPRINT
+    pbkdf2.assert_not_called()
+
+    other = CognitoFingerprintGenerator('client-id', 'other-secret', 'pool-id', cache_dir=str(tmp_path))
+    assert other.fingerprint() == '01'
+
+
+def test_static_fingerprint_generator():
+    assert StaticFingerprintGenerator('fingerprint').fingerprint() == 'fingerprint'
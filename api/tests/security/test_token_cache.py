@@ -0,0 +1,64 @@
+from api.security.token_cache import VerifiedTokenCache, token_digest
+
+
+def test_verified_token_cache_hit_until_exp(clock):
+    """
+    Given a verified token cache
+      When a token with an exp claim is stored
+        Then it should be returned until exp
+        Then it should be evicted afterwards
+    """
+    cache = VerifiedTokenCache(clock=clock)
+    claims = {'exp': 1010, 'username': 'user'}
+
+    cache.put('token', claims)
+    assert cache.get('token') == claims
+
+    clock.now = 1010
+    assert cache.get('token') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['size'] == 0
+
+
+def test_verified_token_cache_skips_tokens_without_exp():
+    cache = VerifiedTokenCache()
+
+    cache.put('token', {'username': 'user'})
+
+    assert cache.get('token') is None
+
+
+def test_verified_token_cache_is_bounded_lru(clock):
+    """
+    Given a verified token cache with a max size
+      When more tokens than the max size are stored
+        Then the least recently used should be evicted
+    """
+    cache = VerifiedTokenCache(max_size=2, clock=clock)
+    cache.put('token-1', {'exp': 2000})
+    cache.put('token-2', {'exp': 2000})
+    cache.get('token-1')
+    cache.put('token-3', {'exp': 2000})
+
+    assert cache.get('token-2') is None
+    assert cache.get('token-1') is not None
+    assert cache.get('token-3') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_verified_token_cache_does_not_keep_raw_tokens(clock):
+    cache = VerifiedTokenCache(clock=clock)
+    cache.put('token', {'exp': 2000})
+
+    assert list(cache._entries.keys()) == [token_digest('token')]
+
+
+def test_verified_token_cache_invalidate(clock):
+    cache = VerifiedTokenCache(clock=clock)
+    cache.put('token', {'exp': 2000})
+
+    cache.invalidate('token')
+
+    assert cache.get('token') is None
+    assert cache.stats()['invalidations'] == 1
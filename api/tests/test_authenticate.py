@@ -3,9 +3,15 @@ from unittest import mock
 
 import pytest
 from flask import g
-from api.PclusterApiHandler import authenticate, USER_ROLES_CLAIM
+from api.PclusterApiHandler import authenticate, USER_ROLES_CLAIM, verified_tokens
 from jose import jwt
 
+@pytest.fixture(autouse=True)
+def clear_verified_tokens():
+    verified_tokens.clear()
+    yield
+    verified_tokens.clear()
+
 def test_authenticate(mock_disable_auth):
     """
     Given an authentication middleware
@@ -110,4 +116,25 @@ def test_authenticate_with_admin_not_in_the_user_group_succeds(mocker, app):
 
         authenticate({'some-group', 'admin'})
 
-        mock_abort.assert_not_called()
\ No newline at end of file
+        mock_abort.assert_not_called()
+
+def test_authenticate_skips_signature_verification_of_verified_tokens(mocker, app):
+    """
+    Given an authentication middleware
+      When the same access token is presented more than once
+        Then its signature should be verified only once
+        Then the groups should still be checked on every request
+    """
+    mock_jwt_decode = mocker.patch('api.PclusterApiHandler.jwt_decode',
+                                   return_value={'cognito:groups': ['my-group'], 'exp': 4102444800})
+    mock_abort = mocker.patch('api.PclusterApiHandler.abort')
+
+    with app.test_request_context(headers={'Cookie': 'accessToken=access-token'}):
+        authenticate({'my-group'})
+        authenticate({'my-group'})
+        mock_abort.assert_not_called()
+
+        authenticate({'other-group'})
+        mock_abort.assert_called_once_with(403)
+
+    mock_jwt_decode.assert_called_once_with('access-token')
@@ -0,0 +1,169 @@
+import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from api.PclusterApiHandler import _json_default, aws_config_cache, get_aws_config, get_instance_types, \
+    invalidate_aws_config_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_aws_config_cache():
+    aws_config_cache.clear()
+    yield
+    aws_config_cache.clear()
+
+
+@pytest.fixture
+def mock_clients(mocker):
+    ec2, fsx, efs = MagicMock(), MagicMock(), MagicMock()
+    ec2.describe_key_pairs.return_value = {'KeyPairs': ['keypair']}
+    ec2.describe_vpcs.return_value = {'Vpcs': ['vpc']}
+    ec2.describe_subnets.return_value = {'Subnets': ['subnet']}
+    ec2.describe_security_groups.return_value = {'SecurityGroups': [{'GroupId': 'sg-1', 'GroupName': 'sg', 'Other': 1}]}
+    ec2.get_paginator.return_value.paginate.return_value = [{'InstanceTypes': [{'InstanceType': 'c5n.18xlarge'}]}]
+    fsx.describe_file_systems.side_effect = Exception('fsx not available')
+    fsx.describe_volumes.return_value = {'Volumes': [{'Lifecycle': 'CREATED'}, {'Lifecycle': 'DELETING'}]}
+    efs.describe_file_systems.return_value = {'FileSystems': ['efs']}
+
+    clients = {'ec2': ec2, 'fsx': fsx, 'efs': efs}
+    mock_registry = mocker.patch('api.PclusterApiHandler.boto_clients')
+    mock_registry.client.side_effect = lambda service, region=None: clients[service]
+    mock_registry.default_region.return_value = 'eu-west-1'
+    mock_registry.account_id.return_value = '123456789012'
+    return clients
+
+
+def test_get_aws_config(app, mock_clients):
+    """
+    Given an handler for the /get_aws_configuration endpoint
+      When one of the optional discovery calls fails
+        Then it should return the results of the other calls
+        Then it should report the timing of every call in the Server-Timing header
+    """
+    with app.test_request_context('/manager/get_aws_configuration', query_string='region=eu-west-1'):
+        app.preprocess_request()
+        body, status, headers = get_aws_config()
+
+    assert status == 200
+    assert body == {
+        'security_groups': [{'GroupId': 'sg-1', 'GroupName': 'sg'}],
+        'keypairs': ['keypair'],
+        'vpcs': ['vpc'],
+        'subnets': ['subnet'],
+        'region': 'eu-west-1',
+        'fsx_filesystems': [],
+        'fsx_volumes': [{'Lifecycle': 'CREATED'}],
+        'efs_filesystems': ['efs'],
+        'efa_instance_types': ['c5n.18xlarge'],
+    }
+    for call in ['keypairs', 'vpcs', 'subnets', 'security_groups', 'efa_instance_types', 'fsx_filesystems',
+                 'fsx_volumes', 'efs_filesystems']:
+        assert f'{call};dur=' in headers['Server-Timing']
+
+
+def test_get_aws_config_required_call_failure_is_raised(app, mock_clients):
+    mock_clients['ec2'].describe_vpcs.side_effect = ValueError('vpcs failure')
+
+    with app.test_request_context('/manager/get_aws_configuration'):
+        app.preprocess_request()
+        with pytest.raises(ValueError):
+            get_aws_config()
+
+
+def test_get_aws_config_is_cached_per_region(app, mock_clients):
+    """
+    Given an handler for the /get_aws_configuration endpoint
+      When it is invoked twice for the same region
+        Then successful discovery calls should be served from the cache
+        Then failed discovery calls should be retried
+      When it is invoked for another region
+        Then the discovery calls should be performed again
+    """
+    with app.test_request_context('/manager/get_aws_configuration', query_string='region=eu-west-1'):
+        app.preprocess_request()
+        get_aws_config()
+        body, _, headers = get_aws_config()
+
+    assert body['vpcs'] == ['vpc']
+    assert mock_clients['ec2'].describe_vpcs.call_count == 1
+    assert mock_clients['fsx'].describe_file_systems.call_count == 2
+    assert headers['Server-Timing'].startswith('fsx_filesystems;dur=')
+
+    with app.test_request_context('/manager/get_aws_configuration', query_string='region=us-east-1'):
+        app.preprocess_request()
+        get_aws_config()
+
+    assert mock_clients['ec2'].describe_vpcs.call_count == 2
+
+
+def test_get_aws_config_is_cached_per_region_without_account(app, mock_clients, mocker):
+    """
+    Given an handler for the /get_aws_configuration endpoint
+      When the account id cannot be retrieved, e.g. STS is unreachable
+        Then the discovery results should still be returned and cached per region
+    """
+    mocker.patch('api.PclusterApiHandler.boto_clients.account_id', side_effect=Exception('sts unreachable'))
+
+    with app.test_request_context('/manager/get_aws_configuration', query_string='region=eu-west-1'):
+        app.preprocess_request()
+        get_aws_config()
+        body, status, _ = get_aws_config()
+
+    assert status == 200
+    assert body['vpcs'] == ['vpc']
+    assert mock_clients['ec2'].describe_vpcs.call_count == 1
+
+
+def test_persisted_datetimes_match_the_responses():
+    """
+    Given a discovery result with a datetime, e.g. a FSx CreationTime
+      When it is persisted to disk
+        Then it should have the format of the live responses
+    """
+    created = datetime.datetime(2021, 7, 15, 1, 22, 2, 655000, tzinfo=datetime.timezone.utc)
+
+    assert _json_default(created) == '2021-07-15T01:22:02.655Z'
+
+
+def test_get_instance_types_is_cached(app, mock_clients):
+    mock_clients['ec2'].get_paginator.return_value.paginate.return_value = [{'InstanceTypes': [{
+        'InstanceType': 't3.micro',
+        'NetworkInfo': {},
+        'MemoryInfo': {'SizeInMiB': 1024},
+        'VCpuInfo': {'DefaultVCpus': 2},
+    }]}]
+
+    with app.test_request_context('/manager/get_instance_types', query_string='region=eu-west-1'):
+        first = get_instance_types()
+        second = get_instance_types()
+
+    assert first == second == {'instance_types': [{
+        'InstanceType': 't3.micro',
+        'NetworkInfo': {'EfaSupported': False},
+        'MemoryInfo': {'SizeInMiB': 1024},
+        'VCpuInfo': {'DefaultVCpus': 2},
+        'GpuInfo': {},
+    }]}
+    mock_clients['ec2'].get_paginator.assert_called_once_with('describe_instance_types')
+
+
+def test_invalidate_aws_config_cache(app, mock_clients):
+    """
+    Given an handler for the /invalidate_aws_config_cache endpoint
+      When a kind and a region are given
+        Then only the matching entries should be invalidated
+    """
+    with app.test_request_context('/manager/get_aws_configuration', query_string='region=eu-west-1'):
+        app.preprocess_request()
+        get_aws_config()
+
+    with app.test_request_context('/manager/invalidate_aws_config_cache', query_string='region=eu-west-1&kind=vpcs'):
+        assert invalidate_aws_config_cache() == {'invalidated': 1}
+
+    with app.test_request_context('/manager/get_aws_configuration', query_string='region=eu-west-1'):
+        app.preprocess_request()
+        get_aws_config()
+
+    assert mock_clients['ec2'].describe_vpcs.call_count == 2
+    assert mock_clients['ec2'].describe_subnets.call_count == 1
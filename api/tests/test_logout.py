@@ -4,7 +4,7 @@ from unittest import mock
 import pytest
 from werkzeug.utils import redirect
 
-from api.PclusterApiHandler import logout
+from api.PclusterApiHandler import logout, verified_tokens
 
 @pytest.fixture
 def mock_cognito_redirect(mocker):
@@ -45,4 +45,17 @@ def test_logout_clear_cookies(app, mock_revoke_refresh_token):
     assert "idToken=; Expires=Thu, 01 Jan 1970 00:00:00 GMT; Path=/" in cookie_list
     assert "refreshToken=; Expires=Thu, 01 Jan 1970 00:00:00 GMT; Path=/" in cookie_list
     assert "csrf=; Expires=Thu, 01 Jan 1970 00:00:00 GMT; Path=/" in cookie_list
-    mock_revoke_refresh_token.assert_called_once_with('refresh-token')
\ No newline at end of file
+    mock_revoke_refresh_token.assert_called_once_with('refresh-token')
+
+def test_logout_invalidates_verified_access_token(app, mock_revoke_refresh_token):
+    """
+    Given an handler for the /logout endpoint
+      When user logs out
+        Then the access token should be removed from the verified tokens cache
+    """
+    verified_tokens.put('access-token', {'exp': 4102444800})
+
+    with app.test_request_context(headers={'Cookie': 'accessToken=access-token;refreshToken=refresh-token'}):
+        logout()
+
+    assert verified_tokens.get('access-token') is None
@@ -2,7 +2,7 @@ from unittest import mock
 from api.PclusterApiHandler import login
 
 
-@mock.patch("api.PclusterApiHandler.requests.post")
+@mock.patch("api.PclusterApiHandler.http.post")
 def test_on_successful_login_auth_cookies_are_set(mock_post, client):
     with client as flaskClient:
         response_dict = {
@@ -21,9 +21,21 @@ def test_on_successful_login_auth_cookies_are_set(mock_post, client):
 def test_login_with_no_access_token_returns_401(mocker, app):
     with app.test_request_context('/login', query_string='code=testCode'):
         mock_abort = mocker.patch('api.PclusterApiHandler.abort')
-        mock_post = mocker.patch('api.PclusterApiHandler.requests.post')
+        mock_post = mocker.patch('api.PclusterApiHandler.http.post')
         mock_post.return_value.json.return_value = {'access_token': None}
 
         login()
 
         mock_abort.assert_called_once_with(401)
+
+
+def test_mutating_cluster_proxy_calls_invalidate_cluster_config(mocker, app, mock_csrf_needed, mock_disable_auth):
+    mock_sigv4_request = mocker.patch('api.PclusterApiHandler.sigv4_request')
+    mock_sigv4_request.return_value.json.return_value = {}
+    mock_sigv4_request.return_value.status_code = 200
+    mock_invalidate = mocker.patch('api.PclusterApiHandler.cluster_configs.invalidate')
+
+    app.test_client().put('/api/', query_string={'path': '/v3/clusters/my-cluster', 'region': 'eu-west-1'}, json={})
+    app.test_client().post('/api/', query_string={'path': '/v3/images/custom'}, json={})
+
+    mock_invalidate.assert_called_once_with('my-cluster', 'eu-west-1')
@@ -0,0 +1,93 @@
+import pytest
+
+from api.cache.cluster_config import ClusterConfiguration
+from api.PclusterApiHandler import cost_rollup, price_estimate, _job_compute_resource
+
+CLUSTER_CONFIG = """
+Scheduling:
+  SlurmQueues:
+    - Name: single
+      ComputeResources:
+        - Name: cr1
+          InstanceType: c5.xlarge
+    - Name: multi
+      ComputeResources:
+        - Name: cr1
+          InstanceType: c5.xlarge
+        - Name: cr1-gpu
+          Instances:
+            - InstanceType: g4dn.xlarge
+            - InstanceType: g4dn.2xlarge
+"""
+
+PRICES = {'c5.xlarge': 0.192, 'g4dn.xlarge': 0.526, 'g4dn.2xlarge': 0.752}
+
+
+@pytest.fixture(autouse=True)
+def mock_prices(mocker):
+    mocker.patch('api.PclusterApiHandler.get_cluster_configuration', return_value=ClusterConfiguration(CLUSTER_CONFIG))
+    mocker.patch('api.PclusterApiHandler.price_index.price', side_effect=lambda region, it: PRICES[it])
+
+
+def test_price_estimate_single_compute_resource(app):
+    with app.test_request_context(query_string='cluster_name=cluster&region=eu-west-1&queue_name=single'):
+        assert price_estimate() == {'estimate': 0.192, 'estimates': {'cr1': 0.192}}
+
+
+def test_price_estimate_multiple_compute_resources(app):
+    """
+    Given an handler for the /price_estimate endpoint
+      When the queue has multiple compute resources
+        Then it should return an estimate for each of them
+        Then flexible compute resources should be estimated with their most expensive instance type
+      When a compute resource is given
+        Then it should return its estimate
+    """
+    with app.test_request_context(query_string='cluster_name=cluster&region=eu-west-1&queue_name=multi'):
+        assert price_estimate() == {'estimates': {'cr1': 0.192, 'cr1-gpu': 0.752}}
+
+    query = 'cluster_name=cluster&region=eu-west-1&queue_name=multi&compute_resource=cr1-gpu'
+    with app.test_request_context(query_string=query):
+        assert price_estimate() == {'estimate': 0.752}
+
+
+def test_price_estimate_unknown_compute_resource(app):
+    query = 'cluster_name=cluster&region=eu-west-1&queue_name=multi&compute_resource=other'
+    with app.test_request_context(query_string=query):
+        _, status = price_estimate()
+
+    assert status == 400
+
+
+@pytest.mark.parametrize('nodes, expected', [
+    ('multi-dy-cr1-1', 'cr1'),
+    ('multi-st-cr1-gpu-[1-3]', 'cr1-gpu'),
+    ('multi-dy-cr1-[1-2],multi-dy-cr1-gpu-1', 'cr1'),
+    ('None assigned', None),
+])
+def test_job_compute_resource(nodes, expected):
+    assert _job_compute_resource({'nodes': nodes}, 'multi', ['cr1', 'cr1-gpu']) == expected
+
+
+def test_cost_rollup(app, mocker):
+    """
+    Given an handler for the /manager/cost_rollup endpoint
+      When the usage of the cluster is aggregated
+        Then the node hours should be priced with the compute resource of their nodes
+    """
+    mocker.patch('api.PclusterApiHandler.ssm_command', return_value=(
+        'alice|multi|multi-dy-cr1-gpu|2022-08-08|3600|1\n'
+        'alice|multi|multi-dy-cr1|2022-08-08|3600|1\n'
+        'bob|single|single-st-cr1|2022-08-09|7200|2\n'
+        'bob|removed|removed-dy-cr1|2022-08-09|3600|1\n'))
+    mocker.patch('api.PclusterApiHandler.get_cluster_configuration', return_value=ClusterConfiguration(CLUSTER_CONFIG))
+
+    query = 'cluster_name=cluster&region=eu-west-1&instance_id=i-123&starttime=2022-08-01&group_by=user,queue'
+    with app.test_request_context(query_string=query):
+        result = cost_rollup()
+
+    assert result['rollup'] == [
+        {'user': 'alice', 'queue': 'multi', 'jobs': 2, 'node_hours': 2.0, 'cost': 0.944, 'unpriced_node_hours': 0},
+        {'user': 'bob', 'queue': 'removed', 'jobs': 1, 'node_hours': 1.0, 'cost': 0, 'unpriced_node_hours': 1.0},
+        {'user': 'bob', 'queue': 'single', 'jobs': 2, 'node_hours': 2.0, 'cost': 0.384, 'unpriced_node_hours': 0},
+    ]
@@ -0,0 +1,194 @@
+import json
+import threading
+import time
+
+import pytest
+
+from api.PclusterApiHandler import cancel_job, queue_events, queue_events_supported, queue_status, slurm_queries
+
+JOBS = [{'job_id': 1, 'name': 'job', 'job_state': 'RUNNING'}]
+
+
+@pytest.fixture
+def mock_ssm_command(mocker):
+    return mocker.patch('api.PclusterApiHandler.ssm_command', return_value=json.dumps(JOBS))
+
+
+def test_queue_status_coalesces_concurrent_polls(app, mocker):
+    """
+    Given an handler for the /manager/queue_status endpoint
+      When many tabs poll the same head node concurrently
+        Then a single SSM command should be sent
+        Then every poll should get its result
+    """
+    started = threading.Event()
+
+    def slow_squeue(*args):
+        started.set()
+        time.sleep(0.2)
+        return json.dumps(JOBS)
+
+    mock_ssm_command = mocker.patch('api.PclusterApiHandler.ssm_command', side_effect=slow_squeue)
+
+    results = []
+
+    def poll():
+        with app.test_request_context(query_string={'instance_id': 'i-123', 'region': 'eu-west-1'}):
+            results.append(queue_status())
+
+    threads = [threading.Thread(target=poll) for _ in range(5)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mock_ssm_command.call_count == 1
+    assert [body['jobs'] for body, _, _ in results] == [JOBS] * 5
+
+
+def test_queue_status_cache_age(app, mock_ssm_command, mocker):
+    """
+    Given an handler for the /manager/queue_status endpoint
+      When the jobs are served from the cache
+        Then the Age header should report how old they are
+    """
+    with app.test_request_context(query_string={'instance_id': 'i-123', 'region': 'eu-west-1'}):
+        _, _, headers = queue_status()
+        assert headers == {'Age': '0'}
+
+        mocker.patch('api.PclusterApiHandler.time.time', return_value=time.time() + 3)
+        _, _, headers = queue_status()
+        assert headers == {'Age': '3'}
+
+    assert mock_ssm_command.call_count == 1
+
+
+def test_queue_status_cached_per_user(app, mock_ssm_command):
+    with app.test_request_context(query_string={'instance_id': 'i-123', 'region': 'eu-west-1', 'user': 'alice'}):
+        queue_status()
+    with app.test_request_context(query_string={'instance_id': 'i-123', 'region': 'eu-west-1', 'user': 'bob'}):
+        queue_status()
+
+    assert mock_ssm_command.call_count == 2
+
+
+def test_cancel_job_invalidates_queue_status(app, mock_ssm_command):
+    """
+    Given an handler for the /manager/queue_status endpoint
+      When a job of the head node is cancelled
+        Then the next poll should query the head node again
+    """
+    query = {'instance_id': 'i-123', 'region': 'eu-west-1'}
+    with app.test_request_context(query_string=query):
+        queue_status()
+    with app.test_request_context(query_string={**query, 'job_id': '1'}):
+        cancel_job()
+    with app.test_request_context(query_string=query):
+        queue_status()
+
+    assert mock_ssm_command.call_count == 3
+
+
+def test_queue_status_delta(app, mocker):
+    """
+    Given an handler for the /manager/queue_status endpoint
+      When a client sends the version of the queue it has
+        Then only the jobs added, removed or changed since then should be returned
+    """
+    queued = [{'job_id': 1, 'job_state': 'RUNNING'}, {'job_id': 2, 'job_state': 'PENDING'}]
+    mocker.patch('api.PclusterApiHandler.ssm_command', side_effect=lambda *args: json.dumps(queued))
+    query = {'instance_id': 'i-123', 'region': 'eu-west-1'}
+
+    with app.test_request_context(query_string=query):
+        body, _, _ = queue_status()
+    version = body['version']
+
+    queued = [{'job_id': 2, 'job_state': 'RUNNING'}, {'job_id': 3, 'job_state': 'PENDING'}]
+    slurm_queries.clear()
+    with app.test_request_context(query_string={**query, 'since': version}):
+        delta, _, _ = queue_status()
+
+    assert delta['since'] == version
+    assert delta['added'] == [{'job_id': 3, 'job_state': 'PENDING'}]
+    assert delta['removed'] == [1]
+    assert delta['changed'] == [{'job_id': 2, 'job_state': 'RUNNING'}]
+
+    with app.test_request_context(query_string={**query, 'since': 'unknown'}):
+        reset, _, _ = queue_status()
+    assert reset == {'version': delta['version'], 'reset': True, 'jobs': queued}
+
+
+def test_queue_status_long_poll(app, mocker):
+    """
+    Given an handler for the /manager/queue_status endpoint
+      When a client waits for a change of an unchanged queue
+        Then the queue should be refreshed until it changes
+    """
+    outputs = iter([[{'job_id': 1}], [{'job_id': 1}], [{'job_id': 1}, {'job_id': 2}]])
+    mocker.patch('api.PclusterApiHandler.ssm_command', side_effect=lambda *args: json.dumps(next(outputs)))
+    mocker.patch('api.PclusterApiHandler.SLURM_QUERY_CACHE_TTL', 0)
+    mocker.patch.object(slurm_queries, 'default_ttl', 0)
+    query = {'instance_id': 'i-123', 'region': 'eu-west-1'}
+
+    with app.test_request_context(query_string=query):
+        body, _, _ = queue_status()
+    with app.test_request_context(query_string={**query, 'since': body['version'], 'wait': 5}):
+        delta, _, _ = queue_status()
+
+    assert delta['added'] == [{'job_id': 2}]
+
+
+def test_queue_events(app, mocker):
+    """
+    Given an handler for the /manager/queue_events endpoint
+      When the queue changes
+        Then a delta event should be sent with the version as event id
+    """
+    outputs = iter([[{'job_id': 1}], [{'job_id': 1}, {'job_id': 2}]])
+    mocker.patch('api.PclusterApiHandler.ssm_command', side_effect=lambda *args: json.dumps(next(outputs)))
+    mocker.patch('api.PclusterApiHandler.QUEUE_EVENTS_MAX_DURATION', 5)
+    mocker.patch('api.PclusterApiHandler.time.sleep', side_effect=lambda _: slurm_queries.clear())
+
+    with app.test_request_context(query_string={'instance_id': 'i-123', 'region': 'eu-west-1'}):
+        response = queue_events()
+        events = response.response
+        first, second = next(events), next(events)
+
+    assert response.mimetype == 'text/event-stream'
+    assert first.startswith('id: ') and '"reset":true' in first
+    assert '"added":[{"job_id":2}]' in second
+
+
+def test_queue_events_supported(monkeypatch):
+    """
+    Given the Server-Sent Events of the queue
+      When running on Lambda with the buffered entrypoint
+        Then they should not be served, the stream would only be sent once complete
+    """
+    monkeypatch.delenv('AWS_LAMBDA_FUNCTION_NAME', raising=False)
+    assert queue_events_supported()
+
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'pcluster-manager')
+    assert not queue_events_supported()
+
+    monkeypatch.setattr('api.PclusterApiHandler.LAMBDA_RESPONSE_STREAMING', True)
+    assert queue_events_supported()
+
+
+def test_queue_events_end_before_the_lambda_timeout(app, mocker):
+    """
+    Given an handler for the /manager/queue_events endpoint invoked on Lambda
+      When the invocation ends before QUEUE_EVENTS_MAX_DURATION
+        Then the stream should end a few seconds before the invocation
+    """
+    mocker.patch('api.PclusterApiHandler.ssm_command', return_value=json.dumps(JOBS))
+    context = mocker.Mock()
+    context.get_remaining_time_in_millis.return_value = 5000
+
+    with app.test_request_context(query_string={'instance_id': 'i-123', 'region': 'eu-west-1'},
+                                  environ_base={'serverless.context': context}):
+        events = list(queue_events().response)
+
+    assert events == []
@@ -8,7 +8,7 @@ from api.logging.logger import DefaultLogger
 
 @pytest.fixture
 def mock_requests(mocker):
-    return mocker.patch('api.PclusterApiHandler.requests')
+    return mocker.patch('api.PclusterApiHandler.http')
 
 @pytest.fixture
 def mock_logger(mocker):
@@ -0,0 +1,95 @@
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from api.PclusterApiHandler import _sacct_command, _encode_sacct_cursor, sacct
+from api.validation.schemas import Sacct
+
+SACCT_OUTPUT = {'jobs': [
+    {'job_id': job_id, 'name': f'job-{job_id}', 'user': 'ec2-user', 'partition': 'queue', 'state': {'current': 'COMPLETED'},
+     'exit_code': {'status': 'SUCCESS'}, 'time': {'submission': 1660000000 + job_id}}
+    for job_id in [3, 1, 5, 2, 4]
+]}
+
+PARAMS = {'instance_id': 'i-123', 'region': 'eu-west-1', 'cluster_name': 'cluster'}
+
+
+@pytest.fixture
+def mock_head_node(mocker, tmp_path):
+    """ Runs the Slurm commands locally, sacct replaced by a canned output """
+    sacct_output = tmp_path / 'sacct.json'
+    sacct_output.write_text(json.dumps(SACCT_OUTPUT))
+    commands = []
+
+    def run(region, instance_id, command, *args):
+        commands.append(command)
+        command = re.sub(r'^runuser -l \S+ -c ', 'sh -c ', command)
+        command = re.sub(r'sacct [^|]*--json', f'cat {sacct_output}', command)
+        result = subprocess.run(['sh', '-c', command], capture_output=True, text=True, env={'TZ': 'UTC'})
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+
+    mocker.patch('api.PclusterApiHandler._run_ssm_command', side_effect=run)
+    mocker.patch('api.PclusterApiHandler._price_estimates', return_value={})
+    return commands
+
+
+@pytest.mark.skipif(shutil.which('jq') is None, reason='jq is not installed')
+def test_sacct_pagination(app, mock_head_node):
+    """
+    Given an handler for the /manager/sacct endpoint
+      When the jobs do not fit in a page
+        Then the jobs should be returned page by page, ordered by job id
+        Then the time window of the next page should start at the submission of the last job
+    """
+    with app.test_request_context(method='POST', query_string={**PARAMS, 'limit': 2, 'fields': 'job_id,name'}, json={}):
+        first = sacct()
+    with app.test_request_context(method='POST', json={},
+                                  query_string={**PARAMS, 'limit': 2, 'fields': 'job_id,name',
+                                                'cursor': first['next_cursor']}):
+        second = sacct()
+    with app.test_request_context(method='POST', json={},
+                                  query_string={**PARAMS, 'limit': 2, 'cursor': second['next_cursor']}):
+        last = sacct()
+
+    assert first['jobs'] == [{'job_id': 1, 'name': 'job-1'}, {'job_id': 2, 'name': 'job-2'}]
+    assert second['jobs'] == [{'job_id': 3, 'name': 'job-3'}, {'job_id': 4, 'name': 'job-4'}]
+    assert [job['job_id'] for job in last['jobs']] == [5]
+    assert set(last['jobs'][0]) == {'name', 'user', 'partition', 'state', 'job_id', 'exit_code'}
+    assert 'next_cursor' not in last
+    assert '--starttime $(date -d @1660000002 +%Y-%m-%dT%H:%M:%S)' in mock_head_node[1]
+
+
+@pytest.mark.skipif(shutil.which('jq') is None, reason='jq is not installed')
+def test_sacct_jobs(app, mock_head_node):
+    with app.test_request_context(method='POST', query_string=PARAMS, json={'jobs': '1'}):
+        result = sacct()
+
+    assert result['jobs'][0] == SACCT_OUTPUT['jobs'][1]
+
+
+def test_sacct_invalid_cursor(app, mock_head_node):
+    with app.test_request_context(method='POST', query_string={**PARAMS, 'cursor': 'eyJqb2JfaWQiOjF9'}, json={}):
+        assert sacct() == ({'message': 'Invalid cursor.'}, 400)
+    assert mock_head_node == []
+
+
+def test_sacct_projection_validation():
+    assert Sacct.validate({**PARAMS, 'fields': 'job_id,name', 'limit': '50'}) == {}
+    assert 'fields' in Sacct.validate({**PARAMS, 'fields': 'job_id,$(reboot)'})
+    assert 'limit' in Sacct.validate({**PARAMS, 'limit': '0'})
+
+
+# jq builtins added in jq 1.6, Amazon Linux 2 and Ubuntu 18.04 head nodes ship jq 1.5
+JQ_16_BUILTINS = {'localtime', 'strflocaltime', 'INDEX', 'IN', 'ascii', 'halt', 'halt_error', 'builtins', '$ENV',
+                  '$__loc__'}
+
+
+def test_sacct_command_is_jq_15_compatible():
+    command = _sacct_command({}, cursor=_encode_sacct_cursor({'job_id': 2, 'submission': 1660000002}))
+    identifiers = set(re.findall(r'\$?[A-Za-z_]\w*', command.split('| jq -c ', 1)[1]))
+
+    assert identifiers.isdisjoint(JQ_16_BUILTINS)
@@ -0,0 +1,89 @@
+import json
+import subprocess
+
+import pytest
+
+from api.PclusterApiHandler import slurm_batch, slurm_queries
+from api.validation.schemas import SlurmBatch
+
+JOBS = [{'job_id': 1, 'name': 'job', 'job_state': 'RUNNING', 'partition': 'queue'}]
+
+
+@pytest.fixture
+def mock_run_ssm_command(mocker):
+    """ Runs the batch script locally, each Slurm command replaced by a canned output """
+    outputs = {
+        'squeue': (json.dumps(JOBS), 0),
+        'scontrol': ('JobId=1 JobName=job JobState=RUNNING', 0),
+        'sacct': ('', 1),
+    }
+
+    def run(region, instance_id, script, *args):
+        for line in script.split('\n'):
+            if line.startswith('runuser'):
+                output, code = outputs[line.split("'")[1].split(' ')[0]]
+                replacement = f"(echo '{output}'; echo 'sacct: error' >&2; exit {code})" if code else f"echo '{output}'"
+                script = script.replace(line.split(' 2>')[0], replacement)
+        return subprocess.run(['sh', '-c', script], capture_output=True, text=True).stdout
+
+    return mocker.patch('api.PclusterApiHandler._run_ssm_command', side_effect=run)
+
+
+def test_slurm_batch(app, mock_run_ssm_command):
+    """
+    Given an handler for the /manager/slurm_batch endpoint
+      When several Slurm commands are batched
+        Then a single SSM command should be sent
+        Then the output of each command should be returned in order
+        Then the failure of a command should not affect the others
+    """
+    body = {'instance_id': 'i-123', 'region': 'eu-west-1', 'cluster_name': 'cluster', 'commands': [
+        {'type': 'scontrol_job', 'job_id': '1', 'id': 'job'},
+        {'type': 'queue_status'},
+        {'type': 'sacct', 'options': {'jobs': '1'}},
+    ]}
+
+    with app.test_request_context(method='POST', json=body):
+        result = slurm_batch()
+
+    assert mock_run_ssm_command.call_count == 1
+    assert result == {'results': [
+        {'type': 'scontrol_job', 'id': 'job', 'data': {'JobId': '1', 'JobName': 'job', 'JobState': 'RUNNING'}},
+        {'type': 'queue_status', 'data': JOBS},
+        {'type': 'sacct', 'error': 'sacct: error'},
+    ]}
+    assert slurm_queries.get(('squeue', 'eu-west-1', 'i-123', 'ec2-user')) == JOBS
+
+
+def test_slurm_batch_truncated_output(app, mocker):
+    mocker.patch('api.PclusterApiHandler._run_ssm_command', return_value='')
+    body = {'instance_id': 'i-123', 'region': 'eu-west-1', 'commands': [{'type': 'queue_status'}]}
+
+    with app.test_request_context(method='POST', json=body):
+        result = slurm_batch()
+
+    assert 'truncated' in result['results'][0]['error']
+
+
+def test_slurm_batch_validation():
+    """
+    Given the schema of the /manager/slurm_batch endpoint
+      When a command is unknown or invalid for the schema of its single endpoint
+        Then the errors should be reported per command
+    """
+    errors = SlurmBatch.validate({'instance_id': 'i-123', 'region': 'eu-west-1', 'commands': [
+        {'type': 'queue_status'},
+        {'type': 'scontrol_job'},
+        {'type': 'reboot'},
+        {'type': 'sacct', 'options': {'jobs': '1'}},
+    ]})
+
+    assert set(errors['commands']) == {1, 2, 3}
+    assert 'job_id' in errors['commands'][1]
+    assert 'type' in errors['commands'][2]
+    assert 'cluster_name' in errors['commands'][3]
+
+
+def test_slurm_batch_validation_successful():
+    assert SlurmBatch.validate({'instance_id': 'i-123', 'region': 'eu-west-1', 'cluster_name': 'cluster',
+                                'commands': [{'type': 'cancel_job', 'job_id': '1'}, {'type': 'sacct'}]}) == {}
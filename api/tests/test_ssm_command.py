@@ -0,0 +1,47 @@
+import pytest
+
+from api.PclusterApiHandler import ssm_command
+
+
+@pytest.fixture
+def mock_ssm(mocker):
+    ssm = mocker.patch('api.PclusterApiHandler.boto_clients').client.return_value
+    ssm.send_command.return_value = {'Command': {'CommandId': 'command-id'}}
+    return ssm
+
+
+@pytest.fixture
+def mock_wait(mocker):
+    return mocker.patch('api.PclusterApiHandler.ssm_waiter.wait')
+
+
+def test_ssm_command(mock_ssm, mock_wait):
+    """
+    Given the ssm_command function
+      When a slurm command completes successfully
+        Then it should wait with the timeout of the command type
+        Then it should return the command output
+    """
+    mock_wait.return_value = {'Status': 'Success', 'StandardOutputContent': 'output'}
+
+    assert ssm_command('eu-west-1', 'i-123', 'ec2-user', 'squeue --json') == 'output'
+
+    mock_ssm.send_command.assert_called_once()
+    assert mock_ssm.send_command.call_args.kwargs['Parameters'] == {
+        'commands': ["runuser -l ec2-user -c 'squeue --json'"]}
+    assert mock_wait.call_args.args[1:4] == ('command-id', 'i-123', 60)
+    assert mock_wait.call_args.kwargs['command_type'] == 'squeue'
+
+
+def test_ssm_command_timeout(mock_ssm, mock_wait):
+    mock_wait.return_value = None
+
+    with pytest.raises(Exception, match='Timed out waiting for command to complete.'):
+        ssm_command('eu-west-1', 'i-123', 'ec2-user', 'squeue --json')
+
+
+def test_ssm_command_failure(mock_ssm, mock_wait):
+    mock_wait.return_value = {'Status': 'Failed', 'StandardErrorContent': 'command not found'}
+
+    with pytest.raises(Exception, match='command not found'):
+        ssm_command('eu-west-1', 'i-123', 'ec2-user', 'squeue --json')
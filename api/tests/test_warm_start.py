@@ -0,0 +1,56 @@
+from unittest.mock import call
+
+import api.PclusterApiHandler
+from api.PclusterApiHandler import reset_after_restore, warm_up_auth
+from app import warm_up
+
+
+def test_warm_up_fetches_signing_keys_and_csrf_secret(mocker, app):
+    """
+    Given an app built in the Lambda init phase
+      When it is warmed up
+        Then the CSRF secret key should be derived
+        Then the signing keys should be fetched
+    """
+    mocker.patch.object(api.PclusterApiHandler, 'USER_POOL_ID', 'user-pool')
+    mock_refresh = mocker.patch.object(api.PclusterApiHandler.jwks_store, 'refresh', return_value=True)
+    mock_fingerprint = mocker.patch.object(app.extensions['csrf'], 'fingerprint', return_value='secret-key')
+
+    warm_up(app)
+
+    mock_refresh.assert_called_once_with()
+    mock_fingerprint.assert_called_once_with()
+
+
+def test_warm_up_auth_skips_signing_keys_without_user_pool(mocker, monkeypatch):
+    """
+    Given no user pool nor JWKS url configured
+      When the authentication is warmed up
+        Then no signing key should be fetched
+    """
+    mocker.patch.object(api.PclusterApiHandler, 'USER_POOL_ID', None)
+    monkeypatch.delenv('JWKS_URL', raising=False)
+    mock_refresh = mocker.patch.object(api.PclusterApiHandler.jwks_store, 'refresh')
+
+    warm_up_auth()
+
+    mock_refresh.assert_not_called()
+
+
+def test_reset_after_restore(mocker):
+    """
+    Given an execution environment restored from a snapshot
+      When it is reset
+        Then the random seed, the pooled connections and the credentials should be renewed
+    """
+    mock_seed = mocker.patch('api.PclusterApiHandler.random.seed')
+    mock_close = mocker.patch.object(api.PclusterApiHandler.http, 'close')
+    mock_boto_clients = mocker.patch.object(api.PclusterApiHandler, 'boto_clients')
+    mock_credentials = mocker.patch.object(api.PclusterApiHandler, 'api_credentials')
+
+    reset_after_restore()
+
+    mock_seed.assert_called_once_with()
+    mock_close.assert_called_once_with()
+    assert mock_boto_clients.mock_calls == [call.reset_credentials(), call.warm_up()]
+    mock_credentials.invalidate.assert_called_once_with()
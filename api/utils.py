@@ -13,8 +13,8 @@ import os
 
 import dateutil
 from flask import Flask, Response, request, send_from_directory
-import requests
 
+from api.clients.sessions import http
 from api.pcm_globals import PCMGlobals, logger
 from api.exception import ExceptionHandler
 from api.logging import RequestResponseLogging
@@ -73,7 +73,7 @@ def proxy_to(to_url):
     """
     Proxies Flask requests to the provided to_url
     """
-    resp = requests.request(
+    resp = http.request(
         method=request.method,
         url=to_url,
         headers={key: value for (key, value) in request.headers if key != 'Host'},
@@ -1,7 +1,7 @@
 from marshmallow import Schema, fields, validate, INCLUDE, validates_schema, ValidationError
 
 from api.validation.validators import comma_splittable, aws_region_validator, is_alphanumeric_with_hyphen, \
-    valid_api_log_levels_predicate, size_not_exceeding
+    valid_api_log_levels_predicate, size_not_exceeding, comma_separated_choices, is_slurm_time
 
 
 class EC2ActionSchema(Schema):
@@ -52,6 +52,16 @@ class GetInstanceTypesSchema(Schema):
 GetInstanceTypes = GetInstanceTypesSchema(unknown=INCLUDE)
 
 
+AWS_CONFIG_CACHE_KINDS = ['keypairs', 'vpcs', 'subnets', 'security_groups', 'efa_instance_types', 'fsx_filesystems',
+                          'fsx_volumes', 'efs_filesystems', 'instance_types']
+
+class InvalidateAwsConfigCacheSchema(Schema):
+    region = fields.String(validate=aws_region_validator)
+    kind = fields.String(validate=validate.OneOf(AWS_CONFIG_CACHE_KINDS))
+
+InvalidateAwsConfigCache = InvalidateAwsConfigCacheSchema(unknown=INCLUDE)
+
+
 class GetDcvSessionSchema(Schema):
     user = fields.String(validate=validate.Length(max=64))
     instance_id = fields.String(required=True, validate=validate.Length(max=60))
@@ -64,6 +74,8 @@ class QueueStatusSchema(Schema):
     user = fields.String(validate=validate.Length(max=64))
     instance_id = fields.String(required=True, validate=validate.Length(max=60))
     region = fields.String(required=True, validate=aws_region_validator)
+    since = fields.String(validate=validate.Length(max=64))
+    wait = fields.Integer(validate=validate.Range(min=0, max=25))
 
 QueueStatus = QueueStatusSchema(unknown=INCLUDE)
 
@@ -86,15 +98,66 @@ class CancelJobSchema(Schema):
 CancelJob = CancelJobSchema(unknown=INCLUDE)
 
 
+# keys of the jobs of sacct --json that can be projected
+SACCT_FIELDS = ['account', 'allocation_nodes', 'array', 'association', 'cluster', 'comment', 'constraints',
+                'derived_exit_code', 'exit_code', 'flags', 'group', 'het', 'job_id', 'mcs', 'name', 'nodes', 'partition',
+                'priority', 'qos', 'required', 'reservation', 'state', 'steps', 'time', 'tres', 'user', 'wckey',
+                'working_directory']
+
 class SacctSchema(Schema):
     user = fields.String(validate=validate.Length(max=64))
     instance_id = fields.String(required=True, validate=validate.Length(max=60))
     cluster_name = fields.String(required=True, validate=validate.And(is_alphanumeric_with_hyphen, validate.Length(max=60)))
     region = fields.String(required=True, validate=aws_region_validator)
+    projection = fields.String(data_key='fields', validate=comma_separated_choices(SACCT_FIELDS))
+    limit = fields.Integer(validate=validate.Range(min=1, max=1000))
+    cursor = fields.String(validate=validate.Length(max=256))
 
 Sacct = SacctSchema(unknown=INCLUDE)
 
 
+# schemas of the single endpoints, used to validate the commands of a batch
+SLURM_BATCH_COMMANDS = {'queue_status': QueueStatus, 'scontrol_job': ScontrolJob, 'cancel_job': CancelJob, 'sacct': Sacct}
+
+class SlurmBatchSchema(Schema):
+    user = fields.String(validate=validate.Length(max=64))
+    instance_id = fields.String(required=True, validate=validate.Length(max=60))
+    cluster_name = fields.String(validate=validate.And(is_alphanumeric_with_hyphen, validate.Length(max=60)))
+    region = fields.String(required=True, validate=aws_region_validator)
+    commands = fields.List(fields.Dict(), required=True, validate=validate.Length(min=1, max=10))
+
+    @validates_schema
+    def commands_valid(self, data, **kwargs):
+        common = {k: v for k, v in data.items() if k != 'commands'}
+        errors = {}
+        for i, command in enumerate(data.get('commands', [])):
+            schema = SLURM_BATCH_COMMANDS.get(command.get('type'))
+            if schema is None:
+                errors[i] = {'type': [f"Must be one of: {', '.join(SLURM_BATCH_COMMANDS)}."]}
+                continue
+            command_errors = schema.validate({**common, **{k: v for k, v in command.items() if k != 'options'}})
+            if not isinstance(command.get('options', {}), dict):
+                command_errors['options'] = ['Not a valid mapping type.']
+            if command_errors:
+                errors[i] = command_errors
+        if errors:
+            raise ValidationError({'commands': errors})
+
+SlurmBatch = SlurmBatchSchema(unknown=INCLUDE)
+
+
+class CostRollupSchema(Schema):
+    user = fields.String(validate=validate.Length(max=64))
+    instance_id = fields.String(required=True, validate=validate.Length(max=60))
+    cluster_name = fields.String(required=True, validate=validate.And(is_alphanumeric_with_hyphen, validate.Length(max=60)))
+    region = fields.String(required=True, validate=aws_region_validator)
+    starttime = fields.String(required=True, validate=is_slurm_time)
+    endtime = fields.String(validate=is_slurm_time)
+    group_by = fields.String(validate=comma_separated_choices(['user', 'queue', 'day']))
+
+CostRollup = CostRollupSchema(unknown=INCLUDE)
+
+
 class LoginSchema(Schema):
     code = fields.String(required=True, validate=validate.Length(max=128))
 
@@ -114,6 +177,7 @@ PushLog = PushLogSchema(unknown=INCLUDE)
 class PriceEstimateSchema(Schema):
     cluster_name = fields.String(required=True, validate=validate.Length(max=60))
     queue_name = fields.String(required=True, validate=validate.Length(max=60))
+    compute_resource = fields.String(validate=validate.Length(max=60))
     region = fields.String(validate=aws_region_validator, required=True)
 
 PriceEstimate = PriceEstimateSchema(unknown=INCLUDE)
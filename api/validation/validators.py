@@ -33,6 +33,17 @@ def is_alphanumeric_with_hyphen(arg: str):
 aws_region_validator = validate.OneOf(choices=PC_REGIONS)
 
 
+def is_slurm_time(arg: str):
+    pattern = re.compile(r"^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}(:\d{2})?)?$")
+    return bool(re.fullmatch(pattern, arg))
+
+
+def comma_separated_choices(choices):
+    def predicate(arg: str):
+        return all(item in choices for item in arg.split(','))
+    return predicate
+
+
 def valid_api_log_levels_predicate(loglevel):
     return loglevel.lower() in VALID_LOG_LEVELS
 
@@ -15,9 +15,11 @@ from flask.json import JSONEncoder
 from werkzeug.routing import BaseConverter
 
 import api.utils as utils
+from api.clients.boto import boto_clients
 from api.PclusterApiHandler import (
     authenticated,
     cancel_job,
+    cost_rollup,
     create_user,
     delete_user,
     ec2_action,
@@ -29,23 +31,30 @@ from api.PclusterApiHandler import (
     get_identity,
     get_version,
     get_instance_types,
+    invalidate_aws_config_cache,
     list_users,
     login,
     logout,
     price_estimate,
+    queue_events,
+    queue_events_supported,
     queue_status,
     sacct,
     scontrol_job,
-    CLIENT_ID, CLIENT_SECRET, USER_POOL_ID, pc
+    slurm_batch,
+    warm_up_auth,
+    CLIENT_ID, CLIENT_SECRET, CSRF_FINGERPRINT, CSRF_FINGERPRINT_CACHE_DIR, USER_POOL_ID, pc
 )
 from api.logging import parse_log_entry, push_log_entry
+from api.metrics import metrics_snapshot, startup_timings
 from api.pcm_globals import logger
 from api.security.csrf import CSRF
-from api.security.csrf.csrf import csrf_needed
-from api.security.fingerprint import CognitoFingerprintGenerator
+from api.security.csrf.csrf import csrf_needed, csrf_secret_key
+from api.security.fingerprint import CognitoFingerprintGenerator, StaticFingerprintGenerator
 from api.validation import validated, EC2Action
 from api.validation.schemas import CreateUser, DeleteUser, GetClusterConfig, GetCustomImageConfig, GetAwsConfig, GetInstanceTypes,\
-     Login, PushLog, PriceEstimate, GetDcvSession, QueueStatus, ScontrolJob, CancelJob, Sacct
+     InvalidateAwsConfigCache, CostRollup, Login, PushLog, PriceEstimate, GetDcvSession, QueueStatus, ScontrolJob, CancelJob, Sacct,\
+     SlurmBatch
 
 ADMINS_GROUP = { "admin" }
 
@@ -66,11 +75,28 @@ class PClusterJSONEncoder(JSONEncoder):
         return JSONEncoder.default(self, obj)
 
 
+def fingerprint_generator():
+    if CSRF_FINGERPRINT:
+        return StaticFingerprintGenerator(CSRF_FINGERPRINT)
+    return CognitoFingerprintGenerator(CLIENT_ID, CLIENT_SECRET, USER_POOL_ID, cache_dir=CSRF_FINGERPRINT_CACHE_DIR)
+
+
+def warm_up(app):
+    """ Does ahead of the first request, e.g. in the Lambda init phase, the work it would otherwise pay for """
+    csrf_secret_key(app)
+    with startup_timings.measure("auth_warm_up"):
+        warm_up_auth()
+
+
 def run():
-    app = utils.build_flask_app(__name__)
+    with startup_timings.measure("build_flask_app"):
+        app = utils.build_flask_app(__name__)
     app.json_encoder = PClusterJSONEncoder
     app.url_map.converters["regex"] = RegexConverter
-    CSRF(app, CognitoFingerprintGenerator(CLIENT_ID, CLIENT_SECRET, USER_POOL_ID))
+    with startup_timings.measure("csrf"):
+        CSRF(app, fingerprint_generator())
+    with startup_timings.measure("boto_warm_up"):
+        boto_clients.warm_up()
 
     @app.errorhandler(401)
     def custom_401(_error):
@@ -118,6 +144,13 @@ def run():
     def get_instance_types_():
         return get_instance_types()
 
+    @app.route("/manager/invalidate_aws_config_cache", methods=["POST"])
+    @authenticated(ADMINS_GROUP)
+    @csrf_needed
+    @validated(params=InvalidateAwsConfigCache)
+    def invalidate_aws_config_cache_():
+        return invalidate_aws_config_cache()
+
     @app.route("/manager/get_dcv_session")
     @authenticated(ADMINS_GROUP)
     @csrf_needed
@@ -134,6 +167,11 @@ def run():
     def get_version_():
         return get_version()
 
+    @app.route("/manager/get_metrics")
+    @authenticated(ADMINS_GROUP)
+    def get_metrics_():
+        return metrics_snapshot()
+
     @app.route("/manager/get_app_config")
     def get_app_config_():
         return get_app_config()
@@ -163,6 +201,13 @@ def run():
     def queue_status_():
         return queue_status()
 
+    if queue_events_supported():
+        @app.route("/manager/queue_events")
+        @authenticated(ADMINS_GROUP)
+        @validated(params=QueueStatus)
+        def queue_events_():
+            return queue_events()
+
     @app.route("/manager/cancel_job")
     @authenticated(ADMINS_GROUP)
     @csrf_needed
@@ -176,6 +221,12 @@ def run():
     def price_estimate_():
         return price_estimate()
 
+    @app.route("/manager/cost_rollup")
+    @authenticated(ADMINS_GROUP)
+    @validated(params=CostRollup)
+    def cost_rollup_():
+        return cost_rollup()
+
     @app.route("/manager/sacct", methods=["POST"])
     @authenticated(ADMINS_GROUP)
     @csrf_needed
@@ -189,6 +240,13 @@ def run():
     def scontrol_job_():
         return scontrol_job()
 
+    @app.route("/manager/slurm_batch", methods=["POST"])
+    @authenticated(ADMINS_GROUP)
+    @csrf_needed
+    @validated(body=SlurmBatch)
+    def slurm_batch_():
+        return slurm_batch()
+
     @app.route("/login")
     @validated(params=Login)
     def login_():
@@ -9,14 +9,32 @@
 # OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions and
 # limitations under the License.
 import os
+import time
 from os import environ
 from typing import Any, Dict
 
+_import_start = time.perf_counter()
+from api.clients.secrets import app_secrets
+
+# the Secrets Manager round trip overlaps the import of the application
+if environ.get("SECRET_ID") and not environ.get("USER_POOL_ID"):
+    app_secrets.prefetch(environ["SECRET_ID"])
+
 import app
 import logging
 
+from api.logging.pipeline import log_handler
+from api.metrics import startup_timings
+from api.PclusterApiHandler import reset_after_restore
 from awslambda.serverless_wsgi import handle_request
 
+try:
+    from snapshot_restore_py import register_after_restore
+except ImportError:  # only provided by the runtimes supporting SnapStart
+    register_after_restore = None
+
+startup_timings.record("import_app", (time.perf_counter() - _import_start) * 1000)
+
 # Initialize as a global to re-use across Lambda invocations
 pcluster_manager_api = None  # pylint: disable=invalid-name
 
@@ -27,19 +45,66 @@ if is_dev_profile:
     environ["FLASK_ENV"] = "development"
     environ["FLASK_DEBUG"] = "1"
 
+# build and warm up the app in the init phase instead of in the first invocation
+EAGER_INIT = environ.get("EAGER_INIT", "true").lower() == "true"
+
+# unauthenticated request served once at init, so that the request path (routing, logging, JSON) is warm
+WARM_UP_EVENT = {
+    "httpMethod": "GET",
+    "path": "/manager/get_version",
+    "headers": {"Host": "lambda"},
+    "body": None,
+    "requestContext": {},
+}
+
+
+def _init_flask_app(warm_up=False):
+    with startup_timings.measure("init_flask_app"):
+        flask_app = app.run()
+    if warm_up:
+        with startup_timings.measure("warm_up"):
+            app.warm_up(flask_app)
+            handle_request(flask_app, WARM_UP_EVENT, None)
+    logging.info("Cold start timings (ms): %s", startup_timings.snapshot())
+    return flask_app
+
+
+def _after_restore():
+    with startup_timings.measure("restore"):
+        reset_after_restore()
+
+
+if EAGER_INIT:
+    if "AWS_REGION" in environ:
+        environ["AWS_DEFAULT_REGION"] = environ["AWS_REGION"]
+    try:
+        pcluster_manager_api = _init_flask_app(warm_up=True)
+    except Exception as e:
+        # retried by the first invocation, which reports the failure
+        logging.warning("Unable to initialize the Flask application at init: %s", e)
+
+if register_after_restore is not None:
+    register_after_restore(_after_restore)
+
+
+def get_flask_app():
+    """ Returns the app built in the init phase, building it on the first invocation otherwise """
+    global pcluster_manager_api  # pylint: disable=global-statement,invalid-name
+    if not pcluster_manager_api:
+        logging.info("Initializing Flask Application")
+        pcluster_manager_api = _init_flask_app()
+    # Setting default region to region where lambda function is executed
+    os.environ["AWS_DEFAULT_REGION"] = os.environ["AWS_REGION"]
+    return pcluster_manager_api
 
-def _init_flask_app():
-    return app.run()
 
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    log_handler.aws_request_id = getattr(context, "aws_request_id", None)
     try:
-        global pcluster_manager_api  # pylint: disable=global-statement,invalid-name
-        if not pcluster_manager_api:
-            logging.info("Initializing Flask Application")
-            pcluster_manager_api = _init_flask_app()
-        # Setting default region to region where lambda function is executed
-        os.environ["AWS_DEFAULT_REGION"] = os.environ["AWS_REGION"]
-        return handle_request(pcluster_manager_api, event, context)
+        return handle_request(get_flask_app(), event, context)
     except Exception as e:
         logging.critical("Unexpected exception: %s", e, exc_info=True)
         raise Exception("Unexpected fatal exception. Please look at API logs for details on the encountered failure.")
+    finally:
+        # the environment is frozen once the invocation returns, queued log records must be written before
+        log_handler.drain()
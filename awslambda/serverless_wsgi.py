@@ -13,6 +13,9 @@
 # The above copyright notice and this permission notice shall be included in all
 # copies or substantial portions of the Software.
 import base64
+import functools
+import gzip
+import itertools
 import os
 import sys
 from io import BytesIO
@@ -22,6 +25,11 @@ from werkzeug.http import HTTP_STATUS_CODES
 from werkzeug.urls import url_encode, url_unquote, url_unquote_plus
 from werkzeug.wrappers import Response
 
+try:
+    import brotli
+except ImportError:  # optional, responses are only gzipped without it
+    brotli = None
+
 # List of MIME types that should not be base64 encoded. MIME types within `text/*`
 # are included by default.
 TEXT_MIME_TYPES = [
@@ -33,23 +41,49 @@ TEXT_MIME_TYPES = [
 ]
 
 
+# Content codings of the responses, in order of preference, negotiated from the Accept-Encoding of the requests.
+# Only responses of text MIME types of at least RESPONSE_COMPRESSION_MIN_SIZE bytes are compressed.
+RESPONSE_COMPRESSION = [e for e in os.environ.get("RESPONSE_COMPRESSION", "br,gzip").split(",") if e]
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.environ.get("RESPONSE_COMPRESSION_MIN_SIZE", 1024))
+
+ENCODERS = {"gzip": lambda data: gzip.compress(data, compresslevel=6, mtime=0)}
+if brotli is not None:
+    ENCODERS["br"] = lambda data: brotli.compress(data, quality=5)
+
+
 def all_casings(input_string):
     """
-    Permute all casings of a given string.
-    A pretty algoritm, via @Amber
-    http://stackoverflow.com/questions/6792803/finding-all-possible-case-permutations-in-python
+    Permute all casings of a given string, the first letters changing first:
+    "set-cookie", "Set-cookie", "sEt-cookie", "SEt-cookie", ...
     """
-    if not input_string:
-        yield ""
-    else:
-        first = input_string[:1]
-        if first.lower() == first.upper():
-            for sub_casing in all_casings(input_string[1:]):
-                yield first + sub_casing
+    chars = [c.lower() for c in input_string]
+    letters = [i for i, c in enumerate(input_string) if c.lower() != c.upper()]
+    for n in range(2 ** len(letters)):
+        casing = list(chars)
+        for bit, i in enumerate(letters):
+            if n >> bit & 1:
+                casing[i] = input_string[i].upper()
+        yield "".join(casing)
+
+
+@functools.lru_cache(maxsize=256)
+def header_casings(key, count):
+    """ The first `count` casings of a header name, computed once per name and count """
+    return tuple(itertools.islice(all_casings(key), count))
+
+
+def _grouped_items(headers):
+    """ Values of the headers grouped by case-insensitive name, named after their first occurrence """
+    grouped = {}
+    names = {}
+    for key, value in headers.items():
+        name = names.setdefault(key.lower(), key)
+        values = grouped.get(name)
+        if values is None:
+            grouped[name] = [value]
         else:
-            for sub_casing in all_casings(input_string[1:]):
-                yield first.lower() + sub_casing
-                yield first.upper() + sub_casing
+            values.append(value)
+    return grouped
 
 
 def split_headers(headers):
@@ -61,24 +95,35 @@ def split_headers(headers):
     """
     new_headers = {}
 
-    for key in headers.keys():
-        values = headers.get_all(key)
+    for key, values in _grouped_items(headers).items():
         if len(values) > 1:
-            for value, casing in zip(values, all_casings(key)):
-                new_headers[casing] = value
-        elif len(values) == 1:
+            new_headers.update(zip(header_casings(key, len(values)), values))
+        else:
             new_headers[key] = values[0]
 
     return new_headers
 
 
-def group_headers(headers):
+def split_headers_v2(headers):
+    """
+    Headers of a payload format 2.0 response: cookies are returned in their own
+    list and the other repeated headers are combined with commas, as supported
+    by HTTP APIs, so that no case-mutated variation is needed.
+    """
     new_headers = {}
+    cookies = []
 
-    for key in headers.keys():
-        new_headers[key] = headers.get_all(key)
+    for key, values in _grouped_items(headers).items():
+        if key.lower() == "set-cookie":
+            cookies.extend(values)
+        else:
+            new_headers[key] = ",".join(values)
 
-    return new_headers
+    return new_headers, cookies
+
+
+def group_headers(headers):
+    return _grouped_items(headers)
 
 
 def is_alb_event(event):
@@ -115,8 +160,9 @@ def get_body_bytes(event, body):
 
 
 def setup_environ_items(environ, headers):
+    # WSGI strings are latin1, only the non ASCII ones have to be transcoded
     for key, value in environ.items():
-        if isinstance(value, str):
+        if isinstance(value, str) and not value.isascii():
             environ[key] = value.encode("utf-8").decode("latin1", "replace")
 
     for key, value in headers.items():
@@ -126,11 +172,73 @@ def setup_environ_items(environ, headers):
     return environ
 
 
+def negotiate_encoding(accept_encoding, available=None):
+    """ Returns the content coding preferred by the client among the available ones, None for identity """
+    available = [e for e in RESPONSE_COMPRESSION if e in ENCODERS] if available is None else available
+    qualities = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.partition(";")
+        params = params.strip()
+        try:
+            qualities[name.strip().lower()] = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            continue
+
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def get_accept_encoding(event):
+    if u"multiValueHeaders" in event:
+        for key, values in (event[u"multiValueHeaders"] or {}).items():
+            if key.lower() == "accept-encoding":
+                return ",".join(values)
+    for key, value in (event.get(u"headers") or {}).items():
+        if key.lower() == "accept-encoding":
+            return value
+    return None
+
+
+def compress_response(response, data, event):
+    """ Returns the data compressed with the coding negotiated with the client, setting the response headers """
+    if (len(data) < RESPONSE_COMPRESSION_MIN_SIZE or response.status_code == 206
+            or response.headers.get("Content-Encoding")):
+        return data
+    encoding = negotiate_encoding(get_accept_encoding(event))
+    if encoding is None:
+        return data
+
+    data = ENCODERS[encoding](data)
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Content-Length"] = str(len(data))
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # the compressed representation is not byte for byte the one the strong validator identifies
+        response.set_etag(etag, weak=True)
+    return data
+
+
 def generate_response(response, event):
     returndict = {u"statusCode": response.status_code}
 
+    # the body is joined once, and only transcoded to the representation sent to API Gateway
+    data = response.get_data()
+    mimetype = response.mimetype or "text/plain"
+    is_text = mimetype.startswith("text/") or mimetype in TEXT_MIME_TYPES
+    if data and is_text:
+        data = compress_response(response, data, event)
+
     if u"multiValueHeaders" in event:
         returndict[u"multiValueHeaders"] = group_headers(response.headers)
+    elif event.get(u"version") == "2.0":
+        returndict[u"headers"], cookies = split_headers_v2(response.headers)
+        if cookies:
+            returndict[u"cookies"] = cookies
     else:
         returndict[u"headers"] = split_headers(response.headers)
 
@@ -138,15 +246,12 @@ def generate_response(response, event):
         # If the request comes from ALB we need to add a status description
         returndict["statusDescription"] = u"%d %s" % (response.status_code, HTTP_STATUS_CODES[response.status_code])
 
-    if response.data:
-        mimetype = response.mimetype or "text/plain"
-        if (mimetype.startswith("text/") or mimetype in TEXT_MIME_TYPES) and not response.headers.get(
-            "Content-Encoding", ""
-        ):
-            returndict["body"] = response.get_data(as_text=True)
+    if data:
+        if is_text and not response.headers.get("Content-Encoding", ""):
+            returndict["body"] = data.decode(response.charset)
             returndict["isBase64Encoded"] = False
         else:
-            returndict["body"] = base64.b64encode(response.data).decode("utf-8")
+            returndict["body"] = base64.b64encode(data).decode("ascii")
             returndict["isBase64Encoded"] = True
 
     return returndict
@@ -228,6 +333,17 @@ def handle_payload_v1(app, event, context):
 
 
 def handle_payload_v2(app, event, context):
+    environ = build_environ_v2(event, context)
+
+    response = Response.from_app(app, environ)
+
+    returndict = generate_response(response, event)
+
+    return returndict
+
+
+def build_environ_v2(event, context):
+    """ WSGI environ of a payload format 2.0 event (HTTP APIs and function URLs) """
     headers = Headers(event[u"headers"])
 
     script_name = get_script_name(headers, event.get("requestContext", {}))
@@ -273,10 +389,4 @@ def handle_payload_v2(app, event, context):
         "context": context,
     }
 
-    environ = setup_environ_items(environ, headers)
-
-    response = Response.from_app(app, environ)
-
-    returndict = generate_response(response, event)
-
-    return returndict
+    return setup_environ_items(environ, headers)
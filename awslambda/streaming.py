@@ -0,0 +1,177 @@
+# Copyright 2021 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You may not use this file except in compliance
+# with the License. A copy of the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "LICENSE.txt" file accompanying this file. This file is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES
+# OR CONDITIONS OF ANY KIND, express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Response streaming entrypoint, for a function URL with the RESPONSE_STREAM invoke mode.
+
+The managed Python runtime only returns buffered responses, so this module
+implements the runtime loop against the Lambda Runtime API itself: it is the
+entrypoint of the image (`python3 -m awslambda.streaming`) instead of
+`awslambda.entrypoint.lambda_handler`. The chunks of the WSGI iterable are sent
+to the client as the app produces them.
+"""
+import http.client
+import itertools
+import json
+import logging
+import os
+import socket
+import time
+
+from werkzeug.test import run_wsgi_app
+
+from api.logging.pipeline import log_handler
+from awslambda.serverless_wsgi import build_environ_v2, split_headers_v2
+
+RUNTIME_API_VERSION = "2018-06-01"
+HTTP_INTEGRATION_CONTENT_TYPE = "application/vnd.awslambda.http-integration-response"
+PRELUDE_DELIMITER = b"\0" * 8
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 64 * 1024))
+
+
+class LambdaContext(object):
+    """ Context of an invocation, built from the headers of the Runtime API """
+
+    def __init__(self, headers):
+        self.aws_request_id = headers.get("Lambda-Runtime-Aws-Request-Id")
+        self.invoked_function_arn = headers.get("Lambda-Runtime-Invoked-Function-Arn")
+        self.deadline_ms = int(headers.get("Lambda-Runtime-Deadline-Ms") or 0)
+        self.function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+        self.function_version = os.environ.get("AWS_LAMBDA_FUNCTION_VERSION")
+        self.memory_limit_in_mb = os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE")
+        self.log_group_name = os.environ.get("AWS_LAMBDA_LOG_GROUP_NAME")
+        self.log_stream_name = os.environ.get("AWS_LAMBDA_LOG_STREAM_NAME")
+
+    def get_remaining_time_in_millis(self):
+        return max(self.deadline_ms - int(time.time() * 1000), 0)
+
+
+class RuntimeApiClient(object):
+    """ Client of the Lambda Runtime API, one connection per call """
+
+    def __init__(self, address=None):
+        self.address = address or os.environ["AWS_LAMBDA_RUNTIME_API"]
+
+    def next_invocation(self):
+        """ Waits for the next event and returns (request id, event, context) """
+        conn = http.client.HTTPConnection(self.address)
+        try:
+            conn.request("GET", f"/{RUNTIME_API_VERSION}/runtime/invocation/next")
+            resp = conn.getresponse()
+            event = json.loads(resp.read())
+            context = LambdaContext(resp.headers)
+        finally:
+            conn.close()
+        return context.aws_request_id, event, context
+
+    def stream_response(self, request_id, chunks):
+        """ Sends the chunks of the response as they are produced, with chunked transfer encoding """
+        conn = http.client.HTTPConnection(self.address)
+        try:
+            conn.connect()
+            # chunks are written as soon as they are produced, they must not wait for the ACK of the previous ones
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.request("POST", f"/{RUNTIME_API_VERSION}/runtime/invocation/{request_id}/response", body=chunks,
+                         headers={"Content-Type": HTTP_INTEGRATION_CONTENT_TYPE,
+                                  "Lambda-Runtime-Function-Response-Mode": "streaming"},
+                         encode_chunked=True)
+            conn.getresponse().read()
+        finally:
+            conn.close()
+
+    def post_error(self, request_id, error):
+        self._post_error(f"/{RUNTIME_API_VERSION}/runtime/invocation/{request_id}/error", error)
+
+    def post_init_error(self, error):
+        self._post_error(f"/{RUNTIME_API_VERSION}/runtime/init/error", error)
+
+    def _post_error(self, path, error):
+        error_type = type(error).__name__
+        conn = http.client.HTTPConnection(self.address)
+        try:
+            conn.request("POST", path, body=json.dumps({"errorMessage": str(error), "errorType": error_type}),
+                         headers={"Lambda-Runtime-Function-Error-Type": f"Runtime.{error_type}"})
+            conn.getresponse().read()
+        finally:
+            conn.close()
+
+
+def _body_chunks(app_iter, chunk_size):
+    try:
+        for data in app_iter:
+            view = memoryview(data)
+            # empty chunks would end the chunked transfer encoding
+            for start in range(0, len(view), chunk_size):
+                yield view[start:start + chunk_size]
+    finally:
+        close = getattr(app_iter, "close", None)
+        if close is not None:
+            close()
+
+
+def stream_response(app, event, context, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Calls the app with a function URL event and returns the chunks of its HTTP
+    integration response: a JSON prelude with the status code, headers and
+    cookies, a delimiter of 8 NUL bytes, then the body as the app produces it.
+    The app is called before returning, so that the status is known before
+    anything is sent.
+    """
+    app_iter, status, headers = run_wsgi_app(app, build_environ_v2(event, context))
+    prelude_headers, cookies = split_headers_v2(headers)
+    prelude = {"statusCode": int(status.split(" ", 1)[0]), "headers": prelude_headers}
+    if cookies:
+        prelude["cookies"] = cookies
+    return itertools.chain([json.dumps(prelude).encode() + PRELUDE_DELIMITER], _body_chunks(app_iter, chunk_size))
+
+
+def serve(app, runtime=None, max_invocations=None):
+    """ Runtime loop: streams the response of the app to each invocation """
+    runtime = runtime or RuntimeApiClient()
+    for _ in itertools.repeat(None) if max_invocations is None else range(max_invocations):
+        request_id, event, context = runtime.next_invocation()
+        log_handler.aws_request_id = request_id
+        try:
+            _invoke(app, runtime, request_id, event, context)
+        finally:
+            # written before asking for the next invocation, which freezes the environment
+            log_handler.drain()
+
+
+def _invoke(app, runtime, request_id, event, context):
+    try:
+        chunks = stream_response(app, event, context)
+    except Exception as e:
+        logging.critical("Unexpected exception: %s", e, exc_info=True)
+        runtime.post_error(request_id, e)
+        return
+    try:
+        runtime.stream_response(request_id, chunks)
+    except Exception as e:
+        # the prelude may already be sent, the client gets a truncated response
+        logging.error("Unable to stream the response of %s: %s", request_id, e, exc_info=True)
+
+
+def main():
+    runtime = RuntimeApiClient()
+    # enables the routes streaming their responses, e.g. the Server-Sent Events of the queue
+    os.environ.setdefault("LAMBDA_RESPONSE_STREAMING", "true")
+    try:
+        from awslambda.entrypoint import get_flask_app
+        app = get_flask_app()
+    except Exception as e:
+        logging.critical("Unable to initialize the Flask application: %s", e, exc_info=True)
+        runtime.post_init_error(e)
+        raise
+    serve(app, runtime)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Micro-benchmarks of the hot paths of the API, run with e.g. `python -m benchmarks.csrf`.
+
+They are not collected by pytest, results depend on the host so compare runs
+made on the same machine.
+"""
+import timeit
+
+
+def measure(func, number=None, repeat=5):
+    """ Returns the best time per call in microseconds """
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def report(results):
+    width = max(len(name) for name in results)
+    for name, us in results.items():
+        print(f"{name:<{width}}  {us:>12.2f} us")
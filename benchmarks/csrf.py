@@ -0,0 +1,57 @@
+"""
+CSRF cost per mutating request: token generation, validation and the overhead
+of the csrf_needed decorator.
+"""
+import hashlib
+
+from flask import Flask
+from itsdangerous import URLSafeTimedSerializer
+
+from api.security.csrf import CSRF
+from api.security.csrf.constants import CSRF_COOKIE_NAME, CSRF_TOKEN_HEADER, SALT
+from api.security.csrf.csrf import csrf_needed, csrf_secret_key, generate_csrf_token, parse_csrf_token, \
+    signer_kwargs, validate_csrf
+from api.security.fingerprint import StaticFingerprintGenerator
+from benchmarks import measure, report
+
+SECRET_KEY = hashlib.sha256(b"benchmark").hexdigest()
+
+
+def uncached_validate(secret_key, cookie, header):
+    """ Validation building a serializer per token, as done before serializers were cached """
+    cookie_value = URLSafeTimedSerializer(secret_key, SALT, **signer_kwargs).loads(cookie, max_age=30)
+    header_value = URLSafeTimedSerializer(secret_key, SALT, **signer_kwargs).loads(header, max_age=30)
+    return cookie_value == header_value
+
+
+def run():
+    app = Flask(__name__)
+    CSRF(app, StaticFingerprintGenerator(SECRET_KEY))
+    token = generate_csrf_token(SECRET_KEY, SALT)
+    other_token = generate_csrf_token(SECRET_KEY, SALT)
+
+    @csrf_needed
+    def view():
+        return "ok"
+
+    def plain_view():
+        return "ok"
+
+    headers = {CSRF_TOKEN_HEADER: token, "Cookie": f"{CSRF_COOKIE_NAME}={token}"}
+    with app.test_request_context("/", method="POST", headers=headers):
+        csrf_secret_key()
+        results = {
+            "generate_csrf_token": measure(lambda: generate_csrf_token(SECRET_KEY, SALT)),
+            "parse_csrf_token": measure(lambda: parse_csrf_token(SECRET_KEY, SALT, token)),
+            "validate_csrf (uncached serializers)": measure(lambda: uncached_validate(SECRET_KEY, token, token)),
+            "validate_csrf (different tokens)": measure(lambda: validate_csrf(SECRET_KEY, token, other_token)),
+            "validate_csrf (same token)": measure(lambda: validate_csrf(SECRET_KEY, token, token)),
+            "view": measure(plain_view),
+            "csrf_needed(view)": measure(view),
+        }
+    results["csrf_needed overhead"] = results["csrf_needed(view)"] - results["view"]
+    return results
+
+
+if __name__ == "__main__":
+    report(run())
@@ -0,0 +1,52 @@
+"""
+Synthetic API Gateway events, as received by `awslambda.entrypoint.lambda_handler`.
+"""
+import base64
+import json
+
+
+def api_gateway_v1_event(method, path, headers=None, query=None, body=None, cookies=None):
+    """ REST API (payload format 1.0) event """
+    headers = {"Host": "lambda", "X-Forwarded-Proto": "https", **(headers or {})}
+    if cookies:
+        headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in cookies.items())
+    data, is_base64 = _body(body)
+    return {
+        "httpMethod": method,
+        "path": path,
+        "headers": headers,
+        "multiValueHeaders": {name: [value] for name, value in headers.items()},
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": {name: [value] for name, value in query.items()} if query else None,
+        "body": data,
+        "isBase64Encoded": is_base64,
+        "requestContext": {"stage": "prod", "identity": {"sourceIp": "127.0.0.1"}},
+    }
+
+
+def api_gateway_v2_event(method, path, headers=None, query=None, body=None, cookies=None):
+    """ HTTP API (payload format 2.0) event """
+    data, is_base64 = _body(body)
+    event = {
+        "version": "2.0",
+        "rawPath": path,
+        "rawQueryString": "&".join(f"{name}={value}" for name, value in (query or {}).items()),
+        "headers": {"host": "lambda", "x-forwarded-proto": "https", **(headers or {})},
+        "queryStringParameters": query or {},
+        "cookies": [f"{name}={value}" for name, value in (cookies or {}).items()],
+        "requestContext": {"stage": "$default", "http": {"method": method, "path": path, "sourceIp": "127.0.0.1"}},
+        "isBase64Encoded": is_base64,
+    }
+    if data is not None:
+        event["body"] = data
+    return event
+
+
+def _body(body):
+    if body is None:
+        return None, False
+    if isinstance(body, bytes):
+        return base64.b64encode(body).decode(), True
+    if not isinstance(body, str):
+        body = json.dumps(body)
+    return body, False
@@ -0,0 +1,84 @@
+"""
+Import time of the Lambda entrypoint, the largest part of a cold start, from
+`python -X importtime` run in fresh interpreters.
+
+The sources are compiled beforehand (in a temporary pycache prefix, the tree is
+left untouched) like in the Lambda image, so that the profile measures imports
+and not bytecode compilation. Modules expected to be imported lazily are
+reported when they are imported anyway.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULE = "awslambda.entrypoint"
+# only needed by some routes, see api.cache.cluster_config and api.security.jwks
+DEFERRED_MODULES = ("yaml", "jose.jwt")
+
+
+def parse_importtime(stderr):
+    """ Returns the [(module, depth, self us, cumulative us)] of the `-X importtime` output, in import order """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        module = name.lstrip()
+        rows.append((module, (len(name) - len(module) - 1) // 2, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile(module=DEFAULT_MODULE, pycache_prefix=None):
+    """ Imports the module in a fresh interpreter and returns its parsed import times """
+    env = {k: v for k, v in os.environ.items() if k not in ("SECRET_ID", "PYTHONDONTWRITEBYTECODE")}
+    if pycache_prefix:
+        env["PYTHONPYCACHEPREFIX"] = pycache_prefix
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    return parse_importtime(proc.stderr)
+
+
+def run(module=DEFAULT_MODULE, repeat=5, top=15):
+    with tempfile.TemporaryDirectory() as pycache_prefix:
+        subprocess.run([sys.executable, "-m", "compileall", "-q", "-x", "node_modules", "app.py", "api", "awslambda"],
+                       cwd=ROOT, env={**os.environ, "PYTHONPYCACHEPREFIX": pycache_prefix}, check=True)
+        runs = [profile(module, pycache_prefix) for _ in range(repeat)]
+
+    def total(rows):
+        return sum(r[3] for r in rows if r[1] == 0 and (module == r[0] or module.startswith(f"{r[0]}.")))
+
+    # the run with the lowest total is the least disturbed by the host
+    best = min(runs, key=total)
+    start = next(i for i, r in enumerate(best) if r[1] == 0 and r[0] == "site") + 1
+    by_package = {}
+    for name, _, self_us, _ in best[start:]:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+
+    results = {f"import {module}": total(best) / 1000}
+    results.update((f"  {package}", us / 1000)
+                   for package, us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top])
+    imported = {r[0] for r in best}
+    return results, [name for name in DEFERRED_MODULES if name in imported]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    results, eagerly_imported = run(args.module, args.repeat, args.top)
+    width = max(len(name) for name in results)
+    for name, ms in results.items():
+        print(f"{name:<{width}}  {ms:>10.2f} ms")
+    if eagerly_imported:
+        print(f"deferred modules imported at start up: {', '.join(eagerly_imported)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Throughput of the conversion of Flask responses to API Gateway responses by
+`awslambda.serverless_wsgi.generate_response`, for a login-like response
+setting the auth and CSRF cookies and for a large job listing, with and
+without compression.
+"""
+import json
+
+from werkzeug.wrappers import Response
+
+from api.security.csrf.constants import CSRF_COOKIE_NAME
+from awslambda import serverless_wsgi
+from awslambda.serverless_wsgi import generate_response
+from benchmarks import measure
+from benchmarks.events import api_gateway_v1_event, api_gateway_v2_event
+
+
+def recursive_casings(input_string):
+    """ Recursive permutation of the casings, as done before the casing table """
+    if not input_string:
+        yield ""
+    else:
+        first = input_string[:1]
+        if first.lower() == first.upper():
+            for sub_casing in recursive_casings(input_string[1:]):
+                yield first + sub_casing
+        else:
+            for sub_casing in recursive_casings(input_string[1:]):
+                yield first.lower() + sub_casing
+                yield first.upper() + sub_casing
+
+
+def recursive_split_headers(headers):
+    """ split_headers as done before the casing table """
+    new_headers = {}
+    for key in headers.keys():
+        values = headers.get_all(key)
+        if len(values) > 1:
+            for value, casing in zip(values, recursive_casings(key)):
+                new_headers[casing] = value
+        elif len(values) == 1:
+            new_headers[key] = values[0]
+    return new_headers
+
+
+def login_response():
+    response = Response('{"user_roles": ["admin"], "username": "admin"}', mimetype="application/json")
+    for name, value in (("X-Frame-Options", "DENY"), ("X-Content-Type-Options", "nosniff"),
+                        ("Strict-Transport-Security", "max-age=31536000; includeSubDomains")):
+        response.headers[name] = value
+    for name in ("accessToken", "idToken", "refreshToken", CSRF_COOKIE_NAME):
+        response.set_cookie(name, "x" * 1024, httponly=True, secure=True, samesite="Lax")
+    return response
+
+
+def job_listing(jobs=10000):
+    return json.dumps({"jobs": [{"job_id": i, "name": f"job-{i}", "user": "ec2-user", "partition": "queue-1",
+                                 "state": "RUNNING", "nodes": f"queue-1-dy-c5xlarge-{i % 64}", "exit_code": "0:0"}
+                                for i in range(jobs)]})
+
+
+def run():
+    response = login_response()
+    v1 = api_gateway_v1_event("GET", "/login")
+    v1.pop("multiValueHeaders")
+    v1_multi_value = api_gateway_v1_event("GET", "/login")
+    v2 = api_gateway_v2_event("GET", "/login")
+
+    results = {}
+    split_headers = serverless_wsgi.split_headers
+    serverless_wsgi.split_headers = recursive_split_headers
+    try:
+        results["v1 headers (recursive casings)"] = measure(lambda: generate_response(response, v1))
+    finally:
+        serverless_wsgi.split_headers = split_headers
+    results["v1 headers (casing table)"] = measure(lambda: generate_response(response, v1))
+    results["v1 multiValueHeaders"] = measure(lambda: generate_response(response, v1_multi_value))
+    results["v2 cookies"] = measure(lambda: generate_response(response, v2))
+
+    listing = job_listing()
+    size = f"{len(listing) / 2 ** 20:.1f} MB"
+    for encoding in ("identity", *(e for e in serverless_wsgi.RESPONSE_COMPRESSION if e in serverless_wsgi.ENCODERS)):
+        event = api_gateway_v2_event("GET", "/manager/sacct", headers={"accept-encoding": encoding})
+        body = generate_response(Response(listing, mimetype="application/json"), event)["body"]
+        name = f"v2 {size} job listing ({encoding}, {len(body) / 2 ** 20:.2f} MB returned)"
+        results[name] = measure(lambda: generate_response(Response(listing, mimetype="application/json"), event),
+                                number=5)
+    return results
+
+
+def main():
+    results = run()
+    width = max(len(name) for name in results)
+    for name, us in results.items():
+        print(f"{name:<{width}}  {us:>10.2f} us  {1e6 / us:>10.0f} responses/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold and warm latency of the Lambda entrypoint, with the app built lazily by the
+first invocation (EAGER_INIT=false) or in the init phase (EAGER_INIT=true).
+
+Each cold start runs in a fresh interpreter that imports the entrypoint (the
+Lambda init phase) and then handles synthetic API Gateway events through
+`lambda_handler`, no AWS call is made.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks import measure
+from benchmarks.events import api_gateway_v1_event, api_gateway_v2_event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENTS = {
+    "v1": api_gateway_v1_event("GET", "/manager/get_version"),
+    "v2": api_gateway_v2_event("GET", "/manager/get_version"),
+}
+
+
+def child(payload):
+    """ Runs in the fresh interpreter, returns the timings in milliseconds """
+    event = EVENTS[payload]
+    start = time.perf_counter()
+    from awslambda.entrypoint import lambda_handler
+    init = time.perf_counter()
+    response = lambda_handler(event, None)
+    first = time.perf_counter()
+    assert response["statusCode"] == 200, response
+    return {
+        "init": (init - start) * 1000,
+        "first request": (first - init) * 1000,
+        "warm request": measure(lambda: lambda_handler(event, None), number=200) / 1000,
+    }
+
+
+def cold_start(eager_init, payload):
+    env = {k: v for k, v in os.environ.items() if k not in ("SECRET_ID", "USER_POOL_ID", "JWKS_URL")}
+    env.update({
+        "EAGER_INIT": str(eager_init).lower(),
+        "AWS_REGION": "us-east-1",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_ACCESS_KEY_ID": "benchmark",
+        "AWS_SECRET_ACCESS_KEY": "benchmark",
+        "CSRF_FINGERPRINT": "benchmark",
+    })
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.lambda_start", "--child", payload], cwd=ROOT, env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    return json.loads(proc.stdout.decode().splitlines()[-1])
+
+
+def run(repeat=5, payload="v1"):
+    results = {}
+    for eager_init in (False, True):
+        runs = [cold_start(eager_init, payload) for _ in range(repeat)]
+        mode = "eager init" if eager_init else "lazy init"
+        for name in runs[0]:
+            results[f"{mode}: {name}"] = min(r[name] for r in runs)
+        results[f"{mode}: init + first request"] = min(r["init"] + r["first request"] for r in runs)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--payload", choices=sorted(EVENTS), default="v1")
+    parser.add_argument("--child", choices=sorted(EVENTS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child)))
+        return
+    results = run(args.repeat, args.payload)
+    width = max(len(name) for name in results)
+    for name, ms in results.items():
+        print(f"{name:<{width}}  {ms:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Time to first byte of the buffered Lambda entrypoint and of the response
+streaming one, for a listing produced page by page (e.g. sacct pages or
+paginated ParallelCluster API calls).
+
+The streaming entrypoint runs its runtime loop against a local stand-in of the
+Lambda Runtime API, which records when the prelude, the first body byte and the
+end of each response are received.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask import Flask, Response, stream_with_context
+
+from awslambda.serverless_wsgi import handle_request
+from awslambda.streaming import PRELUDE_DELIMITER, RuntimeApiClient, serve
+from benchmarks.events import api_gateway_v2_event
+
+
+class LocalRuntimeApi(ThreadingHTTPServer):
+    """ Stand-in of the Lambda Runtime API serving queued events and timing the streamed responses """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RuntimeApiHandler)
+        self.events = queue.Queue()
+        self.responses = queue.Queue()
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def invoke(self, event):
+        """ Queues the event and returns the timings (seconds since the invocation) of its response """
+        start = time.perf_counter()
+        self.events.put((start, event))
+        body, timings = self.responses.get(timeout=60)
+        return body, {name: at - start for name, at in timings.items()}
+
+
+class RuntimeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        start, event = self.server.events.get()
+        self._reply(200, event, {"Lambda-Runtime-Aws-Request-Id": str(start),
+                                 "Lambda-Runtime-Deadline-Ms": str(int(time.time() * 1000) + 60000)})
+
+    def do_POST(self):
+        if self.headers.get("Transfer-Encoding") != "chunked":
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            return self._reply(202, {})
+
+        body, timings = bytearray(), {}
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                break
+            body += self.rfile.read(size)
+            self.rfile.readline()
+            timings.setdefault("prelude", time.perf_counter())
+            delimiter = body.find(PRELUDE_DELIMITER)
+            if delimiter >= 0 and len(body) > delimiter + len(PRELUDE_DELIMITER):
+                timings.setdefault("first body byte", time.perf_counter())
+        timings["complete"] = time.perf_counter()
+        self._reply(202, {})
+        self.server.responses.put((bytes(body), timings))
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def listing_app(pages, page_delay, page_size):
+    app = Flask(__name__)
+
+    @app.route("/jobs")
+    def jobs():
+        def produce():
+            for page in range(pages):
+                time.sleep(page_delay)
+                yield "".join(json.dumps({"job_id": page * page_size + i, "state": "RUNNING"}) + "\n"
+                              for i in range(page_size))
+
+        return Response(stream_with_context(produce()), mimetype="application/x-ndjson")
+
+    return app
+
+
+def run(pages=10, page_delay=0.02, page_size=500, repeat=3):
+    app = listing_app(pages, page_delay, page_size)
+    event = api_gateway_v2_event("GET", "/jobs")
+
+    buffered = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        handle_request(app, event, None)
+        buffered.append(time.perf_counter() - start)
+
+    runtime_api = LocalRuntimeApi()
+    threading.Thread(target=runtime_api.serve_forever, daemon=True).start()
+    threading.Thread(target=serve, args=(app, RuntimeApiClient(runtime_api.address), repeat), daemon=True).start()
+    streamed = [runtime_api.invoke(event)[1] for _ in range(repeat)]
+    runtime_api.shutdown()
+
+    results = {
+        "buffered: first byte": min(buffered),
+        "buffered: complete": min(buffered),
+    }
+    for name in ("prelude", "first body byte", "complete"):
+        results[f"streaming: {name}"] = min(timings[name] for timings in streamed)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--page-delay", type=float, default=0.02, help="seconds to produce each page")
+    parser.add_argument("--page-size", type=int, default=500, help="jobs per page")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = run(args.pages, args.page_delay, args.page_size, args.repeat)
+    width = max(len(name) for name in results)
+    for name, seconds in results.items():
+        print(f"{name:<{width}}  {seconds * 1000:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Time spent in the request path by the request and response logging of a large
+JSON response (e.g. a job listing), with the previous synchronous logging of
+the parsed bodies and with the asynchronous handler and body truncation.
+
+Records are written to a discarded stream, the asynchronous handler is drained
+after each measurement so that the writes do not pile up across runs.
+"""
+import io
+import logging
+
+from flask import Flask, Response
+
+from api.logging import RequestResponseLogging
+from api.logging.pipeline import AsyncBatchHandler, use_async_handler
+from benchmarks import measure, report
+from benchmarks.lambda_response import job_listing
+
+
+class NullStream(io.StringIO):
+    def write(self, s):
+        return len(s)
+
+
+def listing_app(logger, **logging_options):
+    app = Flask(__name__)
+    listing = job_listing(2000)
+
+    @app.route("/manager/sacct")
+    def sacct():
+        return Response(listing, mimetype="application/json")
+
+    RequestResponseLogging(logger, app, **logging_options)
+    return app
+
+
+def run():
+    sync_logger = logging.getLogger("benchmark-sync")
+    sync_logger.propagate = False
+    sync_logger.setLevel(logging.INFO)
+    sync_handler = logging.StreamHandler(NullStream())
+    sync_logger.addHandler(sync_handler)
+
+    async_logger = logging.getLogger("benchmark-async")
+    async_logger.setLevel(logging.INFO)
+    async_handler = AsyncBatchHandler(NullStream())
+    use_async_handler(async_logger, async_handler)
+
+    cases = {
+        "sync, full bodies": (listing_app(sync_logger, max_body_bytes=None), sync_handler),
+        "sync, bodies truncated": (listing_app(sync_logger), sync_handler),
+        "async, full bodies": (listing_app(async_logger, max_body_bytes=None), async_handler),
+        "async, bodies truncated": (listing_app(async_logger), async_handler),
+        "async, 10% sampled": (listing_app(async_logger, sample_rate=0.1), async_handler),
+    }
+    results = {}
+    for name, (app, handler) in cases.items():
+        client = app.test_client()
+        results[name] = measure(lambda: client.get("/manager/sacct"), number=50)
+        handler.flush()
+    return results
+
+
+def main():
+    report(run())
+
+
+if __name__ == "__main__":
+    main()